@@ -0,0 +1,355 @@
+from flask import Blueprint, current_app, g, jsonify, request
+from sqlalchemy import extract, func, literal, select
+import threading
+import time
+import numpy as np
+from auth import auth_required
+from etags import conditional
+from models import db, Vehicle, Trip, FuelLog, MaintenanceLog, ARCHIVE_MODELS
+from rollups import trip_km_expr
+from archive import with_archive
+
+# ─────────────────────────────────────────
+# COLUMNAR ANALYTICS
+# ─────────────────────────────────────────
+# GET /analytics/breakdown?by=region,vehicle_type,month
+#   &from=2025-01&to=2025-06        restrict to these months (inclusive)
+#   &region=North&vehicle_type=Van  restrict to these vehicles
+# Completed trips, fuel logs and maintenance logs, archived ones included, are
+# held in memory as NumPy arrays (one row per fact: vehicle, month, six value columns). Group sums,
+# per-vehicle ratios, percentiles and outlier fences are all array operations,
+# so slicing the same snapshot repeatedly never goes back to the database.
+#
+# The snapshot is checked against the database every ANALYTICS_SNAPSHOT_TTL
+# seconds, or sooner once the tables' change counters (etags.py) move, with one
+# signature query (count + max id per table, plus the latest completed_at for
+# trips). New log rows are appended by id and new completions by completed_at;
+# anything the appends can't explain (a deleted row, a cancelled completed trip)
+# reloads that table in full.
+
+analytics_bp = Blueprint('analytics', __name__)
+
+FACT_FIELDS = ('trips', 'revenue', 'km', 'fuel_cost', 'liters', 'maintenance_cost')
+BREAKDOWN_DIMENSIONS = ('region', 'vehicle_type', 'month')
+METRICS = ('cost_per_km', 'fuel_efficiency_km_per_l', 'roi_percent')
+PERCENTILES = (25, 50, 75, 90)
+OUTLIER_IQR = 1.5
+
+
+def month_index(column):
+    # year * 12 + month - 1, or -1 when the date is missing
+    return func.coalesce(extract('year', column) * 12 + extract('month', column) - 1, -1)
+
+
+def month_label(m):
+    return f'{m // 12:04d}-{m % 12 + 1:02d}'
+
+
+def parse_month(value):
+    year, month = value.split('-')
+    if not 1 <= int(month) <= 12:
+        raise ValueError(value)
+    return int(year) * 12 + int(month) - 1
+
+
+# table -> (entity over hot and archived rows, filter, month column, {fact field: column expression})
+trips, fuel_logs, maintenance_logs = with_archive(Trip), with_archive(FuelLog), with_archive(MaintenanceLog)
+FACT_SOURCES = {
+    'trip': (trips, trips.status == 'completed', trips.completed_at, {
+        'trips': literal(1), 'revenue': func.coalesce(trips.revenue, 0), 'km': trip_km_expr(trips)}),
+    'fuel': (fuel_logs, None, fuel_logs.date, {
+        'fuel_cost': func.coalesce(fuel_logs.cost, 0), 'liters': func.coalesce(fuel_logs.liters, 0)}),
+    'maintenance': (maintenance_logs, None, maintenance_logs.date, {
+        'maintenance_cost': func.coalesce(maintenance_logs.cost, 0)}),
+}
+
+
+def fact_query(table):
+    model, where, month_col, values = FACT_SOURCES[table]
+    stmt = select(model.id, model.vehicle_id, month_index(month_col),
+                  *[values.get(f, literal(0)) for f in FACT_FIELDS])
+    return stmt.where(where) if where is not None else stmt
+
+
+def load_facts(stmt):
+    """Run a fact query into (ids, vehicle_ids, months, values[n, len(FACT_FIELDS)])."""
+    rows = db.session.execute(stmt).all()
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), 3 + len(FACT_FIELDS))
+    ints = data[:, :3].astype(np.int64)
+    return ints[:, 0], ints[:, 1], ints[:, 2], data[:, 3:]
+
+
+class FactTable:
+    """Column arrays for one source table plus the marker new rows are found by:
+    the max id for the append-only logs, the latest completed_at for trips."""
+
+    def __init__(self, table, rows=None, marker=None):
+        self.table = table
+        if rows is None:
+            marker = db.session.scalar(self.marker_query())   # read first so nothing slips past it
+            rows = load_facts(fact_query(table))
+        self.ids, self.vehicle_ids, self.months, self.values = rows
+        self.marker = marker
+
+    def marker_query(self):
+        if self.table == 'trip':
+            return select(func.max(trips.completed_at)).where(trips.status == 'completed')
+        return select(func.max(FACT_SOURCES[self.table][0].id))
+
+    def extended(self, count, marker):
+        """This table once the database holds `count` rows up to `marker`: self if
+        nothing changed, an appended copy if possible, otherwise a full reload."""
+        if (count, marker) == (len(self.ids), self.marker):
+            return self
+        if self.marker is None:
+            return FactTable(self.table)
+        model = FACT_SOURCES[self.table][0]
+        newer = trips.completed_at >= self.marker if self.table == 'trip' else model.id > self.marker
+        ids, vehicle_ids, months, values = load_facts(fact_query(self.table).where(newer))
+        new = ~np.isin(ids, self.ids)
+        if len(self.ids) + int(new.sum()) != count:
+            return FactTable(self.table)
+        return FactTable(self.table, (
+            np.concatenate([self.ids, ids[new]]),
+            np.concatenate([self.vehicle_ids, vehicle_ids[new]]),
+            np.concatenate([self.months, months[new]]),
+            np.concatenate([self.values, values[new]]),
+        ), marker)
+
+
+class VehicleColumns:
+    """Vehicle attributes sorted by id, with region/vehicle_type as integer codes."""
+
+    def __init__(self):
+        rows = db.session.execute(select(
+            Vehicle.id, Vehicle.plate, Vehicle.region, Vehicle.vehicle_type,
+            func.coalesce(Vehicle.acquisition_cost, 0)).order_by(Vehicle.id)).all()
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.plates = [r[1] for r in rows]
+        self.acquisition_cost = np.array([r[4] for r in rows], dtype=np.float64)
+        self.labels, self.codes = {}, {}
+        for i, dim in ((2, 'region'), (3, 'vehicle_type')):
+            labels, codes = np.unique(np.array([r[i] or '' for r in rows], dtype=object), return_inverse=True)
+            self.labels[dim], self.codes[dim] = list(labels), codes.astype(np.int64)
+
+
+def snapshot_signature():
+    """Everything the snapshot is keyed on, in one round trip of index lookups:
+    the vehicle signature, then (row count, marker) per fact table over its hot
+    and archived rows, so archiving changes neither."""
+    def scalar(*columns, where=None):
+        stmt = select(*columns)
+        return (stmt.where(where) if where is not None else stmt).scalar_subquery()
+
+    columns = [scalar(func.count(Vehicle.id)), scalar(func.max(Vehicle.id)), scalar(func.sum(Vehicle.version))]
+    for model in (Trip, ARCHIVE_MODELS[Trip]):
+        completed = model.status == 'completed'
+        columns += [scalar(func.count(model.id), where=completed), scalar(func.max(model.completed_at), where=completed)]
+    for hot in (FuelLog, MaintenanceLog):
+        for model in (hot, ARCHIVE_MODELS[hot]):
+            columns += [scalar(func.count(model.id)), scalar(func.max(model.id))]
+    row = db.session.execute(select(*columns)).one()
+
+    def combined(i):
+        (hot_count, hot_marker), (old_count, old_marker) = row[i:i + 2], row[i + 2:i + 4]
+        return hot_count + old_count, max((m for m in (hot_marker, old_marker) if m is not None), default=None)
+    return tuple(row[:3]), {'trip': combined(3), 'fuel': combined(7), 'maintenance': combined(11)}
+
+
+class FactSnapshot:
+    """The shared, periodically refreshed set of fact tables and vehicle columns."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None          # (vehicle signature, VehicleColumns, {table: FactTable})
+        self._checked = 0.0
+        self._versions = None
+
+    def get(self, versions=None):
+        """The snapshot, rechecked once it is ANALYTICS_SNAPSHOT_TTL old or when
+        `versions` (the request's table versions) differ from the last check's."""
+        with self._lock:
+            ttl = current_app.config['ANALYTICS_SNAPSHOT_TTL']
+            if self._state is None or time.monotonic() - self._checked >= ttl or \
+                    versions not in (None, self._versions):
+                self._state = self._refresh(self._state)
+                self._checked = time.monotonic()
+                self._versions = versions
+            _, vehicles, tables = self._state
+        return vehicles, tables
+
+    @staticmethod
+    def _refresh(state):
+        vehicle_sig, table_sigs = snapshot_signature()
+        if state is None:
+            return vehicle_sig, VehicleColumns(), {t: FactTable(t) for t in FACT_SOURCES}
+        old_sig, vehicles, tables = state
+        if vehicle_sig != old_sig:
+            vehicles = VehicleColumns()
+        return vehicle_sig, vehicles, {t: tables[t].extended(*table_sigs[t]) for t in FACT_SOURCES}
+
+
+fact_snapshot = FactSnapshot()
+
+
+def group_percentiles(values, groups, n_groups):
+    """Linear-interpolated PERCENTILES of `values` per group id, ignoring NaN.
+    Returns (array[n_groups, len(PERCENTILES)] with NaN for empty groups, sample counts)."""
+    keep = ~np.isnan(values)
+    values, groups = values[keep], groups[keep]
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    result = np.full((n_groups, len(PERCENTILES)), np.nan)
+    has = counts > 0
+    for j, q in enumerate(PERCENTILES):
+        pos = starts[has] + (counts[has] - 1) * q / 100
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        result[has, j] = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return result, counts
+
+
+def ratio(numerator, denominator, scale=1.0):
+    out = np.full(np.shape(numerator), np.nan)
+    np.divide(numerator * scale, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def vehicle_metrics(sums, acquisition_cost):
+    """cost_per_km / km-per-liter / ROI% for rows of FACT_FIELDS sums (NaN where undefined)."""
+    col = {f: sums[:, i] for i, f in enumerate(FACT_FIELDS)}
+    op_cost = col['fuel_cost'] + col['maintenance_cost']
+    return {
+        'cost_per_km': ratio(op_cost, col['km']),
+        'fuel_efficiency_km_per_l': ratio(col['km'], col['liters']),
+        'roi_percent': ratio(col['revenue'] - op_cost, acquisition_cost, 100.0),
+    }
+
+
+def rounded(x):
+    return None if np.isnan(x) else round(float(x), 2)
+
+
+def fleet_breakdown(vehicles, tables, by, months=(None, None), region=None, vehicle_type=None):
+    """Totals, ratios, per-vehicle percentiles and outliers per combination of `by`.
+
+    A group's members are its vehicles (vehicle x month cells when grouping by
+    month, counting only months with activity); percentiles and IQR outlier
+    fences are taken over the members' own ratios.
+    """
+    n_vehicles = len(vehicles.ids)
+    vehicle_ok = np.ones(n_vehicles, dtype=bool)
+    for dim, wanted in (('region', region), ('vehicle_type', vehicle_type)):
+        if wanted is not None:
+            labels = vehicles.labels[dim]
+            vehicle_ok &= vehicles.codes[dim] == (labels.index(wanted) if wanted in labels else -1)
+
+    if not n_vehicles:
+        return []
+    parts = list(tables.values())
+    vehicle_ids = np.concatenate([t.vehicle_ids for t in parts])
+    fact_months = np.concatenate([t.months for t in parts])
+    values = np.concatenate([t.values for t in parts])
+
+    # Facts -> vehicle positions; drop facts for unknown or filtered-out vehicles
+    pos = np.minimum(np.searchsorted(vehicles.ids, vehicle_ids), n_vehicles - 1)
+    keep = (vehicles.ids[pos] == vehicle_ids) & vehicle_ok[pos]
+    first, last = months
+    by_month = 'month' in by
+    if first is not None or last is not None or by_month:
+        keep &= fact_months >= 0
+        if first is not None:
+            keep &= fact_months >= first
+        if last is not None:
+            keep &= fact_months <= last
+    pos, fact_months, values = pos[keep], fact_months[keep], values[keep]
+
+    # Sum facts into member cells (vehicle, or vehicle x month)
+    if by_month:
+        cell_keys, cell_of = np.unique(np.stack([pos, fact_months], axis=1), axis=0, return_inverse=True)
+        cell_of = cell_of.reshape(-1)
+        cell_vehicle, cell_month = cell_keys[:, 0], cell_keys[:, 1]
+    else:
+        cell_vehicle = np.flatnonzero(vehicle_ok)
+        cell_of = np.searchsorted(cell_vehicle, pos)
+        cell_month = np.zeros(len(cell_vehicle), dtype=np.int64)
+    n_cells = len(cell_vehicle)
+    cell_sums = np.stack([np.bincount(cell_of, weights=values[:, i], minlength=n_cells)
+                          for i in range(len(FACT_FIELDS))], axis=1).reshape(n_cells, len(FACT_FIELDS))
+    cell_acquisition = vehicles.acquisition_cost[cell_vehicle]
+
+    # Cells -> groups
+    dims = [cell_month if d == 'month' else vehicles.codes[d][cell_vehicle] for d in by]
+    group_keys, group_of = np.unique(np.stack(dims, axis=1).reshape(n_cells, len(by)), axis=0, return_inverse=True)
+    group_of = group_of.reshape(-1)
+    n_groups = len(group_keys)
+    group_sums = np.stack([np.bincount(group_of, weights=cell_sums[:, i], minlength=n_groups)
+                           for i in range(len(FACT_FIELDS))], axis=1).reshape(n_groups, len(FACT_FIELDS))
+    group_acquisition = np.bincount(group_of, weights=cell_acquisition, minlength=n_groups)
+    group_members = np.bincount(group_of, minlength=n_groups)
+
+    group_metrics = vehicle_metrics(group_sums, group_acquisition)
+    cell_metrics = vehicle_metrics(cell_sums, cell_acquisition)
+    stats, outliers = {}, [[] for _ in range(n_groups)]
+    for metric, cell_values in cell_metrics.items():
+        pct, samples = group_percentiles(cell_values, group_of, n_groups)
+        stats[metric] = (pct, samples)
+        q1 = pct[group_of, PERCENTILES.index(25)]
+        q3 = pct[group_of, PERCENTILES.index(75)]
+        fence = OUTLIER_IQR * (q3 - q1)
+        with np.errstate(invalid='ignore'):
+            flagged = np.flatnonzero((cell_values < q1 - fence) | (cell_values > q3 + fence))
+        for c in flagged:
+            item = {'vehicle_id': int(vehicles.ids[cell_vehicle[c]]),
+                    'plate': vehicles.plates[cell_vehicle[c]],
+                    'metric': metric, 'value': rounded(cell_values[c])}
+            if by_month:
+                item['month'] = month_label(int(cell_month[c]))
+            outliers[group_of[c]].append(item)
+
+    result = []
+    for grp in range(n_groups):
+        item = {}
+        for d, code in zip(by, group_keys[grp]):
+            item[d] = month_label(int(code)) if d == 'month' else vehicles.labels[d][code]
+        totals = dict(zip(FACT_FIELDS, group_sums[grp].tolist()))
+        item.update({
+            'vehicles': int(group_members[grp]),
+            'total_trips': int(totals['trips']),
+            'total_km': round(totals['km'], 2),
+            'total_revenue': round(totals['revenue'], 2),
+            'total_fuel_cost': round(totals['fuel_cost'], 2),
+            'total_maintenance_cost': round(totals['maintenance_cost'], 2),
+            'total_liters': round(totals['liters'], 2),
+        })
+        for metric in METRICS:
+            item[metric] = rounded(group_metrics[metric][grp]) or 0
+        item['percentiles'] = {
+            metric: {f'p{q}': rounded(pct[grp, j]) for j, q in enumerate(PERCENTILES)} | {'samples': int(samples[grp])}
+            for metric, (pct, samples) in stats.items()
+        }
+        item['outliers'] = outliers[grp]
+        result.append(item)
+    return result
+
+
+@analytics_bp.route('/analytics/breakdown', methods=['GET'])
+@auth_required()
+@conditional(Vehicle, Trip, FuelLog, MaintenanceLog)
+def analytics_breakdown():
+    by = [d.strip() for d in request.args.get('by', 'region').split(',') if d.strip()]
+    if not by or any(d not in BREAKDOWN_DIMENSIONS for d in by) or len(set(by)) != len(by):
+        return jsonify({'error': f"by must list distinct dimensions from {', '.join(BREAKDOWN_DIMENSIONS)}"}), 400
+    try:
+        months = tuple(parse_month(request.args[k]) if request.args.get(k) else None for k in ('from', 'to'))
+    except ValueError:
+        return jsonify({'error': 'from and to must be months (YYYY-MM)'}), 400
+
+    vehicles, tables = fact_snapshot.get(g.get('table_versions'))
+    return jsonify({
+        'by': by,
+        'groups': fleet_breakdown(vehicles, tables, by, months,
+                                  request.args.get('region'), request.args.get('vehicle_type')),
+    })
@@ -0,0 +1,211 @@
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, insert, select, update, tuple_
+from datetime import datetime
+from functools import partial
+import click
+import heapq
+import math
+from models import db, Trip, FuelLog, Anomaly, VehicleReadingState
+from archive import with_archive
+
+# ─────────────────────────────────────────
+# ANOMALY DETECTION
+# ─────────────────────────────────────────
+# Every fuel log and trip completion is checked, in the same transaction as the
+# write, against a small rolling state kept per vehicle (VehicleReadingState):
+#   odometer_regression  a reading below the vehicle's previous one
+#   negative_distance    a trip whose end odometer is below its start
+#   distance_mismatch    a fuel log's distance_km disagreeing with how far the
+#                        odometer moved since the previous fill
+#   efficiency_outlier   km/L more than EFFICIENCY_Z spreads away from the
+#                        vehicle's EWMA (after EFFICIENCY_WARMUP fills)
+# Flagged readings are stored in Anomaly and listed at GET /anomalies.
+# `flask anomalies backfill` replays the historical logs in time order, in chunks.
+
+EWMA_ALPHA = 0.2
+EFFICIENCY_Z = 3.0
+EFFICIENCY_WARMUP = 5
+EFFICIENCY_MIN_SPREAD = 0.05    # spread floor as a fraction of the mean, so steady vehicles don't flag noise
+ODOMETER_TOLERANCE_KM = 1.0
+DISTANCE_TOLERANCE = 0.1        # relative gap allowed between distance_km and the odometer
+BACKFILL_CHUNK = 5000
+
+STATE_FIELDS = ('last_odometer', 'last_fill_odometer', 'km_per_l_mean', 'km_per_l_var', 'samples')
+FUEL_FIELDS = ('id', 'vehicle_id', 'date', 'liters', 'distance_km', 'odometer_at_fill')
+TRIP_FIELDS = ('id', 'vehicle_id', 'completed_at', 'start_odometer', 'end_odometer')
+
+
+class AnomalyDetector:
+    """Checks readings against per-vehicle rolling state.
+
+    State is read once per vehicle on first use and held until flush(), which
+    writes it back together with the anomalies found, so a batch of any size
+    costs one read and a few executemany writes.
+    """
+
+    def __init__(self, fresh=False):
+        self.states = {}
+        self.stored = set()     # vehicles that already have a state row
+        self.found = []
+        self.fresh = fresh      # state table was just cleared; don't read it
+
+    def load(self, vehicle_ids):
+        missing = set(vehicle_ids) - set(self.states)
+        if missing and not self.fresh:
+            t = VehicleReadingState.__table__
+            rows = db.session.execute(
+                select(t).where(t.c.vehicle_id.in_(missing)).with_for_update()).mappings()
+            for row in rows:
+                self.states[row['vehicle_id']] = {f: row[f] for f in STATE_FIELDS}
+                self.stored.add(row['vehicle_id'])
+        for vid in missing - set(self.states):
+            self.states[vid] = dict(dict.fromkeys(STATE_FIELDS), km_per_l_var=0.0, samples=0)
+
+    def state(self, vehicle_id):
+        self.load([vehicle_id])
+        return self.states[vehicle_id]
+
+    def flag(self, vehicle_id, source, source_id, occurred_on, kind, observed, expected, detail):
+        self.found.append(dict(vehicle_id=vehicle_id, source=source, source_id=source_id, kind=kind,
+                               observed=observed, expected=expected, detail=detail,
+                               occurred_on=occurred_on, created_at=datetime.utcnow()))
+
+    def odometer(self, state, reading, flag):
+        last = state['last_odometer']
+        if last is not None and reading < last - ODOMETER_TOLERANCE_KM:
+            flag('odometer_regression', reading, last, f'Odometer went back {last - reading:.1f} km')
+        # Follow the latest reading even when flagged, so one bad entry costs one flag, not every later one
+        state['last_odometer'] = reading
+
+    def efficiency(self, state, km_per_l, flag):
+        mean = state['km_per_l_mean']
+        if mean is None:
+            state.update(km_per_l_mean=km_per_l, km_per_l_var=0.0, samples=1)
+            return
+        spread = max(math.sqrt(state['km_per_l_var']), EFFICIENCY_MIN_SPREAD * abs(mean))
+        limit = EFFICIENCY_Z * spread
+        diff = km_per_l - mean
+        if state['samples'] >= EFFICIENCY_WARMUP and abs(diff) > limit:
+            flag('efficiency_outlier', km_per_l, mean, f'{km_per_l:.2f} km/L against a running {mean:.2f} km/L')
+            diff = math.copysign(limit, diff)   # an outlier only nudges the average by the limit
+        step = EWMA_ALPHA * diff
+        state['km_per_l_mean'] = mean + step
+        state['km_per_l_var'] = (1 - EWMA_ALPHA) * (state['km_per_l_var'] + diff * step)
+        state['samples'] += 1
+
+    def fuel(self, id, vehicle_id, date, liters, distance_km=0, odometer_at_fill=0, **_):
+        state = self.state(vehicle_id)
+        flag = partial(self.flag, vehicle_id, 'fuel', id, date)
+        if odometer_at_fill:
+            previous = state['last_fill_odometer']
+            if distance_km and previous is not None and odometer_at_fill >= previous:
+                moved = odometer_at_fill - previous
+                if abs(moved - distance_km) > max(ODOMETER_TOLERANCE_KM, DISTANCE_TOLERANCE * distance_km):
+                    flag('distance_mismatch', distance_km, moved,
+                         f'Logged {distance_km:g} km but the odometer moved {moved:g} km')
+            self.odometer(state, odometer_at_fill, flag)
+            state['last_fill_odometer'] = odometer_at_fill
+        if distance_km and liters:
+            self.efficiency(state, distance_km / liters, flag)
+
+    def trip(self, id, vehicle_id, completed_at, start_odometer, end_odometer, **_):
+        state = self.state(vehicle_id)
+        flag = partial(self.flag, vehicle_id, 'trip', id, completed_at.date() if completed_at else None)
+        readings = [r for r in (start_odometer, end_odometer) if r]
+        if len(readings) == 2 and end_odometer < start_odometer:
+            flag('negative_distance', end_odometer - start_odometer, None, 'End odometer is below the start odometer')
+            readings = readings[:1]
+        for reading in readings:
+            self.odometer(state, reading, flag)
+
+    def flush(self):
+        """Write the anomalies found and the touched state; returns how many anomalies were written."""
+        t = VehicleReadingState.__table__
+        found, self.found = self.found, []
+        if found:
+            db.session.execute(insert(Anomaly), found)
+        updates = [dict(s, k_vehicle_id=vid) for vid, s in self.states.items() if vid in self.stored]
+        inserts = [dict(s, vehicle_id=vid) for vid, s in self.states.items() if vid not in self.stored]
+        if updates:
+            db.session.execute(update(t).where(t.c.vehicle_id == bindparam('k_vehicle_id')), updates)
+        if inserts:
+            db.session.execute(insert(t), inserts)
+        self.stored.update(self.states)
+        return len(found)
+
+
+def check_fuel_log(log):
+    detector = AnomalyDetector()
+    detector.fuel(**{f: getattr(log, f) for f in FUEL_FIELDS})
+    return detector.flush()
+
+
+def check_fuel_rows(rows):
+    """Check freshly inserted fuel rows (column dicts with their ids) in date order."""
+    detector = AnomalyDetector()
+    detector.load({r['vehicle_id'] for r in rows})
+    for row in sorted(rows, key=lambda r: r['date']):
+        detector.fuel(**row)
+    return detector.flush()
+
+
+def check_trip(trip):
+    detector = AnomalyDetector()
+    detector.trip(**{f: getattr(trip, f) for f in TRIP_FIELDS})
+    return detector.flush()
+
+
+def keyset_rows(stmt, order_by, chunk_size):
+    """Iterate `stmt` in `order_by` order one chunk per query, so commits in between are safe."""
+    last = None
+    while True:
+        query = stmt.order_by(*order_by).limit(chunk_size)
+        if last is not None:
+            query = query.where(tuple_(*order_by) > last)
+        rows = db.session.execute(query).all()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = tuple(getattr(rows[-1], c.key) for c in order_by)
+
+
+def backfill(chunk_size=BACKFILL_CHUNK):
+    """Rebuild all anomalies and vehicle state by replaying fuel logs and completed
+    trips, archived ones included, in time order; commits every `chunk_size` readings. Returns (readings, anomalies)."""
+    db.session.query(Anomaly).delete()
+    db.session.query(VehicleReadingState).delete()
+    db.session.commit()
+
+    fuel_log, trip = with_archive(FuelLog), with_archive(Trip)
+    fuel = keyset_rows(select(*[getattr(fuel_log, f) for f in FUEL_FIELDS]).where(fuel_log.date.isnot(None)),
+                       (fuel_log.date, fuel_log.id), chunk_size)
+    trips = keyset_rows(select(*[getattr(trip, f) for f in TRIP_FIELDS]).where(
+        trip.status == 'completed', trip.completed_at.isnot(None)), (trip.completed_at, trip.id), chunk_size)
+    # A fuel log only carries a date, so it sorts before that day's trips
+    readings = heapq.merge(
+        ((datetime.combine(r.date, datetime.min.time()), 0, r.id, r) for r in fuel),
+        ((r.completed_at, 1, r.id, r) for r in trips), key=lambda e: e[:3])
+
+    detector, seen, flagged = AnomalyDetector(fresh=True), 0, 0
+    for _, source, _, row in readings:
+        if source == 0:
+            detector.fuel(**row._mapping)
+        else:
+            detector.trip(**row._mapping)
+        seen += 1
+        if seen % chunk_size == 0:
+            flagged += detector.flush()
+            db.session.commit()
+    flagged += detector.flush()
+    db.session.commit()
+    return seen, flagged
+
+
+anomalies_cli = AppGroup('anomalies', help='Odometer and fuel-efficiency anomaly checks.')
+
+@anomalies_cli.command('backfill')
+@click.option('--chunk-size', default=BACKFILL_CHUNK, show_default=True, help='Readings per commit.')
+def anomalies_backfill_command(chunk_size):
+    """Recompute anomalies for every historical fuel log and completed trip."""
+    seen, flagged = backfill(chunk_size)
+    print(f'Checked {seen} readings, flagged {flagged} anomalies')
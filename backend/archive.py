@@ -0,0 +1,112 @@
+from flask import current_app, request
+from flask.cli import AppGroup
+from sqlalchemy import delete, exists, func, insert, select, union_all
+from sqlalchemy.orm import aliased
+from datetime import date, datetime, timedelta
+import click
+import time
+from models import db, Trip, FuelLog, MaintenanceLog, ARCHIVE_MODELS
+
+# ─────────────────────────────────────────
+# ARCHIVE
+# ─────────────────────────────────────────
+# `flask archive run` moves settled rows older than ARCHIVE_AFTER_DAYS out of the
+# hot tables into their *_archive twins: completed and cancelled trips, fuel logs,
+# and resolved maintenance logs. Each table is walked in id order, copying and
+# then deleting ARCHIVE_BATCH_SIZE rows per transaction, so a running archive
+# holds the write lock for one batch at a time.
+#
+# The rollups already count every archived row and are left as they are. Code
+# that needs the whole history (rollup rebuild and verify, daily totals, the
+# breakdown snapshot, lane rebuild, anomaly backfill) reads with_archive(model):
+# hot and archived rows as one UNION ALL, usable wherever the model is. The trip,
+# fuel and maintenance lists, trip detail and exports read it with
+# ?include_archived=true.
+#
+# The newest row of a table is never archived: SQLite gives a new row max(id) + 1,
+# which would reuse the id of an archived row.
+
+_unions = {}
+
+
+def with_archive(model):
+    """`model` over its hot and archived rows, as an aliased entity on a UNION ALL of both tables."""
+    alias = _unions.get(model)
+    if alias is None:
+        archive = ARCHIVE_MODELS[model].__table__
+        union = union_all(select(*model.__table__.c), select(*archive.c)).subquery(f'{model.__tablename__}_all')
+        alias = _unions[model] = aliased(model, union)
+    return alias
+
+
+def include_archived():
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def readable(model):
+    """What a request reads `model` from: the hot table, or with ?include_archived=true the archive too."""
+    return with_archive(model) if include_archived() else model
+
+
+def archivable(model, cutoff):
+    """Conditions for rows of `model` settled and older than `cutoff`."""
+    if model is Trip:
+        return [Trip.status.in_(('completed', 'cancelled')),
+                func.coalesce(Trip.completed_at, Trip.created_at) < datetime.combine(cutoff, datetime.min.time()),
+                ~exists().where(FuelLog.trip_id == Trip.id)]       # a hot fuel log still points at it
+    if model is FuelLog:
+        return [FuelLog.date < cutoff]
+    return [MaintenanceLog.resolved.is_(True), MaintenanceLog.date < cutoff]
+
+
+def archive_batch_query(model, cutoff, last, newest, batch_size):
+    """Ids of the next `batch_size` archivable rows after id `last`, short of the `newest` row."""
+    return select(model.id).where(model.id > last, model.id < newest, *archivable(model, cutoff)).order_by(
+        model.id).limit(batch_size)
+
+
+def archive_rows(model, cutoff, batch_size, pause=0.0):
+    """Move `model`'s archivable rows, `batch_size` per transaction; returns how many moved."""
+    table, archive = model.__table__, ARCHIVE_MODELS[model].__table__
+    newest = db.session.scalar(select(func.max(model.id)))
+    moved, last = 0, 0
+    while newest is not None:
+        ids = db.session.scalars(archive_batch_query(model, cutoff, last, newest, batch_size)).all()
+        if not ids:
+            break
+        db.session.execute(insert(archive).from_select(list(table.c.keys()), select(table).where(table.c.id.in_(ids))))
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        db.session.commit()
+        moved, last = moved + len(ids), ids[-1]
+        if pause:
+            time.sleep(pause)                 # let waiting writers in between batches
+    db.session.commit()                       # end the read transaction of the last, empty batch
+    return moved
+
+
+def run_archive(cutoff=None, batch_size=None, pause=0.0):
+    """Archive everything settled before `cutoff` (default ARCHIVE_AFTER_DAYS ago); returns rows moved per table."""
+    config = current_app.config
+    cutoff = cutoff or date.today() - timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    # Fuel logs first, so the trips they point at can follow in the same run
+    return {m.__tablename__: archive_rows(m, cutoff, batch_size, pause) for m in (FuelLog, Trip, MaintenanceLog)}
+
+
+archive_cli = AppGroup('archive', help='Move settled trips and old logs out of the hot tables.')
+
+@archive_cli.command('run')
+@click.option('--before', type=click.DateTime(['%Y-%m-%d']), help='Cutoff date (default: ARCHIVE_AFTER_DAYS ago).')
+@click.option('--batch-size', type=int, help='Rows per transaction (default: ARCHIVE_BATCH_SIZE).')
+@click.option('--pause', default=0.05, show_default=True, help='Seconds to wait between batches.')
+def archive_run_command(before, batch_size, pause):
+    """Archive completed/cancelled trips, fuel logs and resolved maintenance logs older than the cutoff."""
+    moved = run_archive(before.date() if before else None, batch_size, pause)
+    print(', '.join(f'{n} {table} row(s)' for table, n in moved.items()) + ' archived')
+
+@archive_cli.command('status')
+def archive_status_command():
+    """Row counts in each hot table and its archive."""
+    for model, archive in ARCHIVE_MODELS.items():
+        hot, old = (db.session.scalar(select(func.count()).select_from(m)) for m in (model, archive))
+        print(f'{model.__tablename__}: {hot} hot, {old} archived')
@@ -0,0 +1,222 @@
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache, wraps
+import heapq
+import hmac
+import threading
+import time
+from models import db, User
+
+# ─────────────────────────────────────────
+# AUTH
+# ─────────────────────────────────────────
+# Passwords are stored as werkzeug hashes using PASSWORD_HASH_METHOD, e.g.
+# "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Raising the cost takes effect as
+# each user next logs in. Hashing runs on a small per-process pool, so a burst
+# of logins can't take every core from the other requests. Stored plaintext
+# passwords from before hashing are accepted once and rehashed on that login.
+#
+# auth_required(*roles) replaces jwt_required(). Tokens carry the user's role as
+# a claim. Once a token has been verified, its identity and role are kept in an
+# LRU until the token expires, so later requests skip JWT decoding.
+#
+# Anyone may register, but only as SELF_SERVICE_ROLE; accounts with any other
+# role are created by a manager calling /register with their own token.
+
+ROLES = ('manager', 'dispatcher', 'safety_officer', 'analyst')
+# Who may write what; mirrors PERMISSIONS in the frontend
+MANAGER = ('manager',)
+DISPATCHERS = ('manager', 'dispatcher')
+DRIVER_EDITORS = ('manager', 'safety_officer')
+FUEL_LOGGERS = ('manager', 'analyst')
+SELF_SERVICE_ROLE = 'analyst'
+HASH_SCHEMES = ('scrypt', 'pbkdf2')
+
+_pool_lock = threading.Lock()
+
+
+def hash_pool():
+    # Created on first use rather than in create_app() so forked workers each get their own threads
+    app = current_app._get_current_object()
+    pool = app.extensions.get('password_hash_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('password_hash_pool')
+            if pool is None:
+                pool = app.extensions['password_hash_pool'] = ThreadPoolExecutor(
+                    app.config['PASSWORD_HASH_WORKERS'], thread_name_prefix='password-hash')
+    return pool
+
+
+def is_hashed(stored):
+    return stored.count('$') == 2 and stored.split(':', 1)[0] in HASH_SCHEMES
+
+
+@lru_cache(maxsize=8)
+def hash_prefix(method):
+    """The `method$` prefix werkzeug writes for `method`, with its default parameters filled in."""
+    return generate_password_hash('', method).split('$', 1)[0] + '$'
+
+
+@lru_cache(maxsize=8)
+def dummy_hash(method):
+    return generate_password_hash('not a password', method)
+
+
+def hash_password(password, method=None):
+    return generate_password_hash(password, method or current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_in_pool(password):
+    """hash_password() on the hash pool, for request handlers."""
+    return hash_pool().submit(hash_password, password, current_app.config['PASSWORD_HASH_METHOD']).result()
+
+
+def verify_password(stored, password):
+    if is_hashed(stored):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode(), password.encode())      # legacy plaintext row
+
+
+def needs_rehash(stored, method):
+    return not stored.startswith(hash_prefix(method))
+
+
+def authenticate(email, password):
+    """The user with these credentials, or None. Hashing runs on the hash pool."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    user = User.query.filter_by(email=email).first()
+    # Unknown emails still pay for one hash check, so response time doesn't reveal them
+    stored = user.password if user else dummy_hash(method)
+    pool = hash_pool()
+    if not pool.submit(verify_password, stored, password).result() or user is None:
+        return None
+    if needs_rehash(stored, method):
+        user.password = pool.submit(hash_password, password, method).result()
+        db.session.commit()
+    return user
+
+
+def hash_stored_passwords():
+    """Hash any plaintext passwords left from before hashing; returns how many were updated."""
+    updated = 0
+    for user in User.query.filter(*[User.password.notlike(f'{scheme}:%') for scheme in HASH_SCHEMES]):
+        if not is_hashed(user.password):
+            user.password = hash_password(user.password)
+            updated += 1
+    db.session.commit()
+    return updated
+
+
+# ── verified-token cache ──────────────────
+
+class TokenCache:
+    """Bounded LRU of verified token -> (identity, role), with entries dropped at token expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()          # token -> (identity, role, exp)
+        self.expiries = []                    # heap of (exp, token); may hold tokens already evicted
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return entry
+
+    def put(self, token, identity, role, exp):
+        entry = (identity, role, exp)
+        with self.lock:
+            self.entries[token] = entry
+            self.entries.move_to_end(token)
+            heapq.heappush(self.expiries, (exp, token))
+            if len(self.entries) > self.maxsize:
+                # Expired tokens go first; only then the least recently used live one
+                now = time.time()
+                while self.expiries and self.expiries[0][0] <= now:
+                    _, stale = heapq.heappop(self.expiries)
+                    entry_now = self.entries.get(stale)
+                    if entry_now is not None and entry_now[2] <= now:
+                        del self.entries[stale]
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            if len(self.expiries) > 2 * self.maxsize:
+                self.expiries = [(exp, t) for t, (_, _, exp) in self.entries.items()]
+                heapq.heapify(self.expiries)
+        return entry
+
+
+def token_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('token_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('token_cache', TokenCache(app.config['TOKEN_CACHE_SIZE']))
+    return cache
+
+
+def raw_token(locations):
+    config = current_app.config
+    header = request.headers.get(config.get('JWT_HEADER_NAME', 'Authorization'), '')
+    prefix = config.get('JWT_HEADER_TYPE', 'Bearer') + ' '
+    if header.startswith(prefix):
+        return header[len(prefix):]
+    if 'query_string' in locations:
+        return request.args.get(config.get('JWT_QUERY_STRING_NAME', 'jwt'))
+    return None
+
+
+def current_user_claims(locations):
+    """(identity, role) for this request's token, verifying it only if it isn't cached."""
+    cache = token_cache()
+    token = raw_token(locations)
+    entry = cache.get(token) if token else None
+    if entry is not None:
+        return entry[:2]
+    verify_jwt_in_request(locations=list(locations))   # raises flask_jwt_extended's usual 401/422 errors
+    claims = get_jwt()
+    identity, role = claims['sub'], claims.get('role')
+    if role is None:                                    # token issued before roles were added as a claim
+        role = db.session.query(User.role).filter(User.id == int(identity)).scalar()
+        if role is None:
+            return None
+    if token and 'exp' in claims:
+        cache.put(token, identity, role, claims['exp'])
+    return identity, role
+
+
+def request_role():
+    """Role of the user whose token this request carries, or None without a token."""
+    if not raw_token(('headers',)):
+        return None
+    user = current_user_claims(('headers',))
+    return user[1] if user else None
+
+
+def auth_required(*roles, locations=('headers',), **method_roles):
+    """jwt_required() with a verified-token cache and role checks.
+
+    `roles` apply to every method; keyword arguments restrict single methods,
+    e.g. auth_required(POST=MANAGER) lets any role GET but only managers POST.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user = current_user_claims(locations)
+            if user is None:
+                return jsonify({'error': 'Unknown user'}), 401
+            g.user_id, g.role = user
+            allowed = method_roles.get(request.method, roles)
+            if allowed and g.role not in allowed:
+                return jsonify({'error': f"Requires role {' or '.join(allowed)}"}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,14 @@
+"""Benchmarks for the FleetFlow backend.
+
+Run from backend/:
+
+    python -m bench                                   # 200 vehicles, 2 years, both modes
+    python -m bench --vehicles 2000 --years 3 --out bench.json
+    python -m bench --baseline bench.json --fail-on-regression
+
+A deterministic synthetic fleet (bench.fleet) is written into a fresh SQLite
+database (or an empty one given by --database-url). Every route is then driven
+through the Flask test client, which also counts SQL queries per request, and
+through a multi-worker gunicorn server. Results are written as JSON (bench.report)
+so runs can be compared between commits.
+"""
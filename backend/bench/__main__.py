@@ -0,0 +1,140 @@
+import argparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from app import create_app
+from models import db
+from bench import report
+from bench.fleet import DEFAULTS, generate_fleet
+from bench.run import (JWT_KEY_WARNING, run_client_mode, run_server_mode, startup, serialization, auth_costs,
+                       git_commit, timestamp)
+from bench.scenarios import uncovered_routes
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog='python -m bench', description='Benchmark every FleetFlow route.')
+    fleet = p.add_argument_group('synthetic fleet')
+    fleet.add_argument('--vehicles', type=int, default=DEFAULTS['vehicles'])
+    fleet.add_argument('--drivers', type=int, default=None, help='default: 1.2 per vehicle')
+    fleet.add_argument('--years', type=int, default=DEFAULTS['years'])
+    fleet.add_argument('--trips-per-month', type=int, default=DEFAULTS['trips_per_month'], help='per vehicle')
+    fleet.add_argument('--fills-per-trip', type=float, default=DEFAULTS['fills_per_trip'])
+    fleet.add_argument('--services-per-year', type=float, default=DEFAULTS['services_per_year'])
+    fleet.add_argument('--drafts', type=int, default=DEFAULTS['drafts'])
+    fleet.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    fleet.add_argument('--database-url', help='empty database to fill instead of a temporary SQLite file; '
+                                              'both modes then share it')
+    fleet.add_argument('--keep-db', action='store_true', help='leave the generated SQLite files in place')
+
+    run = p.add_argument_group('run')
+    run.add_argument('--mode', choices=['client', 'server', 'both'], default='both')
+    run.add_argument('--iterations', type=int, default=50, help='requests per scenario in client mode')
+    run.add_argument('--requests', type=int, default=200, help='requests per scenario in server mode')
+    run.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    run.add_argument('--concurrency', type=int, default=8, help='client threads in server mode')
+    run.add_argument('--warmup', type=int, default=2, help='unmeasured requests before each scenario')
+    run.add_argument('--pool', type=int, default=32, help='vehicles reserved for trip and maintenance cycles')
+    run.add_argument('--contention', type=int, default=10, help='vehicle/driver pairs raced in the dispatch test')
+    run.add_argument('--only', action='append', help='scenario name prefix (repeatable)')
+
+    out = p.add_argument_group('output')
+    out.add_argument('--out', default='bench-results.json')
+    out.add_argument('--baseline', help='earlier results to compare against')
+    out.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before flagging (0.2 = 20%%)')
+    out.add_argument('--fail-on-regression', action='store_true', help='exit 1 if the baseline comparison fails')
+    opts = p.parse_args(argv)
+    if opts.drivers is None:
+        opts.drivers = round(opts.vehicles * 1.2)
+    return opts
+
+
+def bench_app(url):
+    return create_app({'SQLALCHEMY_DATABASE_URI': url, 'COMPLIANCE_SWEEP_INTERVAL': 0, 'STATE_CHECKPOINT_INTERVAL': 0})
+
+
+def sqlite_copy(source, workdir, name):
+    target = os.path.join(workdir, name)
+    shutil.copyfile(source, target)
+    return f'sqlite:///{target}'
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+    warnings.filterwarnings(*JWT_KEY_WARNING.split(':'))
+    workdir = tempfile.mkdtemp(prefix='fleetflow-bench-')
+    fresh = os.path.join(workdir, 'fleet.db')
+    url = opts.database_url or f'sqlite:///{fresh}'
+    params = {k: getattr(opts, k) for k in DEFAULTS}
+
+    print(f'Generating fleet {params} ...')
+    app = bench_app(url)
+    with app.app_context():
+        start = time.perf_counter()
+        counts = generate_fleet(**params)
+        generated = time.perf_counter() - start
+        backend = db.engine.dialect.name
+        routes_missing = uncovered_routes(app)
+        db.session.remove()              # return the connection, or dispose can't close it
+        db.engine.dispose()              # checkpoints the WAL so the file can be copied
+    print(f'  {counts} in {generated:.1f}s')
+
+    result = {
+        'meta': {
+            'commit': git_commit(), 'timestamp': timestamp(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'backend': backend, 'fleet': params, 'rows': counts,
+            'generate_seconds': round(generated, 2),
+        },
+        'uncovered_routes': routes_missing,
+        'micro': {'startup': startup()},
+        'modes': {},
+    }
+    # Each mode starts from its own copy of the generated SQLite file
+    mode_url = (lambda name: url) if opts.database_url else (lambda name: sqlite_copy(fresh, workdir, f'{name}.db'))
+
+    micro_app = bench_app(mode_url('micro'))
+    result['micro']['serialization'] = serialization(micro_app)
+    result['micro']['auth'] = auth_costs(micro_app)
+
+    if opts.mode in ('client', 'both'):
+        print('Client mode (Flask test client)')
+        result['modes']['client'] = run_client_mode(bench_app(mode_url('client')), opts)
+    if opts.mode in ('server', 'both'):
+        print(f'Server mode ({opts.workers} workers)')
+        server_url = mode_url('server')
+        result['modes']['server'] = run_server_mode(bench_app(server_url), server_url, opts)
+
+    regressions = None
+    if opts.baseline:
+        regressions = report.compare(report.load(opts.baseline), result, opts.tolerance)
+    result['regressions'] = regressions
+    report.write(result, opts.out)
+
+    for mode, r in result['modes'].items():
+        race = r['micro']['contention']
+        print(f"{mode}: contention {race['dispatched']}/{race['pairs']} dispatched, "
+              f"{race['double_booked']} double-booked")
+    if routes_missing:
+        print(f"Routes without a scenario: {', '.join(routes_missing)}")
+    print(f'Results written to {opts.out}')
+    if not opts.keep_db and not opts.database_url:
+        shutil.rmtree(workdir, ignore_errors=True)
+    elif not opts.database_url:
+        print(f'Databases kept in {workdir}')
+
+    if regressions:
+        print(f'{len(regressions)} regression(s) against {opts.baseline}:')
+        for line in regressions:
+            print(f'  {line}')
+        if opts.fail_on_regression:
+            return 1
+    elif regressions is not None:
+        print(f'No regressions against {opts.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+from flask import current_app
+from sqlalchemy import insert, text
+from datetime import datetime, date, timedelta
+import csv
+import os
+import random
+from models import db, Vehicle, Driver, Trip, FuelLog, MaintenanceLog, StatusEvent
+from rollups import rebuild_rollups
+from schema import init_db, seed_users
+from anomalies import backfill
+from history import write_checkpoint
+from locations import load_locations, rebuild_lanes
+from archive import run_archive
+
+# ─────────────────────────────────────────
+# SYNTHETIC FLEET
+# ─────────────────────────────────────────
+# Deterministic fleets written straight into the database with executemany
+# inserts. Each vehicle draws from its own Random(seed, vehicle id), so the
+# same parameters always give the same rows and growing one dimension (more
+# years, more vehicles) leaves the existing vehicles' histories unchanged.
+# Every vehicle's odometer only moves forward: trips, fuel fills and services
+# are generated along one timeline, which is also written as status events
+# (on_trip/available per completed trip, then the final status) with a state
+# checkpoint at the start of every month. History older than ARCHIVE_AFTER_DAYS
+# is then archived, as a deployment running `flask archive run` would have it.
+
+REGIONS = ['North', 'South', 'East', 'West', 'Central']
+CITIES = ['Ahmedabad', 'Pune', 'Mumbai', 'Surat', 'Jaipur', 'Indore', 'Nagpur', 'Delhi']
+VEHICLE_TYPES = {                 # type: (share, capacity range kg, km per liter, acquisition cost)
+    'Van': (0.5, (500, 1500), 11.0, 1_200_000),
+    'Truck': (0.35, (3000, 20000), 4.5, 3_500_000),
+    'Bike': (0.15, (20, 60), 40.0, 90_000),
+}
+SERVICE_TYPES = ['Oil change', 'Brake service', 'Tyre rotation', 'Engine check', 'Inspection']
+FUEL_PRICE = 100.0
+LOCATIONS_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'locations.csv')
+INSERT_CHUNK = 5000
+
+DEFAULTS = dict(vehicles=200, drivers=240, years=2, trips_per_month=20, fills_per_trip=0.3,
+                services_per_year=3, drafts=50, seed=42)
+
+
+def pick_type(rnd):
+    x, total = rnd.random(), 0
+    for vtype, (share, *_) in VEHICLE_TYPES.items():
+        total += share
+        if x < total:
+            return vtype
+    return vtype
+
+
+def insert_rows(model, rows):
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(model), rows[i:i + INSERT_CHUNK])
+
+
+def generate_fleet(vehicles, drivers, years, trips_per_month, fills_per_trip,
+                   services_per_year, drafts, seed, today=None):
+    """Create the schema and fill an empty database; returns row counts per table."""
+    init_db()
+    seed_users()
+    if Vehicle.query.first() is not None:
+        raise RuntimeError('The benchmark database already has vehicles; point it at an empty database')
+
+    today = today or date.today()
+    start = datetime.combine(today.replace(day=1), datetime.min.time()) - timedelta(days=365 * years)
+    months = years * 12
+
+    rnd = random.Random(seed)
+    driver_rows = []
+    for did in range(1, drivers + 1):
+        roll = rnd.random()
+        if roll < 0.05:
+            expiry = today - timedelta(days=rnd.randint(1, 400))          # expired
+        elif roll < 0.10:
+            expiry = today + timedelta(days=rnd.randint(0, 30))           # expiring soon
+        else:
+            expiry = today + timedelta(days=rnd.randint(31, 5 * 365))
+        driver_rows.append(dict(id=did, name=f'Driver {did}', license_number=f'LIC{seed}-{did:06d}',
+                                license_expiry=expiry, license_category=pick_type(rnd), status='off_duty',
+                                safety_score=round(rnd.uniform(70, 100), 1), created_at=start, version=1))
+    licensed = {t: [d['id'] for d in driver_rows if d['license_category'] == t and d['license_expiry'] >= today]
+                for t in VEHICLE_TYPES}
+
+    vehicle_rows, trip_rows, fuel_rows, service_rows, event_rows = [], [], [], [], []
+    for vid in range(1, vehicles + 1):
+        vr = random.Random(seed * 1_000_003 + vid)
+        vtype = pick_type(vr)
+        _, (low, high), km_per_l, cost = VEHICLE_TYPES[vtype]
+        capacity = float(vr.randint(low, high))
+        odometer = round(vr.uniform(0, 50000), 1)
+        last_fill, last_service, last_service_odo = odometer, None, None
+        crew = licensed[vtype] or [1]
+        when = start + timedelta(hours=vr.randint(0, 72))
+        event_rows.append(dict(vehicle_id=vid, status='available', odometer=odometer, at=start))
+        last_event = start
+        gap = 30 * 24 / trips_per_month               # mean hours between trip starts
+        for _ in range(months * trips_per_month):
+            when += timedelta(hours=vr.uniform(0.5, 1.5) * gap)
+            if when.date() >= today:
+                break
+            km = round(vr.uniform(20, 800 if vtype == 'Truck' else 300), 1)
+            done = when + timedelta(hours=km / 50)
+            status = 'cancelled' if vr.random() < 0.05 else 'completed'
+            trip_rows.append(dict(
+                vehicle_id=vid, driver_id=vr.choice(crew), cargo_weight=round(vr.uniform(0.1, 1) * capacity, 1),
+                origin=vr.choice(CITIES), destination=vr.choice(CITIES), status=status,
+                estimated_fuel_cost=round(km / km_per_l * FUEL_PRICE, 2),
+                start_odometer=odometer, end_odometer=round(odometer + km, 1) if status == 'completed' else None,
+                revenue=round(km * vr.uniform(20, 60), 2) if status == 'completed' else 0.0,
+                created_at=when, completed_at=done if status == 'completed' else None, version=3))
+            if status != 'completed':
+                continue
+            odometer = round(odometer + km, 1)
+            event_rows.append(dict(vehicle_id=vid, status='on_trip', odometer=None, at=when))
+            event_rows.append(dict(vehicle_id=vid, status='available', odometer=odometer, at=done))
+            last_event = done
+            if vr.random() < fills_per_trip:
+                distance = round(odometer - last_fill, 1)
+                liters = round(distance / (km_per_l * vr.uniform(0.85, 1.15)), 2)
+                fuel_rows.append(dict(vehicle_id=vid, liters=liters, cost=round(liters * FUEL_PRICE, 2),
+                                      date=done.date(), odometer_at_fill=odometer, distance_km=distance,
+                                      misc_expense=0.0, created_at=done))
+                last_fill = odometer
+            if vr.random() < services_per_year / (12 * trips_per_month):
+                service_rows.append(dict(vehicle_id=vid, service_type=vr.choice(SERVICE_TYPES),
+                                         description='Scheduled service', resolved=True,
+                                         cost=round(vr.uniform(1000, 25000), 2), date=done.date(), created_at=done))
+                last_service, last_service_odo = done.date(), odometer
+
+        status = 'retired' if vr.random() < 0.02 else 'in_shop' if vr.random() < 0.05 else 'available'
+        if status == 'in_shop':
+            service_rows.append(dict(vehicle_id=vid, service_type=vr.choice(SERVICE_TYPES), description='Repair',
+                                     resolved=False, cost=round(vr.uniform(1000, 25000), 2), date=today,
+                                     created_at=datetime.combine(today, datetime.min.time())))
+            last_service, last_service_odo = today, odometer
+        if status != 'available':
+            event_rows.append(dict(vehicle_id=vid, status=status, odometer=None,
+                                   at=max(last_event, datetime.combine(today, datetime.min.time()))))
+        vehicle_rows.append(dict(
+            id=vid, name=f'{vtype} {vid}', model=f'{vtype}-{vr.randint(1, 9)}00', plate=f'GJ{seed % 100:02d}-{vid:06d}',
+            vehicle_type=vtype, capacity=capacity, odometer=odometer, region=vr.choice(REGIONS), status=status,
+            acquisition_cost=float(cost), created_at=start, version=1,
+            last_service_date=last_service, last_service_odometer=last_service_odo))
+
+    # Pending drafts for the dispatch planner, on available vehicles with a matching licensed driver
+    available = [v for v in vehicle_rows if v['status'] == 'available' and licensed[v['vehicle_type']]]
+    for _ in range(drafts if available else 0):
+        v = rnd.choice(available)
+        trip_rows.append(dict(
+            vehicle_id=v['id'], driver_id=rnd.choice(licensed[v['vehicle_type']]),
+            cargo_weight=round(rnd.uniform(0.1, 1) * v['capacity'], 1), origin=rnd.choice(CITIES),
+            destination=rnd.choice(CITIES), status='draft', estimated_fuel_cost=0.0,
+            start_odometer=v['odometer'], revenue=round(rnd.uniform(1000, 20000), 2),
+            created_at=datetime.combine(today, datetime.min.time()), version=1))
+
+    insert_rows(Driver, driver_rows)
+    insert_rows(Vehicle, vehicle_rows)
+    insert_rows(Trip, trip_rows)
+    insert_rows(FuelLog, fuel_rows)
+    insert_rows(MaintenanceLog, service_rows)
+    insert_rows(StatusEvent, event_rows)
+    if db.engine.dialect.name == 'postgresql':
+        # Vehicles and drivers were inserted with explicit ids; move their sequences past them
+        for model in (Vehicle, Driver):
+            table = model.__tablename__
+            db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                    f"(SELECT max(id) FROM {table}))"))
+    db.session.commit()
+    rebuild_rollups()
+    backfill()
+    with open(LOCATIONS_CSV, newline='', encoding='utf-8') as f:
+        locations, _ = load_locations(csv.DictReader(f))
+    lanes = rebuild_lanes()
+    month = start.date().replace(day=1)
+    checkpoints = 0
+    while month <= today:
+        write_checkpoint(datetime.combine(month, datetime.min.time()))
+        month = (month + timedelta(days=32)).replace(day=1)
+        checkpoints += 1
+    archived = run_archive(today - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS']))
+    return {'vehicles': len(vehicle_rows), 'drivers': len(driver_rows), 'trips': len(trip_rows),
+            'fuel_logs': len(fuel_rows), 'maintenance_logs': len(service_rows), 'status_events': len(event_rows),
+            'checkpoints': checkpoints, 'locations': locations, 'lanes': lanes,
+            **{f'archived_{table}': n for table, n in archived.items()}}
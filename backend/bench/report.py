@@ -0,0 +1,54 @@
+import json
+
+# ─────────────────────────────────────────
+# REPORT
+# ─────────────────────────────────────────
+# A run is one JSON document: meta (commit, time, fleet), then per mode the
+# scenario results and micro-benchmarks. compare() checks it against a baseline
+# from an earlier commit and lists every regression it finds.
+
+NOISE_FLOOR_MS = 2.0      # per-request slowdowns smaller than this are timer noise on fast routes
+
+
+def compare(baseline, current, tolerance):
+    """Regressions of `current` against `baseline`; tolerance is a fraction (0.2 = 20%)."""
+    regressions = []
+    for mode, result in current['modes'].items():
+        before_mode = baseline.get('modes', {}).get(mode)
+        if not before_mode:
+            continue
+        for name, now in result['scenarios'].items():
+            before = before_mode['scenarios'].get(name)
+            if not before or 'skipped' in now or 'skipped' in before:
+                continue
+            where = f'{mode}/{name}'
+            if now['p95_ms'] is not None and before['p95_ms'] is not None and \
+                    now['p95_ms'] > before['p95_ms'] * (1 + tolerance) and \
+                    now['p95_ms'] - before['p95_ms'] > NOISE_FLOOR_MS:
+                regressions.append(f"{where}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+            if now.get('queries_per_op') is not None and before.get('queries_per_op') is not None and \
+                    now['queries_per_op'] > before['queries_per_op']:
+                regressions.append(f"{where}: queries/op {before['queries_per_op']} -> {now['queries_per_op']}")
+            if now['errors'] > before['errors']:
+                regressions.append(f"{where}: errors {before['errors']} -> {now['errors']}")
+            if now['throughput_rps'] and before['throughput_rps'] and \
+                    now['throughput_rps'] < before['throughput_rps'] / (1 + tolerance) and \
+                    1000 / now['throughput_rps'] - 1000 / before['throughput_rps'] > NOISE_FLOOR_MS:
+                regressions.append(f"{where}: throughput {before['throughput_rps']} -> {now['throughput_rps']} req/s")
+
+    for mode, result in current['modes'].items():
+        race = result.get('micro', {}).get('contention')
+        if race and race['double_booked']:
+            regressions.append(f"{mode}/contention: {race['double_booked']} vehicle(s) dispatched twice")
+    return regressions
+
+
+def write(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,407 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import http.client
+import importlib.util
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy import event
+from models import db, Trip
+from bench.scenarios import SCENARIOS, Context, UnexpectedStatus, sample_fleet
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_KEY_WARNING = 'ignore:The HMAC key'      # the development JWT secret is short; not what we measure
+
+# ─────────────────────────────────────────
+# CLIENTS
+# ─────────────────────────────────────────
+# Both clients expose request(method, path, data, headers) -> (status, body bytes, headers)
+# and first_chunk(path, headers) for streaming routes, so scenarios don't care
+# which one they drive.
+
+class TestClient:
+    """In-process Flask test client, one per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    @property
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        return self.local.client
+
+    def request(self, method, path, data, headers):
+        resp = self.client.open(path, method=method, data=data, headers=headers)
+        return resp.status_code, resp.get_data(), resp.headers
+
+    def first_chunk(self, path, headers):
+        resp = self.client.get(path, headers=headers, buffered=False)
+        try:
+            return next(iter(resp.response))
+        finally:
+            resp.close()
+
+
+class HTTPClient:
+    """Keep-alive HTTP/1.1 connection per thread to a running server."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.local = threading.local()
+
+    def connection(self, fresh=False):
+        if fresh or not hasattr(self.local, 'conn'):
+            self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        return self.local.conn
+
+    def request(self, method, path, data, headers):
+        for attempt in (0, 1):
+            conn = self.connection(fresh=attempt == 1)
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                resp = conn.getresponse()
+                return resp.status, resp.read(), resp.headers
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                if attempt:
+                    raise
+
+    def first_chunk(self, path, headers):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn.getresponse().read1(1024)
+        finally:
+            conn.close()
+
+
+# ─────────────────────────────────────────
+# MEASUREMENT
+# ─────────────────────────────────────────
+
+def percentile(ordered, p):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(latencies, rows, errors, wall, queries=None):
+    ordered = sorted(latencies)
+    ms = lambda s: round(s * 1000, 3) if s is not None else None
+    result = {
+        'requests': len(latencies) + errors['count'],
+        'errors': errors['count'],
+        'p50_ms': ms(percentile(ordered, 50)), 'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'max_ms': ms(ordered[-1]) if ordered else None,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+        'rows_per_s': round(rows / sum(ordered)) if rows and ordered else None,
+        'queries_per_op': round(queries / len(latencies), 2) if queries is not None and latencies else None,
+    }
+    if errors['first']:
+        result['first_error'] = errors['first']
+    return result
+
+
+def measure(ctx, scenario, count, concurrency, counter=None):
+    """Run scenario.op `count` times over `concurrency` threads."""
+    latencies, lock = [], threading.Lock()
+    errors, rows = {'count': 0, 'first': None}, [0]
+
+    def one():
+        start = time.perf_counter()
+        try:
+            moved = scenario.op(ctx)
+        except (UnexpectedStatus, OSError, http.client.HTTPException) as e:
+            with lock:
+                errors['count'] += 1
+                errors['first'] = errors['first'] or str(e)
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            rows[0] += moved or 0
+
+    before = counter.value if counter else None
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for _ in range(count):
+            one()
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            for _ in range(count):
+                pool.submit(one)
+    wall = time.perf_counter() - start
+    return summarize(latencies, rows[0], errors, wall, counter.value - before if counter else None)
+
+
+def run_scenarios(ctx, iterations, concurrency, warmup, only=None, server=False, counter=None, log=print):
+    results = {}
+    for s in SCENARIOS:
+        if only and not any(s.name.startswith(prefix) for prefix in only):
+            continue
+        if server and s.client_only:
+            results[s.name] = {'skipped': 'client mode only'}
+            continue
+        count = max(1, round(iterations * s.weight))
+        if warmup:
+            measure(ctx, s, min(warmup, count), 1)
+        results[s.name] = measure(ctx, s, count, concurrency, counter)
+        r = results[s.name]
+        log(f"  {s.name:<32} p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  {r['throughput_rps']} req/s"
+            + (f"  {r['errors']} errors" if r['errors'] else ''))
+    return results
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.value = 0
+        event.listen(engine, 'before_cursor_execute', self.count)
+
+    def count(self, *args):
+        self.value += 1
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB (ru_maxrss is bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def worker_peak_rss_kb(pid):
+    """Peak RSS in KB of each worker forked by `pid`: VmHWM from /proc, else current RSS via psutil."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            children = f.read().split()
+    except OSError:
+        try:
+            import psutil
+        except ImportError:
+            return []
+        return [c.memory_info().rss // 1024 for c in psutil.Process(pid).children()]
+    peaks = []
+    for child in children:
+        try:
+            with open(f'/proc/{child}/status') as f:
+                peaks += [int(line.split()[1]) for line in f if line.startswith('VmHWM:')]
+        except OSError:
+            pass
+    return peaks
+
+
+# ─────────────────────────────────────────
+# MODES
+# ─────────────────────────────────────────
+
+def run_client_mode(app, opts, log=print):
+    rss_before = peak_rss_kb()
+    with app.app_context():
+        fleet = sample_fleet(opts.pool, opts.seed)
+        counter = QueryCounter(db.engine)
+    ctx = Context(TestClient(app), fleet, opts.seed)
+    ctx.login()
+    results = run_scenarios(ctx, opts.iterations, 1, opts.warmup, opts.only, counter=counter, log=log)
+    micro = {'contention': contention(ctx, opts.contention, opts.concurrency)}
+    return {'scenarios': results, 'micro': micro,
+            'peak_rss_kb': peak_rss_kb(), 'rss_growth_kb': peak_rss_kb() - rss_before}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(database_url, workers, port):
+    env = dict(os.environ, FLEETFLOW_DATABASE_URL=database_url, FLEETFLOW_COMPLIANCE_SWEEP_INTERVAL='0',
+               FLEETFLOW_STATE_CHECKPOINT_INTERVAL='0',
+               PYTHONWARNINGS=JWT_KEY_WARNING)
+    if importlib.util.find_spec('gunicorn'):
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+               '--log-level', 'warning', 'app:create_app()']
+        server = f'gunicorn -w {workers}'
+    else:
+        # No gunicorn: a threaded werkzeug server is the closest stand-in
+        cmd = [sys.executable, '-c', 'from werkzeug.serving import run_simple; from app import create_app; '
+               f'run_simple("127.0.0.1", {port}, create_app(), threaded=True)']
+        server = 'werkzeug threaded'
+    proc = subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{server} exited with status {proc.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return proc, server
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f'{server} did not start listening on port {port}')
+
+
+def run_server_mode(app, database_url, opts, log=print):
+    with app.app_context():
+        fleet = sample_fleet(opts.pool, opts.seed)
+    port = free_port()
+    proc, server = start_server(database_url, opts.workers, port)
+    try:
+        ctx = Context(HTTPClient('127.0.0.1', port), fleet, opts.seed)
+        ctx.login()
+        log(f'  server: {server}, concurrency {opts.concurrency}')
+        results = run_scenarios(ctx, opts.requests, opts.concurrency, opts.warmup, opts.only, server=True, log=log)
+        micro = {'contention': contention(ctx, opts.contention, opts.concurrency)}
+        peaks = worker_peak_rss_kb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return {'server': server, 'concurrency': opts.concurrency, 'scenarios': results, 'micro': micro,
+            'worker_peak_rss_kb': max(peaks) if peaks else None,
+            'workers_total_peak_rss_kb': sum(peaks) if peaks else None}
+
+
+# ─────────────────────────────────────────
+# MICRO-BENCHMARKS
+# ─────────────────────────────────────────
+
+def contention(ctx, pairs, concurrency):
+    """Two drafts per (vehicle, driver) dispatched at once: exactly one of each pair may win."""
+    crews = [ctx.crews.get() for _ in range(min(pairs, ctx.crews.qsize()))]
+    try:
+        drafts = []
+        for vid, did in crews:
+            for _ in range(2):
+                drafts.append(ctx.call('POST', '/trips', {'vehicle_id': vid, 'driver_id': did, 'cargo_weight': 1},
+                                       expect=(201,))['id'])
+        statuses = {}
+
+        def dispatch(tid):
+            status, _, _ = ctx.client.request('PUT', f'/trips/{tid}', json.dumps({'status': 'dispatched'}).encode(),
+                                           dict(ctx.headers, **{'Content-Type': 'application/json'}))
+            statuses[tid] = status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max(2, concurrency)) as pool:
+            list(pool.map(dispatch, drafts))
+        wall = time.perf_counter() - start
+
+        per_vehicle = {}
+        for tid in drafts:
+            trip = ctx.call('GET', f'/trips/{tid}')
+            if trip['status'] == 'dispatched':
+                per_vehicle[trip['vehicle_id']] = per_vehicle.get(trip['vehicle_id'], 0) + 1
+            ctx.call('PUT', f'/trips/{tid}', {'status': 'cancelled'})     # frees the pair for the next run
+        return {
+            'pairs': len(crews), 'attempts': len(drafts), 'seconds': round(wall, 3),
+            'dispatched': sum(per_vehicle.values()),
+            'conflicts': sum(1 for s in statuses.values() if s == 409),
+            'other_statuses': sorted({s for s in statuses.values() if s not in (200, 409)}),
+            'double_booked': sum(1 for n in per_vehicle.values() if n > 1),
+        }
+    finally:
+        for pair in crews:
+            ctx.crews.put(pair)
+
+
+def startup(database_url=None):
+    """Import + create_app() time in a fresh interpreter, and whether it touched the database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'untouched.db')
+        script = ('import time; t = time.perf_counter(); from app import create_app; '
+                  f"create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{path}'}}); "
+                  'print(time.perf_counter() - t)')
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', script], cwd=BACKEND, capture_output=True, text=True, check=True)
+        return {'create_app_ms': round(float(out.stdout.strip().splitlines()[-1]) * 1000, 1),
+                'process_ms': round((time.perf_counter() - start) * 1000, 1),
+                'database_touched': os.path.exists(path)}
+
+
+def serialization(app, rows=20000):
+    """Rows/s turning trips into JSON: to_dict() + stdlib json vs list_response's projection + app.json."""
+    from app import projection, LIST_FIELDS
+    with app.app_context():
+        start = time.perf_counter()
+        trips = Trip.query.order_by(Trip.id).limit(rows).all()
+        body = json.dumps([t.to_dict() for t in trips], separators=(',', ':'))
+        orm = time.perf_counter() - start
+        db.session.expunge_all()
+
+        start = time.perf_counter()
+        query, serialize = projection(Trip, LIST_FIELDS[Trip])
+        fast = app.json.dumps([serialize(r) for r in query.order_by(Trip.id).limit(rows)])
+        projected = time.perf_counter() - start
+    n = len(trips)
+    return {'rows': n, 'orm_to_dict_rows_per_s': round(n / orm) if n else None,
+            'projection_rows_per_s': round(n / projected) if n else None,
+            'same_output': json.loads(body) == json.loads(fast),
+            'json_provider': type(app.json).__name__}
+
+
+def auth_costs(app, logins=40, threads=4):
+    """Password check cost, login throughput (sequential and threaded), and per-request token cost."""
+    from auth import current_user_claims, dummy_hash, token_cache, verify_password
+    from flask_jwt_extended import create_access_token
+    client = TestClient(app)
+    body = json.dumps({'email': 'manager@test.com', 'password': '123'}).encode()
+    headers = {'Content-Type': 'application/json'}
+
+    def login(_=None):
+        status, _, _ = client.request('POST', '/login', body, headers)
+        assert status == 200, status
+
+    login()                                   # rehashes a legacy password, warms the pool
+    method = app.config['PASSWORD_HASH_METHOD']
+    with app.app_context():
+        stored = dummy_hash(method)
+    start = time.perf_counter()
+    for _ in range(5):
+        verify_password(stored, 'wrong')
+    verify = (time.perf_counter() - start) / 5
+
+    start = time.perf_counter()
+    for _ in range(logins):
+        login()
+    sequential = logins / (time.perf_counter() - start)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(login, range(logins)))
+    threaded = logins / (time.perf_counter() - start)
+
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={'role': 'manager'})
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        cache, n = token_cache(), 2000
+        start = time.perf_counter()
+        for _ in range(n):
+            cache.entries.pop(token, None)
+            current_user_claims(('headers',))
+        miss = (time.perf_counter() - start) / n
+        start = time.perf_counter()
+        for _ in range(n):
+            current_user_claims(('headers',))
+        hit = (time.perf_counter() - start) / n
+    return {'hash_method': method, 'hash_workers': app.config['PASSWORD_HASH_WORKERS'],
+            'verify_ms': round(verify * 1000, 2), 'logins_per_s': round(sequential, 1),
+            f'logins_per_s_{threads}_threads': round(threaded, 1),
+            'token_verify_us': round(miss * 1e6, 1), 'token_cache_hit_us': round(hit * 1e6, 1)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timestamp():
+    return datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
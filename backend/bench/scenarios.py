@@ -0,0 +1,347 @@
+from collections import namedtuple
+from datetime import date, timedelta
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from models import db, User, Vehicle, Driver, Trip, MaintenanceLog
+from bench.fleet import CITIES
+
+# ─────────────────────────────────────────
+# SCENARIOS
+# ─────────────────────────────────────────
+# One scenario per route (or per route and interesting parameter set). Each op
+# drives a Client, which is either the Flask test client or HTTP against a
+# running server, and returns how many rows it moved when that is a meaningful
+# rate (bulk ingest, list pages). Ops that change state keep it reusable: a trip
+# is taken from draft to completed, a vehicle sent to the shop is resolved, and
+# anything created only to be deleted is deleted.
+
+# weight scales the iteration count; client_only ops can't run against a real server
+# (an open /events stream holds a sync worker until its next keepalive write fails)
+Scenario = namedtuple('Scenario', 'name covers op weight client_only', defaults=(False,))
+JOB_POLL_SECONDS = 0.005
+
+
+class UnexpectedStatus(Exception):
+    pass
+
+
+class Context:
+    """Everything an op needs: the client, auth headers and the fleet ids it may use.
+
+    Vehicles are split into pools so concurrent ops never fight over a row:
+    `crews` (vehicle, driver) pairs for trip lifecycles, `shop` vehicles for
+    maintenance round trips, and `spare` vehicles for plain edits.
+    """
+
+    def __init__(self, client, fleet, seed=0):
+        self.client = client
+        self.fleet = fleet
+        self.seed = seed
+        self.headers = {}
+        self.serial = itertools.count()
+        self.local = threading.local()
+        self.crews, self.shop = queue.Queue(), queue.Queue()
+        for pair in fleet['crews']:
+            self.crews.put(pair)
+        for vid in fleet['shop']:
+            self.shop.put(vid)
+
+    @property
+    def rnd(self):
+        if not hasattr(self.local, 'rnd'):
+            self.local.rnd = random.Random(f'{self.seed}-{threading.get_ident()}')
+        return self.local.rnd
+
+    def unique(self, prefix):
+        return f'{prefix}{self.seed}-{next(self.serial)}-{threading.get_ident() % 100000}'
+
+    def call(self, method, path, body=None, expect=(200,), ndjson=False):
+        headers = dict(self.headers)
+        if ndjson:
+            headers['Content-Type'] = 'application/x-ndjson'
+            data = '\n'.join(json.dumps(row) for row in body).encode()
+        elif body is not None:
+            headers['Content-Type'] = 'application/json'
+            data = json.dumps(body).encode()
+        else:
+            data = None
+        status, payload, _ = self.client.request(method, path, data, headers)
+        if status not in expect:
+            raise UnexpectedStatus(f'{method} {path} -> {status}: {payload[:200]!r}')
+        return json.loads(payload) if payload and not path.startswith('/export') else payload
+
+    def revalidate(self, path):
+        """GET `path` with the ETag this thread last got for it: 304 unless it changed since."""
+        if not hasattr(self.local, 'etags'):
+            self.local.etags = {}
+        headers = dict(self.headers)
+        if path in self.local.etags:
+            headers['If-None-Match'] = self.local.etags[path]
+        status, payload, response_headers = self.client.request('GET', path, None, headers)
+        if status not in (200, 304):
+            raise UnexpectedStatus(f'GET {path} -> {status}: {payload[:200]!r}')
+        self.local.etags[path] = response_headers.get('ETag')
+
+    def login(self):
+        token = self.call('POST', '/login', {'email': 'manager@test.com', 'password': '123'})['token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+
+def sample_fleet(pool_size, seed=0):
+    """Pick the ids the scenarios use from the current database (needs an app context)."""
+    rnd = random.Random(seed)
+    today = date.today()
+    available = db.session.query(Vehicle.id, Vehicle.vehicle_type).filter(
+        Vehicle.status == 'available').order_by(Vehicle.id).all()
+    free_drivers = {}
+    for did, category in db.session.query(Driver.id, Driver.license_category).filter(
+            Driver.status == 'off_duty', Driver.license_expiry > today + timedelta(days=30)).order_by(Driver.id):
+        free_drivers.setdefault(category, []).append(did)
+
+    crews, used = [], set()
+    for vid, vtype in available:
+        if len(crews) == pool_size:
+            break
+        if free_drivers.get(vtype):
+            crews.append((vid, free_drivers[vtype].pop()))
+            used.add(vid)
+    rest = [vid for vid, _ in available if vid not in used]
+    shop, spare = rest[:pool_size], rest[pool_size:] or rest
+    vehicle_ids = [v for (v,) in db.session.query(Vehicle.id)]
+    trip_ids = [t for (t,) in db.session.query(Trip.id).order_by(Trip.id.desc()).limit(2000)]
+    first_trip = db.session.query(db.func.min(Trip.created_at)).scalar()
+    return {
+        'crews': crews, 'shop': shop, 'spare': spare,
+        'vehicle_ids': rnd.sample(vehicle_ids, min(500, len(vehicle_ids))),
+        'driver_ids': [d for (d,) in db.session.query(Driver.id).limit(500)],
+        'trip_ids': trip_ids,
+        'user_email': db.session.query(User.email).first()[0],
+        'has_history': first_trip is not None,
+        'open_maintenance': [m for (m,) in db.session.query(MaintenanceLog.id).filter(
+            MaintenanceLog.resolved.is_(False)).limit(50)],
+    }
+
+
+# ── ops ───────────────────────────────────
+
+def check_email(ctx):
+    ctx.call('POST', '/check-email', {'email': ctx.fleet['user_email']})
+
+def login(ctx):
+    ctx.call('POST', '/login', {'email': 'manager@test.com', 'password': '123'})
+
+def register(ctx):
+    ctx.call('POST', '/register', {'name': 'Bench', 'email': ctx.unique('bench') + '@test.com',
+                                   'password': 'bench'}, expect=(201,))
+
+def dashboard(ctx):
+    ctx.call('GET', '/dashboard')
+
+def metrics(ctx):
+    token = os.environ.get('FLEETFLOW_METRICS_TOKEN')
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    status, body, _ = ctx.client.request('GET', '/metrics', None, headers)
+    if status != 200:
+        raise UnexpectedStatus(f'GET /metrics -> {status}')
+
+def events(ctx):
+    ctx.client.first_chunk('/events', ctx.headers)
+
+def get(path, rows=None):
+    def op(ctx):
+        result = ctx.call('GET', path(ctx) if callable(path) else path)
+        if rows:
+            return len(rows(result))
+    return op
+
+def unchanged(path):
+    # Warmup fetches the ETag, so the measured requests are conditional GETs answered 304
+    return lambda ctx: ctx.revalidate(path)
+
+def create_vehicle(ctx, **extra):
+    return ctx.call('POST', '/vehicles', dict({
+        'name': 'Bench van', 'model': 'B-1', 'plate': ctx.unique('BN'), 'vehicle_type': 'Van',
+        'capacity': 1000, 'region': 'North', 'acquisition_cost': 1000000}, **extra), expect=(201,))
+
+def vehicle_create_delete(ctx):
+    vehicle = create_vehicle(ctx)
+    ctx.call('DELETE', f"/vehicles/{vehicle['id']}")
+
+# Concurrent edits of one row may lose the optimistic-lock race; a 409 is the designed answer
+def vehicle_update(ctx):
+    ctx.call('PUT', f"/vehicles/{ctx.rnd.choice(ctx.fleet['spare'])}", {'name': ctx.unique('Van ')},
+             expect=(200, 409))
+
+def vehicles_bulk(ctx, rows=100):
+    body = [{'name': 'Bulk van', 'plate': ctx.unique('BK'), 'vehicle_type': 'Van', 'capacity': 800,
+             'region': 'South'} for _ in range(rows)]
+    ctx.call('POST', '/vehicles/bulk', body, expect=(201,))
+    return rows
+
+def driver_create_delete(ctx):
+    driver = ctx.call('POST', '/drivers', {
+        'name': 'Bench driver', 'license_number': ctx.unique('BL'), 'license_category': 'Van',
+        'license_expiry': (date.today() + timedelta(days=365)).isoformat()}, expect=(201,))
+    ctx.call('DELETE', f"/drivers/{driver['id']}")
+
+def driver_update(ctx):
+    ctx.call('PUT', f"/drivers/{ctx.rnd.choice(ctx.fleet['driver_ids'])}", {'safety_score': ctx.rnd.randint(70, 100)},
+             expect=(200, 409))
+
+def trip_lifecycle(ctx):
+    vid, did = ctx.crews.get()
+    try:
+        trip = ctx.call('POST', '/trips', {'vehicle_id': vid, 'driver_id': did, 'cargo_weight': 1,
+                                           'origin': 'Pune', 'destination': 'Surat', 'revenue': 5000},
+                        expect=(201,))
+        ctx.call('PUT', f"/trips/{trip['id']}", {'status': 'dispatched', 'version': trip['version']})
+        ctx.call('PUT', f"/trips/{trip['id']}", {'status': 'completed',
+                                                 'end_odometer': (trip['start_odometer'] or 0) + 120})
+    finally:
+        ctx.crews.put((vid, did))
+
+def dispatch_plan(ctx):
+    ctx.call('POST', '/dispatch/plan', {'apply': False})
+
+def maintenance_round_trip(ctx):
+    vid = ctx.shop.get()
+    try:
+        log = ctx.call('POST', '/maintenance', {'vehicle_id': vid, 'service_type': 'Inspection', 'cost': 1500},
+                       expect=(201,))
+        ctx.call('PUT', f"/maintenance/{log['id']}/resolve")
+    finally:
+        ctx.shop.put(vid)
+
+def fuel_log(ctx):
+    ctx.call('POST', '/fuel', {'vehicle_id': ctx.rnd.choice(ctx.fleet['spare']), 'liters': 40, 'cost': 4000,
+                               'distance_km': 420}, expect=(201,))
+
+def fuel_bulk(ctx, rows=200):
+    spare = ctx.fleet['spare']
+    body = [{'vehicle_id': ctx.rnd.choice(spare), 'liters': 30, 'cost': 3000, 'distance_km': 330}
+            for _ in range(rows)]
+    ctx.call('POST', '/fuel/bulk', body, expect=(201,), ndjson=True)
+    return rows
+
+def export(table, fmt):
+    def op(ctx):
+        since = (date.today() - timedelta(days=30)).isoformat()
+        body = ctx.call('GET', f'/export/{table}?format={fmt}&from={since}')
+        return body.count(b'\n') - (fmt == 'csv')
+    return op
+
+def report_job(fresh):
+    # fresh: an extra parameter the report ignores gives each job its own key, so nothing is cached
+    def op(ctx):
+        params = {'bucket': 'day', 'from': month_ago()}
+        if fresh:
+            params['run'] = ctx.unique('J')
+        job = ctx.call('POST', '/jobs', {'path': '/analytics/monthly', 'params': params}, expect=(200, 202))
+        while job['status'] in ('queued', 'running'):
+            time.sleep(JOB_POLL_SECONDS)
+            job = ctx.call('GET', f"/jobs/{job['id']}")
+        ctx.call('GET', job['result_url'])
+    return op
+
+def lane_query(ctx):
+    origin, destination = ctx.rnd.sample(CITIES, 2)
+    return f'origin={origin}&destination={destination}'
+
+def distance_batch(ctx, lanes=200):
+    body = {'lanes': [dict(zip(('origin', 'destination'), ctx.rnd.sample(CITIES, 2))) for _ in range(lanes)]}
+    ctx.call('POST', '/locations/distance', body)
+    return lanes
+
+
+def month_ago():
+    return (date.today() - timedelta(days=30)).isoformat()
+
+def year_ago():
+    return (date.today() - timedelta(days=365)).isoformat()
+
+
+def random_id(key):
+    return lambda ctx: ctx.rnd.choice(ctx.fleet[key])
+
+
+SCENARIOS = [
+    Scenario('auth.check_email', ['POST /check-email'], check_email, 1),
+    Scenario('auth.login', ['POST /login'], login, 1),
+    Scenario('auth.register', ['POST /register'], register, 1),
+    Scenario('dashboard', ['GET /dashboard'], dashboard, 1),
+    Scenario('metrics', ['GET /metrics'], metrics, 1),
+    Scenario('events.connect', ['GET /events'], events, 0.5, client_only=True),
+    Scenario('vehicles.list', ['GET /vehicles'], get('/vehicles', rows=lambda r: r), 1),
+    Scenario('vehicles.list_unchanged', ['GET /vehicles'], unchanged('/vehicles'), 1),
+    Scenario('vehicles.page', ['GET /vehicles'],
+             get('/vehicles?fields=id,plate,status&limit=100', rows=lambda r: r['items']), 1),
+    Scenario('vehicles.get', ['GET /vehicles/<int:vid>'],
+             get(lambda ctx: f"/vehicles/{random_id('vehicle_ids')(ctx)}"), 1),
+    Scenario('vehicles.update', ['PUT /vehicles/<int:vid>'], vehicle_update, 1),
+    Scenario('vehicles.create_delete', ['POST /vehicles', 'DELETE /vehicles/<int:vid>'], vehicle_create_delete, 1),
+    Scenario('vehicles.bulk_100', ['POST /vehicles/bulk'], vehicles_bulk, 0.5),
+    Scenario('drivers.list', ['GET /drivers'], get('/drivers', rows=lambda r: r), 1),
+    Scenario('drivers.get', ['GET /drivers/<int:did>'], get(lambda ctx: f"/drivers/{random_id('driver_ids')(ctx)}"), 1),
+    Scenario('drivers.update', ['PUT /drivers/<int:did>'], driver_update, 1),
+    Scenario('drivers.create_delete', ['POST /drivers', 'DELETE /drivers/<int:did>'], driver_create_delete, 1),
+    Scenario('trips.list', ['GET /trips'], get('/trips', rows=lambda r: r), 0.1),
+    Scenario('trips.page', ['GET /trips'], get('/trips?limit=500', rows=lambda r: r['items']), 1),
+    Scenario('trips.page_unchanged', ['GET /trips'], unchanged('/trips?limit=500'), 1),
+    Scenario('trips.page_with_archive', ['GET /trips'],
+             get('/trips?limit=500&include_archived=true', rows=lambda r: r['items']), 1),
+    Scenario('trips.get', ['GET /trips/<int:tid>'], get(lambda ctx: f"/trips/{random_id('trip_ids')(ctx)}"), 1),
+    Scenario('trips.lifecycle', ['POST /trips', 'PUT /trips/<int:tid>'], trip_lifecycle, 1),
+    Scenario('dispatch.plan', ['POST /dispatch/plan'], dispatch_plan, 0.5),
+    Scenario('maintenance.by_vehicle', ['GET /maintenance'],
+             get(lambda ctx: f"/maintenance?vehicle_id={random_id('vehicle_ids')(ctx)}", rows=lambda r: r), 1),
+    Scenario('maintenance.round_trip', ['POST /maintenance', 'PUT /maintenance/<int:mid>/resolve'],
+             maintenance_round_trip, 1),
+    Scenario('fuel.by_vehicle', ['GET /fuel'],
+             get(lambda ctx: f"/fuel?vehicle_id={random_id('vehicle_ids')(ctx)}", rows=lambda r: r), 1),
+    Scenario('fuel.by_vehicle_with_archive', ['GET /fuel'],
+             get(lambda ctx: f"/fuel?vehicle_id={random_id('vehicle_ids')(ctx)}&include_archived=true",
+                 rows=lambda r: r), 1),
+    Scenario('fuel.create', ['POST /fuel'], fuel_log, 1),
+    Scenario('fuel.bulk_200', ['POST /fuel/bulk'], fuel_bulk, 0.5),
+    Scenario('anomalies.page', ['GET /anomalies'], get('/anomalies?limit=100', rows=lambda r: r['items']), 1),
+    Scenario('export.trips_ndjson_30d', ['GET /export/<table>'], export('trips', 'ndjson'), 0.3),
+    Scenario('export.fuel_csv_30d', ['GET /export/<table>'], export('fuel', 'csv'), 0.3),
+    Scenario('analytics.vehicles', ['GET /analytics'], get('/analytics', rows=lambda r: r), 1),
+    Scenario('analytics.drivers', ['GET /analytics/drivers'], get('/analytics/drivers', rows=lambda r: r), 1),
+    Scenario('analytics.monthly', ['GET /analytics/monthly'], get('/analytics/monthly'), 1),
+    Scenario('analytics.monthly_unchanged', ['GET /analytics/monthly'], unchanged('/analytics/monthly'), 1),
+    Scenario('analytics.monthly_daily_30d', ['GET /analytics/monthly'],
+             get(lambda ctx: f'/analytics/monthly?bucket=day&from={month_ago()}'), 1),
+    Scenario('analytics.breakdown', ['GET /analytics/breakdown'],
+             get('/analytics/breakdown?by=region,vehicle_type,month', rows=lambda r: r['groups']), 1),
+    Scenario('fleet.state_now', ['GET /fleet/state'], get('/fleet/state'), 1),
+    Scenario('fleet.state_month_ago', ['GET /fleet/state'],
+             get(lambda ctx: f'/fleet/state?at={month_ago()}T14:00&vehicles=true', rows=lambda r: r['vehicles']), 1),
+    Scenario('analytics.utilization_daily_30d', ['GET /analytics/utilization'],
+             get(lambda ctx: f'/analytics/utilization?bucket=day&from={month_ago()}', rows=lambda r: r), 1),
+    Scenario('analytics.utilization_monthly_1y', ['GET /analytics/utilization'],
+             get(lambda ctx: f'/analytics/utilization?bucket=month&from={year_ago()}', rows=lambda r: r), 0.3),
+    Scenario('jobs.monthly_fresh', ['POST /jobs', 'GET /jobs/<int:jid>', 'GET /jobs/<int:jid>/result'],
+             report_job(fresh=True), 0.5),
+    Scenario('jobs.monthly_cached', ['POST /jobs', 'GET /jobs/<int:jid>/result'], report_job(fresh=False), 1),
+    Scenario('locations.list', ['GET /locations'], get('/locations', rows=lambda r: r), 0.5),
+    Scenario('locations.distance', ['GET /locations/distance'],
+             get(lambda ctx: f"/locations/distance?{lane_query(ctx)}"), 1),
+    Scenario('locations.distance_batch_200', ['POST /locations/distance'], distance_batch, 1),
+    Scenario('compliance.expiring', ['GET /compliance/expiring'], get('/compliance/expiring?days=30'), 1),
+    Scenario('compliance.maintenance_due', ['GET /compliance/maintenance-due'],
+             get('/compliance/maintenance-due', rows=lambda r: r), 1),
+]
+
+
+def uncovered_routes(app):
+    """'METHOD /rule' for every route no scenario exercises."""
+    covered = {c for s in SCENARIOS for c in s.covers}
+    routes = {f'{method} {rule.rule}' for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+              for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    return sorted(routes - covered)
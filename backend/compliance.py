@@ -0,0 +1,187 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, or_, select, update
+from datetime import datetime, date, timedelta
+import threading
+import time
+from auth import auth_required
+from models import db, Driver, Vehicle, MaintenanceLog
+
+# ─────────────────────────────────────────
+# COMPLIANCE
+# ─────────────────────────────────────────
+# GET /compliance/expiring?days=30[&include_expired=true]
+#   drivers whose license expires within `days` (a range on ix_driver_license_expiry)
+# GET /compliance/maintenance-due[?days=180&km=10000]
+#   vehicles not serviced within `days`, or driven more than `km` since their last
+#   service (ix_vehicle_last_service_date / ix_vehicle_km_since_service_v2)
+# Each process also runs sweep() every COMPLIANCE_SWEEP_INTERVAL seconds from a
+# daemon thread started by its first request: drivers with an expired license who
+# aren't on a trip are suspended, and the maintenance-due count is logged.
+# `flask compliance sweep` runs the same pass once.
+
+compliance_bp = Blueprint('compliance', __name__)
+
+MAX_WINDOW_DAYS = 3650
+SUSPENDABLE = ('off_duty', 'on_duty')     # on_trip drivers are suspended once the trip ends
+
+
+def expiring_query(today, days, include_expired=False):
+    stmt = select(Driver.id, Driver.name, Driver.license_number, Driver.license_category,
+                  Driver.license_expiry, Driver.status).where(Driver.license_expiry <= today + timedelta(days=days))
+    if not include_expired:
+        stmt = stmt.where(Driver.license_expiry >= today)
+    return stmt.order_by(Driver.license_expiry, Driver.id)
+
+
+def maintenance_due_query(today, days, km):
+    cutoff = today - timedelta(days=days)
+    km_since = Vehicle.km_since_service()
+    return select(
+        Vehicle.id, Vehicle.plate, Vehicle.name, Vehicle.status, Vehicle.odometer,
+        Vehicle.last_service_date, Vehicle.last_service_odometer, Vehicle.created_at, km_since.label('km_since'),
+    ).where(
+        or_(Vehicle.last_service_date < cutoff,
+            # never serviced: due once the vehicle itself is older than the interval
+            and_(Vehicle.last_service_date.is_(None), Vehicle.created_at < datetime.combine(cutoff, datetime.min.time())),
+            km_since > km),
+        Vehicle.status != 'retired',
+    )  # no ORDER BY: ordering by id makes SQLite prefer a rowid scan over the OR'd indexes
+
+
+def maintenance_due(today, days, km):
+    due = []
+    for r in sorted(db.session.execute(maintenance_due_query(today, days, km)), key=lambda r: r.id):
+        serviced = r.last_service_date or (r.created_at.date() if r.created_at else None)
+        reasons = []
+        if r.last_service_date is None:
+            reasons.append('never_serviced')
+        if serviced and (today - serviced).days > days:
+            reasons.append('overdue_days')
+        if r.km_since > km:
+            reasons.append('overdue_km')
+        due.append({
+            'vehicle_id': r.id, 'plate': r.plate, 'name': r.name, 'status': r.status,
+            'odometer': r.odometer,
+            'last_service_date': r.last_service_date.isoformat() if r.last_service_date else None,
+            'last_service_odometer': r.last_service_odometer,
+            'days_since_service': (today - serviced).days if serviced else None,
+            'km_since_service': round(r.km_since, 1),
+            'reasons': reasons,
+        })
+    return due
+
+
+def record_service(vehicle, log):
+    """Advance the vehicle's last service to `log` unless it is older than the one recorded."""
+    if vehicle.last_service_date is None or log.date >= vehicle.last_service_date:
+        vehicle.last_service_date = log.date
+        vehicle.last_service_odometer = vehicle.odometer
+
+
+def backfill_service_history():
+    """Fill last_service_date from the maintenance logs when the column is first added.
+    Past odometer readings weren't recorded, so km since service counts from now."""
+    last = select(func.max(MaintenanceLog.date)).where(
+        MaintenanceLog.vehicle_id == Vehicle.id).scalar_subquery()
+    db.session.execute(update(Vehicle.__table__).values(
+        last_service_date=last, last_service_odometer=Vehicle.__table__.c.odometer))
+    db.session.commit()
+
+
+def expired_licenses(today):
+    """Conditions for drivers with a license expired before `today` who aren't suspended yet."""
+    return [Driver.license_expiry < today, Driver.status.in_(SUSPENDABLE)]
+
+
+def suspend_expired_licenses(today):
+    """Suspend drivers whose license expired before `today`; returns their ids."""
+    d = Driver.__table__.c
+    stmt = update(Driver.__table__).where(*expired_licenses(today)).values(
+        status='suspended', version=d.version + 1).returning(d.id)
+    suspended = list(db.session.execute(stmt).scalars())
+    db.session.commit()
+    return suspended
+
+
+def sweep():
+    config = current_app.config
+    today = date.today()
+    suspended = suspend_expired_licenses(today)
+    due = maintenance_due(today, config['MAINTENANCE_INTERVAL_DAYS'], config['MAINTENANCE_INTERVAL_KM'])
+    current_app.logger.info('Compliance sweep: suspended %d driver(s), %d vehicle(s) due for maintenance',
+                            len(suspended), len(due))
+    return suspended, due
+
+
+def run_sweeps(app, interval):
+    while True:
+        with app.app_context():
+            try:
+                sweep()
+            except Exception:
+                app.logger.exception('Compliance sweep failed')
+        time.sleep(interval)
+
+
+_sweeper_lock = threading.Lock()
+
+@compliance_bp.before_app_request
+def start_sweeper():
+    # Started here rather than in create_app() so each forked worker gets its own thread
+    app = current_app._get_current_object()
+    if 'compliance_sweeper' in app.extensions:
+        return
+    with _sweeper_lock:
+        if 'compliance_sweeper' in app.extensions:
+            return
+        interval = app.config['COMPLIANCE_SWEEP_INTERVAL']
+        thread = None
+        if interval > 0:
+            thread = threading.Thread(target=run_sweeps, args=(app, interval), name='compliance-sweep', daemon=True)
+            thread.start()
+        app.extensions['compliance_sweeper'] = thread
+
+
+def bounded_int(name, default, maximum):
+    value = int(request.args.get(name, default))
+    if not 0 <= value <= maximum:
+        raise ValueError(name)
+    return value
+
+
+@compliance_bp.route('/compliance/expiring', methods=['GET'])
+@auth_required()
+def compliance_expiring():
+    try:
+        days = bounded_int('days', 30, MAX_WINDOW_DAYS)
+    except ValueError:
+        return jsonify({'error': f'days must be an integer between 0 and {MAX_WINDOW_DAYS}'}), 400
+    today = date.today()
+    include_expired = request.args.get('include_expired', '').lower() in ('1', 'true', 'yes')
+    return jsonify([{
+        'driver_id': r.id, 'name': r.name, 'license_number': r.license_number,
+        'license_category': r.license_category, 'license_expiry': r.license_expiry.isoformat(),
+        'days_left': (r.license_expiry - today).days, 'status': r.status,
+    } for r in db.session.execute(expiring_query(today, days, include_expired))])
+
+
+@compliance_bp.route('/compliance/maintenance-due', methods=['GET'])
+@auth_required()
+def compliance_maintenance_due():
+    config = current_app.config
+    try:
+        days = bounded_int('days', config['MAINTENANCE_INTERVAL_DAYS'], MAX_WINDOW_DAYS)
+        km = float(request.args.get('km', config['MAINTENANCE_INTERVAL_KM']))
+    except ValueError:
+        return jsonify({'error': f'days must be an integer between 0 and {MAX_WINDOW_DAYS} and km a number'}), 400
+    return jsonify(maintenance_due(date.today(), days, km))
+
+
+compliance_cli = AppGroup('compliance', help='License and maintenance compliance.')
+
+@compliance_cli.command('sweep')
+def compliance_sweep_command():
+    """Suspend drivers with expired licenses and report vehicles due for maintenance."""
+    suspended, due = sweep()
+    print(f'Suspended {len(suspended)} driver(s); {len(due)} vehicle(s) due for maintenance')
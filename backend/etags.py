@@ -0,0 +1,134 @@
+from flask import current_app, g, request
+from sqlalchemy import bindparam, event, func, insert, select, update
+from datetime import date
+from functools import wraps
+from itertools import chain
+import hashlib
+import random
+import secrets
+from models import db, TableVersion
+
+# ─────────────────────────────────────────
+# CONDITIONAL GETS
+# ─────────────────────────────────────────
+# Every table has a change counter in table_counter. The session hooks below
+# note which tables a transaction wrote to (ORM flushes and Core INSERT/UPDATE/
+# DELETE run through db.session alike) and bump their counters in the same
+# transaction, just before it commits, so no write path has to remember to.
+#
+# The bump row-locks the counter until the commit. So that concurrent writers to
+# one table don't queue behind each other's commits (PostgreSQL takes real row
+# locks; SQLite has a single writer anyway), each counter is split into
+# VERSION_SHARDS rows. A transaction bumps one shard picked at random, and a
+# table's version is the sum of its shards; two writers only wait for each other
+# when they pick the same shard. A sequence would never block either, but
+# nextval() is visible before the commit, so a reader could tag the old rows
+# with the new version and keep them as current.
+#
+# Read endpoints decorated with @conditional(Model, ...) answer with a strong
+# ETag over the counters of the tables they read, their path and query string,
+# and today's date when the answer depends on it. A GET whose If-None-Match still
+# matches gets 304 after one primary-key lookup, before the view runs.
+#
+# The counters are read before the view, so a write landing mid-request can only
+# leave the tag older than the body, never newer; the next poll picks it up.
+# They start at a random value, so a recreated database never hands out a tag
+# that clients cached against the old one.
+
+VERSION_SHARDS = 16
+VERSIONS = TableVersion.__table__
+# Built once: these run on every commit and every conditional GET
+READ_VERSIONS = select(VERSIONS.c.name, func.sum(VERSIONS.c.version)).where(
+    VERSIONS.c.name.in_(bindparam('names', expanding=True))).group_by(VERSIONS.c.name)
+BUMP_VERSIONS = update(VERSIONS).where(VERSIONS.c.name.in_(bindparam('names', expanding=True)),
+                                       VERSIONS.c.shard == bindparam('pick')).values(version=VERSIONS.c.version + 1)
+
+
+def initial_version(shard):
+    return secrets.randbits(48) if shard == 0 else 0
+
+
+def note_changed(session, names):
+    session.info.setdefault('changed_tables', set()).update(names)
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_flushed(session, flush_context):
+    note_changed(session, {obj.__table__.name for obj in chain(session.new, session.deleted)} |
+                 {obj.__table__.name for obj in session.dirty if session.is_modified(obj)})
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def note_statement(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        name = state.statement.table.name
+        if name != VERSIONS.name:
+            note_changed(state.session, {name})
+
+
+@event.listens_for(db.session, 'before_commit')
+def bump_changed(session):
+    session.flush()                       # commit's own flush comes after this hook
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        bump_versions(session, sorted(changed))     # same order everywhere, so row locks can't deadlock
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed(session):
+    session.info.pop('changed_tables', None)
+
+
+def bump_versions(session, names):
+    shard = random.randrange(VERSION_SHARDS)
+    if session.execute(BUMP_VERSIONS, {'names': names, 'pick': shard}).rowcount < len(names):
+        seed_versions(session, names)
+        session.execute(BUMP_VERSIONS, {'names': names, 'pick': shard})
+
+
+def seed_versions(session, names):
+    keys = [(n, shard) for n in names for shard in range(VERSION_SHARDS)]
+    existing = set(session.execute(select(VERSIONS.c.name, VERSIONS.c.shard).where(
+        VERSIONS.c.name.in_(names))).all())
+    missing = [{'name': n, 'shard': shard, 'version': initial_version(shard)}
+               for n, shard in keys if (n, shard) not in existing]
+    if missing:
+        session.execute(insert(VERSIONS), missing)
+
+
+def seed_table_versions():
+    """Give every table a counter, so concurrent first writes never race to create one."""
+    seed_versions(db.session, [t.name for t in db.metadata.sorted_tables])
+    db.session.commit()
+
+
+def table_versions(names):
+    return dict(db.session.execute(READ_VERSIONS, {'names': names}).all())
+
+
+def conditional(*models, daily=False):
+    """ETag and If-None-Match handling for a GET that reads `models`; `daily` for
+    answers that also depend on today's date (license validity, default ranges)."""
+    names = sorted(m.__tablename__ for m in models)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            g.table_versions = versions = table_versions(names)
+            key = [request.path, sorted(request.args.items(multi=True)), [versions.get(n) for n in names]]
+            if daily:
+                key.append(date.today().isoformat())
+            tag = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+            if request.if_none_match.contains_weak(tag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(tag)
+            response.headers['Cache-Control'] = 'no-cache'     # always revalidate; 304s are cheap
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,341 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import DateTime, insert, literal, select
+from datetime import datetime, date, timedelta, timezone
+from bisect import bisect_right
+from collections import Counter
+import json
+import threading
+import time
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib parser is used without it
+    orjson = None
+from auth import auth_required
+from models import db, Vehicle, StatusEvent, StateCheckpoint
+from rollups import MAX_BUCKETS, bucket_start, next_bucket
+
+# ─────────────────────────────────────────
+# FLEET HISTORY
+# ─────────────────────────────────────────
+# Every change to a vehicle's status or odometer appends a StatusEvent in the
+# same transaction. A StateCheckpoint holds the whole fleet's state at one
+# moment; the state at any time T is the latest checkpoint at or before T plus
+# the events after it, so a query replays at most one checkpoint interval of
+# events however long the history is.
+#
+# GET /fleet/state?at=2025-06-01T14:00[&vehicle_type=Truck&region=North&vehicles=true]
+#   status counts (and optionally each vehicle's status and odometer) at `at`
+# GET /analytics/utilization?from=2025-01-01&to=2025-06-30&bucket=day|week|month
+#   vehicle-hours per status and utilization per bucket, swept over the events
+#
+# Each process writes a checkpoint every STATE_CHECKPOINT_INTERVAL seconds from a
+# daemon thread started by its first request (`flask history checkpoint` writes
+# one now). Checkpoints stop CHECKPOINT_LAG short of the present so that events
+# stamped just before one but committed just after it are still replayed.
+# Vehicle type and region filters use the vehicles' current attributes.
+
+history_bp = Blueprint('history', __name__)
+
+CHECKPOINT_LAG = timedelta(seconds=60)
+REPLAY_CHUNK = 5000
+
+
+class HistoryUnavailable(Exception):
+    pass
+
+
+# ── writes ────────────────────────────────
+
+def record_status(vehicle_id, status, odometer=None):
+    """Append one status event to the current transaction."""
+    db.session.add(StatusEvent(vehicle_id=vehicle_id, status=status, odometer=odometer, at=datetime.utcnow()))
+
+
+def record_created(plates):
+    """Append the first event of each newly inserted vehicle, found by plate, in one statement."""
+    if plates:
+        db.session.execute(insert(StatusEvent).from_select(
+            ['vehicle_id', 'status', 'odometer', 'at'],
+            select(Vehicle.id, Vehicle.status, Vehicle.odometer, literal(datetime.utcnow(), DateTime))
+            .where(Vehicle.plate.in_(plates))))
+
+
+# ── replay ────────────────────────────────
+
+def load_state(text):
+    raw = orjson.loads(text) if orjson else json.loads(text)
+    return {int(vid): entry for vid, entry in raw.items()}
+
+
+def dump_state(state):
+    return orjson.dumps(state, option=orjson.OPT_NON_STR_KEYS).decode() if orjson else json.dumps(state)
+
+
+def apply_event(state, vehicle_id, status, odometer):
+    if status == 'deleted':
+        state.pop(vehicle_id, None)
+        return
+    entry = state.get(vehicle_id)
+    if entry is None:
+        state[vehicle_id] = [status, odometer]
+    else:
+        entry[0] = status
+        if odometer is not None:
+            entry[1] = odometer
+
+
+def events_between(after, until):
+    """(vehicle_id, status, odometer, at) for events in (after, until], oldest first."""
+    e = StatusEvent.__table__.c
+    stmt = select(e.vehicle_id, e.status, e.odometer, e.at).where(e.at <= until)
+    if after is not None:
+        stmt = stmt.where(e.at > after)
+    return db.session.execute(stmt.order_by(e.at, e.id).execution_options(yield_per=REPLAY_CHUNK))
+
+
+def history_start():
+    """When recorded history begins: the latest base checkpoint, or None if every change was recorded."""
+    return db.session.execute(
+        select(StateCheckpoint.at).where(StateCheckpoint.base.is_(True)).order_by(StateCheckpoint.at.desc()).limit(1)
+    ).scalar()
+
+
+def state_at(at):
+    """({vehicle_id: [status, odometer]}, checkpoint time, events replayed) as of `at`."""
+    start = history_start()
+    if start is not None and at < start:
+        raise HistoryUnavailable(f'History starts at {start.isoformat()}')
+    checkpoint = db.session.execute(
+        select(StateCheckpoint.at, StateCheckpoint.state).where(StateCheckpoint.at <= at)
+        .order_by(StateCheckpoint.at.desc(), StateCheckpoint.id.desc()).limit(1)).first()
+    state = load_state(checkpoint.state) if checkpoint else {}
+    replayed = 0
+    for vehicle_id, status, odometer, _ in events_between(checkpoint.at if checkpoint else None, at):
+        apply_event(state, vehicle_id, status, odometer)
+        replayed += 1
+    return state, checkpoint.at if checkpoint else None, replayed
+
+
+# ── checkpoints ───────────────────────────
+
+def write_checkpoint(at=None):
+    """Snapshot the fleet as of `at` (default: now less CHECKPOINT_LAG) and commit it."""
+    at = at or datetime.utcnow() - CHECKPOINT_LAG
+    state, _, _ = state_at(at)
+    checkpoint = StateCheckpoint(at=at, state=dump_state(state))
+    db.session.add(checkpoint)
+    db.session.commit()
+    return checkpoint
+
+
+def write_base_checkpoint():
+    """Record the current tables as the start of history, for fleets that predate the event log.
+    Returns False if there's nothing to record or history has already started."""
+    if db.session.query(StateCheckpoint.id).first() or db.session.query(StatusEvent.id).first():
+        return False
+    state = {vid: [status, odometer] for vid, status, odometer in
+             db.session.execute(select(Vehicle.id, Vehicle.status, Vehicle.odometer))}
+    if not state:
+        return False
+    db.session.add(StateCheckpoint(at=datetime.utcnow(), state=dump_state(state), base=True))
+    db.session.commit()
+    return True
+
+
+def checkpoint_due(interval):
+    last = db.session.execute(select(StateCheckpoint.at).order_by(StateCheckpoint.at.desc()).limit(1)).scalar()
+    if last is not None and last > datetime.utcnow() - CHECKPOINT_LAG - timedelta(seconds=interval):
+        return False                           # another worker wrote one recently
+    stmt = select(StatusEvent.id).limit(1)
+    if last is not None:
+        stmt = stmt.where(StatusEvent.at > last)
+    return db.session.execute(stmt).first() is not None
+
+
+def run_checkpoints(app, interval):
+    while True:
+        with app.app_context():
+            try:
+                if checkpoint_due(interval):
+                    write_checkpoint()
+            except Exception:
+                app.logger.exception('State checkpoint failed')
+        time.sleep(interval)
+
+
+_checkpointer_lock = threading.Lock()
+
+@history_bp.before_app_request
+def start_checkpointer():
+    # Started here rather than in create_app() so each forked worker gets its own thread
+    app = current_app._get_current_object()
+    if 'state_checkpointer' in app.extensions:
+        return
+    with _checkpointer_lock:
+        if 'state_checkpointer' in app.extensions:
+            return
+        interval = app.config['STATE_CHECKPOINT_INTERVAL']
+        thread = None
+        if interval > 0:
+            thread = threading.Thread(target=run_checkpoints, args=(app, interval), name='state-checkpoint',
+                                      daemon=True)
+            thread.start()
+        app.extensions['state_checkpointer'] = thread
+
+
+# ── utilization ───────────────────────────
+
+def utilization(start, end, edges, vehicle_ids=None):
+    """Seconds each status was held, summed over vehicles, per bucket [edges[i], edges[i+1]).
+
+    The fleet is rebuilt once at `start`; after that each event only moves one
+    vehicle between the running status counts.
+    """
+    state, _, _ = state_at(start)
+    statuses = {vid: entry[0] for vid, entry in state.items() if vehicle_ids is None or vid in vehicle_ids}
+    counts = Counter(statuses.values())
+    seconds = [Counter() for _ in edges[:-1]]
+    cursor, i = start, bisect_right(edges, start) - 1
+
+    def advance(until):
+        nonlocal cursor, i
+        while cursor < until:
+            edge = edges[i + 1]
+            step = min(until, edge)
+            span = (step - cursor).total_seconds()
+            for status, n in counts.items():
+                if n:
+                    seconds[i][status] += n * span
+            cursor = step
+            if step == edge:
+                i += 1
+
+    for vehicle_id, status, _, at in events_between(start, end):
+        if vehicle_ids is not None and vehicle_id not in vehicle_ids:
+            continue
+        advance(at)
+        old = statuses.pop(vehicle_id, None)
+        if old is not None:
+            counts[old] -= 1
+        if status != 'deleted':
+            statuses[vehicle_id] = status
+            counts[status] += 1
+    advance(end)
+    return seconds
+
+
+# ── routes ────────────────────────────────
+
+def parse_time(value):
+    at = datetime.fromisoformat(value)
+    if at.tzinfo is not None:                  # stored times are naive UTC
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+def filtered_vehicles():
+    """{id: vehicle_type} for the vehicles matching ?vehicle_type= and ?region=."""
+    stmt = select(Vehicle.id, Vehicle.vehicle_type)
+    if t := request.args.get('vehicle_type'):
+        stmt = stmt.where(Vehicle.vehicle_type == t)
+    if r := request.args.get('region'):
+        stmt = stmt.where(Vehicle.region == r)
+    return dict(db.session.execute(stmt).all())
+
+
+def utilization_rate(on_trip, total):
+    # Same definition as the dashboard: on_trip over every vehicle, retired included
+    return round(on_trip / total * 100, 1) if total else 0
+
+
+@history_bp.route('/fleet/state', methods=['GET'])
+@auth_required()
+def fleet_state():
+    try:
+        at = parse_time(request.args['at']) if request.args.get('at') else datetime.utcnow()
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO date or datetime'}), 400
+    try:
+        state, checkpoint_at, replayed = state_at(at)
+    except HistoryUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+
+    types = filtered_vehicles()
+    filtered = bool(request.args.get('vehicle_type') or request.args.get('region'))
+    by_status, by_type = Counter(), {}
+    for vid, (status, _) in state.items():
+        if filtered and vid not in types:
+            continue
+        by_status[status] += 1
+        vtype = types.get(vid) or 'unknown'      # deleted since, or never typed
+        by_type.setdefault(vtype, Counter())[status] += 1
+    total = sum(by_status.values())
+    result = {
+        'at': at.isoformat(),
+        'checkpoint_at': checkpoint_at.isoformat() if checkpoint_at else None,
+        'events_replayed': replayed,
+        'total': total,
+        'by_status': dict(by_status),
+        'by_vehicle_type': {t: dict(c) for t, c in by_type.items()},
+        'utilization_rate': utilization_rate(by_status['on_trip'], total),
+    }
+    if request.args.get('vehicles', '').lower() in ('1', 'true', 'yes'):
+        result['vehicles'] = [{'vehicle_id': vid, 'status': status, 'odometer': odometer}
+                              for vid, (status, odometer) in sorted(state.items())
+                              if not filtered or vid in types]
+    return jsonify(result)
+
+
+@history_bp.route('/analytics/utilization', methods=['GET'])
+@auth_required()
+def analytics_utilization():
+    # ?from=2025-01-01&to=2025-01-31&bucket=day|week|month (default: the trailing 30 days by day)
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ('day', 'week', 'month'):
+        return jsonify({'error': 'bucket must be one of day, week, month'}), 400
+    try:
+        last = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+        first = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO dates (YYYY-MM-DD)'}), 400
+    begins = None
+    if first is None:
+        first = last - timedelta(days=29)
+        if (begins := history_start()) is not None:
+            first = min(max(first, begins.date()), last)
+    if first > last:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if ((last - first).days + 1) // {'day': 1, 'week': 7, 'month': 28}[bucket] > MAX_BUCKETS:
+        return jsonify({'error': f'Range spans more than {MAX_BUCKETS} buckets'}), 400
+
+    periods = [bucket_start(first, bucket)]
+    while periods[-1] <= last:
+        periods.append(next_bucket(periods[-1], bucket))
+    edges = [datetime.combine(p, datetime.min.time()) for p in periods]
+    start = datetime.combine(first, datetime.min.time())
+    if begins is not None:
+        start = max(start, begins)           # the default range starts no earlier than the history
+    end = min(datetime.combine(last + timedelta(days=1), datetime.min.time()), datetime.utcnow())
+    if end <= start:
+        return jsonify({'error': 'from must not be in the future'}), 400
+
+    filtered = bool(request.args.get('vehicle_type') or request.args.get('region'))
+    try:
+        seconds = utilization(start, end, edges, set(filtered_vehicles()) if filtered else None)
+    except HistoryUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify([{
+        'period': period.isoformat(),
+        'vehicle_hours': {status: round(s / 3600, 1) for status, s in sorted(held.items()) if s},
+        'utilization_rate': utilization_rate(held['on_trip'], sum(held.values())),
+    } for period, held in zip(periods, seconds)])
+
+
+history_cli = AppGroup('history', help='Fleet status history.')
+
+@history_cli.command('checkpoint')
+def history_checkpoint_command():
+    """Write a state checkpoint now, so later replays start from it."""
+    checkpoint = write_checkpoint()
+    print(f'Checkpoint written at {checkpoint.at.isoformat()}')
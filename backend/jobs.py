@@ -0,0 +1,213 @@
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlsplit
+import hashlib
+import inspect
+import json
+import threading
+from auth import auth_required
+from models import db, Job
+
+# ─────────────────────────────────────────
+# JOBS
+# ─────────────────────────────────────────
+# POST /jobs {"path": "/analytics/monthly", "params": {"bucket": "day"}}
+#   runs a heavy report on a per-process pool of JOB_WORKERS threads instead of
+#   the request thread; answers 202 with the job, or 200 if its result is cached
+# GET /jobs/<id>          status, polled until done or failed
+# GET /jobs/<id>/result   the report's response body, as the route would return it
+#
+# The report is the same view function that serves the GET route, run with the
+# job's parameters. Jobs are keyed by a hash of path and parameters: while one is
+# queued, running, or done and younger than JOB_RESULT_TTL, identical submissions
+# from any worker process get that job back instead of starting another. Failed,
+# expired and abandoned (older than JOB_TIMEOUT) jobs are re-run on the next
+# identical submission. Results live in the job table until they expire; expired
+# rows are purged by the pool as it finishes jobs, or by `flask jobs purge`.
+#
+# Jobs and their results are shared: identical submissions from different users
+# get the same job, and any authenticated user can read any job's result. Only
+# fleet-wide reports that every role may GET, and whose output doesn't depend on
+# the caller, belong in JOB_ENDPOINTS. Exports aren't among them because they
+# already stream row by row, and a job would buffer the whole file in Job.result.
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Endpoints that may run as jobs: the reports that scan whole tables
+JOB_ENDPOINTS = ('fleet.analytics', 'fleet.driver_analytics', 'fleet.analytics_monthly',
+                 'analytics.analytics_breakdown', 'history.analytics_utilization')
+ACTIVE = ('queued', 'running')
+
+_pool_lock = threading.Lock()
+
+
+def job_pool():
+    # Created on first use rather than in create_app() so forked workers each get their own threads
+    app = current_app._get_current_object()
+    pool = app.extensions.get('job_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('job_pool')
+            if pool is None:
+                pool = app.extensions['job_pool'] = ThreadPoolExecutor(
+                    app.config['JOB_WORKERS'], thread_name_prefix='job')
+    return pool
+
+
+def resolve(path):
+    """(endpoint, view args) of the report at `path`; ValueError unless it may run as a job."""
+    try:
+        endpoint, view_args = current_app.url_map.bind('localhost').match(path, method='GET')
+    except HTTPException:
+        endpoint = None
+    if endpoint not in JOB_ENDPOINTS:
+        paths = sorted({r.rule for r in current_app.url_map.iter_rules() if r.endpoint in JOB_ENDPOINTS})
+        raise ValueError(f"path must be one of {', '.join(paths)}")
+    return endpoint, view_args
+
+
+def job_key(path, params):
+    return hashlib.sha256(json.dumps([path, params], sort_keys=True).encode()).hexdigest()
+
+
+def submit(path, params, user_id):
+    """The job computing `path` with `params`, and whether this call queued it."""
+    now = datetime.utcnow()
+    key = job_key(path, params)
+    job = Job.query.filter_by(key=key).first()
+    if job is not None and job.status != 'failed' and job.expires_at > now:
+        return job, False
+
+    values = dict(path=path, params=json.dumps(params, sort_keys=True), status='queued', result=None,
+                  result_type=None, result_status=None, error=None, created_by=user_id, created_at=now,
+                  started_at=None, finished_at=None,
+                  expires_at=now + timedelta(seconds=current_app.config['JOB_TIMEOUT']))
+    if job is None:
+        job = Job(key=key, **values)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:                    # an identical job was just submitted elsewhere
+            db.session.rollback()
+            return Job.query.filter_by(key=key).one(), False
+    else:
+        # Take over the failed or expired row, unless another request just did
+        j = Job.__table__.c
+        stmt = update(Job.__table__).where(j.id == job.id, or_(j.status == 'failed', j.expires_at <= now)).values(
+            **values)
+        claimed = db.session.execute(stmt).rowcount == 1
+        db.session.commit()
+        db.session.expire(job)
+        if not claimed:
+            current = Job.query.filter_by(key=key).first()
+            if current is None:                   # purged by a finishing job meanwhile; submit it afresh
+                return submit(path, params, user_id)
+            return current, False
+    job_pool().submit(run_job, current_app._get_current_object(), job.id)
+    return job, True
+
+
+def render(app, job):
+    """Run the job's report view as its GET route would; returns (status, body, content type)."""
+    endpoint, view_args = resolve(job.path)
+    view = inspect.unwrap(app.view_functions[endpoint])   # auth was checked when the job was submitted
+    with app.test_request_context(job.path, query_string=json.loads(job.params)):
+        g.user_id, g.role = str(job.created_by), None
+        try:
+            response = app.make_response(view(**view_args))
+        except HTTPException as e:
+            return e.code, json.dumps({'error': e.description}).encode(), 'application/json'
+        return response.status_code, response.get_data(), response.content_type
+
+
+def error_message(status, body):
+    try:
+        return str(json.loads(body)['error'])[:500]
+    except (ValueError, KeyError, TypeError):
+        return f'Report answered {status}'
+
+
+def run_job(app, job_id):
+    with app.app_context():
+        started = datetime.utcnow()
+        j = Job.__table__.c
+        claimed = db.session.execute(update(Job.__table__).where(j.id == job_id, j.status == 'queued').values(
+            status='running', started_at=started)).rowcount
+        db.session.commit()
+        if not claimed:
+            return
+        try:
+            status, body, content_type = render(app, db.session.get(Job, job_id))
+        except Exception:
+            app.logger.exception('Job %s failed', job_id)
+            db.session.rollback()
+            status, body, content_type = 500, json.dumps({'error': 'Report failed'}).encode(), 'application/json'
+        finished = datetime.utcnow()
+        # Only the run that started this attempt records it; an abandoned run may have been superseded
+        db.session.execute(update(Job.__table__).where(j.id == job_id, j.started_at == started).values(
+            status='done' if status == 200 else 'failed', result=body, result_type=content_type,
+            result_status=status, error=None if status == 200 else error_message(status, body),
+            finished_at=finished, expires_at=finished + timedelta(seconds=app.config['JOB_RESULT_TTL'])))
+        db.session.commit()
+        purge(finished)
+
+
+def expired_jobs(now):
+    return Job.expires_at < now
+
+
+def purge(now=None):
+    """Delete jobs past their expiry; returns how many."""
+    deleted = db.session.execute(delete(Job).where(expired_jobs(now or datetime.utcnow()))).rowcount
+    db.session.commit()
+    return deleted
+
+
+@jobs_bp.route('/jobs', methods=['POST'])
+@auth_required()
+def create_job():
+    data = request.get_json(silent=True) or {}
+    path, params = data.get('path'), data.get('params') or {}
+    if not isinstance(path, str) or not isinstance(params, dict) or \
+            not all(isinstance(v, (str, int, float, bool)) for v in params.values()):
+        return jsonify({'error': 'path must be a string and params an object of scalar values'}), 400
+    parts = urlsplit(path)
+    query = dict(parse_qsl(parts.query))
+    query.update({k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in params.items()})
+    try:
+        resolve(parts.path)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    job, _ = submit(parts.path, query, int(g.user_id))
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response, 202 if job.status in ACTIVE else 200
+
+
+@jobs_bp.route('/jobs/<int:jid>', methods=['GET'])
+@auth_required()
+def job_detail(jid):
+    job = Job.query.get_or_404(jid)
+    return jsonify(job.to_dict())
+
+
+@jobs_bp.route('/jobs/<int:jid>/result', methods=['GET'])
+@auth_required()
+def job_result(jid):
+    job = Job.query.get_or_404(jid)
+    if job.status in ACTIVE:
+        return jsonify({'error': f'Job is {job.status}'}), 409
+    return Response(job.result, status=job.result_status, content_type=job.result_type)
+
+
+jobs_cli = AppGroup('jobs', help='Background report jobs.')
+
+@jobs_cli.command('purge')
+def jobs_purge_command():
+    """Delete expired jobs and their results."""
+    print(f'Purged {purge()} expired job(s)')
@@ -0,0 +1,277 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import func, select, tuple_
+from collections import OrderedDict
+import click
+import csv
+import math
+import threading
+import time
+from auth import auth_required
+from models import db, Location, Lane, Trip, VehicleReadingState, VehicleRollup, MonthlyRollup
+from rollups import bump_rollup, trip_km_expr
+from archive import with_archive
+
+# ─────────────────────────────────────────
+# LOCATIONS & LANE DISTANCES
+# ─────────────────────────────────────────
+# `flask locations load places.csv` (columns name, latitude, longitude) fills the
+# Location table; Trip.origin and Trip.destination are matched against it by
+# name, ignoring case and spacing. A lane's distance starts as the great-circle
+# distance times ROAD_FACTOR and moves toward the mean odometer km of the trips
+# completed on it, weighted as if the great-circle guess were PRIOR_TRIPS trips.
+#
+# POST /trips fills in estimated_distance_km, and estimated_fuel_cost unless the
+# dispatcher gave one, from the vehicle's km/L (the anomaly EWMA) and its average
+# fuel price, falling back to fleet-wide figures.
+#
+# Each process keeps every location in memory (reloaded after LANE_CACHE_TTL)
+# and the history of recently used lanes in an LRU of LANE_CACHE_SIZE entries,
+# so an estimate is a few dict lookups. Completing a trip updates the Lane row in
+# the same transaction; other processes see it once their entry expires.
+#
+# GET  /locations
+# GET  /locations/distance?origin=Pune&destination=Mumbai
+# POST /locations/distance {"lanes": [{"origin": "Pune", "destination": "Mumbai"}, ...]}
+
+locations_bp = Blueprint('locations', __name__)
+
+EARTH_RADIUS_KM = 6371.0088
+ROAD_FACTOR = 1.3             # road km per great-circle km before a lane has history
+PRIOR_TRIPS = 3
+MAX_LANES = 1000              # per POST /locations/distance
+
+
+def location_key(name):
+    return ' '.join(name.split()).casefold() if isinstance(name, str) else None
+
+
+def great_circle_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# ── caches ────────────────────────────────
+
+class LaneCache:
+    """LRU of (origin id, destination id) -> (completed trips, km), each entry kept at most `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.entries = OrderedDict()          # lane -> (value, expires)
+        self.lock = threading.Lock()
+
+    def get(self, lane):
+        with self.lock:
+            entry = self.entries.get(lane)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.entries[lane]
+                return None
+            self.entries.move_to_end(lane)
+            return entry[0]
+
+    def put(self, lane, value):
+        with self.lock:
+            self.entries[lane] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(lane)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, lane):
+        with self.lock:
+            self.entries.pop(lane, None)
+
+
+def lane_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('lane_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('lane_cache', LaneCache(app.config['LANE_CACHE_SIZE'],
+                                                                  app.config['LANE_CACHE_TTL']))
+    return cache
+
+
+def location_index():
+    """{key: (id, name, latitude, longitude)} for every location, reloaded after LANE_CACHE_TTL."""
+    app = current_app._get_current_object()
+    loaded = app.extensions.get('location_index')
+    if loaded is None or loaded[0] <= time.monotonic():
+        index = {key: (lid, name, lat, lon) for lid, key, name, lat, lon in db.session.execute(
+            select(Location.id, Location.key, Location.name, Location.latitude, Location.longitude))}
+        loaded = app.extensions['location_index'] = (time.monotonic() + app.config['LANE_CACHE_TTL'], index)
+    return loaded[1]
+
+
+def forget_locations():
+    current_app.extensions.pop('location_index', None)
+
+
+# ── estimates ─────────────────────────────
+
+def lane_history(lanes):
+    """{(origin id, destination id): (completed trips, km)} for `lanes`, from the LRU or one query."""
+    cache = lane_cache()
+    history, missing = {}, []
+    for lane in lanes:
+        value = cache.get(lane)
+        if value is None:
+            missing.append(lane)
+        else:
+            history[lane] = value
+    if missing:
+        found = {(o, d): (n or 0, km or 0.0) for o, d, n, km in db.session.execute(
+            select(Lane.origin_id, Lane.destination_id, Lane.completed_trips, Lane.km).where(
+                tuple_(Lane.origin_id, Lane.destination_id).in_(missing)))}
+        for lane in missing:
+            history[lane] = found.get(lane, (0, 0.0))
+            cache.put(lane, history[lane])
+    return history
+
+
+def estimate_distances(pairs):
+    """Distance estimates for (origin, destination) name pairs, None where either place is unknown."""
+    index = location_index()
+    places = [(index.get(location_key(o)), index.get(location_key(d))) for o, d in pairs]
+    history = lane_history({(o[0], d[0]) for o, d in places if o and d})
+    estimates = []
+    for origin, destination in places:
+        if not origin or not destination:
+            estimates.append(None)
+            continue
+        straight = great_circle_km(origin[2], origin[3], destination[2], destination[3])
+        trips, km = history[(origin[0], destination[0])]
+        estimates.append({
+            'origin': origin[1], 'destination': destination[1],
+            'km': round((km + PRIOR_TRIPS * straight * ROAD_FACTOR) / (trips + PRIOR_TRIPS), 1),
+            'great_circle_km': round(straight, 1),
+            'lane_trips': trips,
+            'lane_mean_km': round(km / trips, 1) if trips else None,
+        })
+    return estimates
+
+
+def estimate_fuel_cost(vehicle_id, km):
+    """Fuel cost of driving `km` in this vehicle, or None if no fuel has been logged anywhere yet."""
+    row = db.session.execute(
+        select(VehicleReadingState.km_per_l_mean, VehicleRollup.fuel_cost, VehicleRollup.liters)
+        .select_from(VehicleRollup).outerjoin(VehicleReadingState,
+                                              VehicleReadingState.vehicle_id == VehicleRollup.vehicle_id)
+        .where(VehicleRollup.vehicle_id == vehicle_id)).first()
+    km_per_l, fuel_cost, liters = row if row else (None, None, None)
+    price = fuel_cost / liters if liters else None
+    if not km_per_l or not price:
+        fleet_cost, fleet_liters, fleet_km = db.session.execute(select(
+            func.sum(MonthlyRollup.fuel_cost), func.sum(MonthlyRollup.liters), func.sum(MonthlyRollup.km))).one()
+        if not fleet_liters:
+            return None
+        price = price or fleet_cost / fleet_liters
+        km_per_l = km_per_l or fleet_km / fleet_liters
+    if not km_per_l:
+        return None
+    return round(km / km_per_l * price, 2)
+
+
+def record_lane(trip):
+    """Add a just-completed trip's odometer km to its lane, in the caller's transaction."""
+    km = trip.distance_km()
+    index = location_index()
+    origin, destination = index.get(location_key(trip.origin)), index.get(location_key(trip.destination))
+    if km <= 0 or not origin or not destination:
+        return
+    lane = (origin[0], destination[0])
+    bump_rollup(Lane, {'origin_id': lane[0], 'destination_id': lane[1]}, completed_trips=1, km=km)
+    lane_cache().discard(lane)
+
+
+def rebuild_lanes():
+    """Recompute every lane from the completed trips, archived ones included; returns how many lanes have history."""
+    index = location_index()
+    lanes = {}
+    trip = with_archive(Trip)
+    km = trip_km_expr(trip)
+    rows = db.session.execute(select(trip.origin, trip.destination, func.count(trip.id), func.sum(km)).where(
+        trip.status == 'completed', km > 0).group_by(trip.origin, trip.destination))
+    for origin, destination, trips, total in rows:
+        o, d = index.get(location_key(origin)), index.get(location_key(destination))
+        if o and d:
+            n, k = lanes.get((o[0], d[0]), (0, 0.0))
+            lanes[(o[0], d[0])] = (n + trips, k + total)
+    db.session.query(Lane).delete()
+    db.session.add_all(Lane(origin_id=o, destination_id=d, completed_trips=n, km=k) for (o, d), (n, k) in lanes.items())
+    db.session.commit()
+    current_app.extensions.pop('lane_cache', None)
+    return len(lanes)
+
+
+def load_locations(rows):
+    """Insert or update locations from dicts with name, latitude and longitude; returns (loaded, errors)."""
+    existing = {loc.key: loc for loc in Location.query}
+    loaded, errors = 0, []
+    for line, row in enumerate(rows, start=2):            # line 1 is the CSV header
+        name = (row.get('name') or '').strip()
+        try:
+            lat, lon = float(row.get('latitude')), float(row.get('longitude'))
+            if not name or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append(f'line {line}: needs a name, latitude (-90..90) and longitude (-180..180)')
+            continue
+        key = location_key(name)
+        loc = existing.get(key)
+        if loc is None:
+            loc = existing[key] = Location(key=key)
+            db.session.add(loc)
+        loc.name, loc.latitude, loc.longitude = name, lat, lon
+        loaded += 1
+    db.session.commit()
+    forget_locations()
+    return loaded, errors
+
+
+# ── routes ────────────────────────────────
+
+@locations_bp.route('/locations', methods=['GET'])
+@auth_required()
+def locations():
+    return jsonify([loc.to_dict() for loc in Location.query.order_by(Location.name)])
+
+
+@locations_bp.route('/locations/distance', methods=['GET', 'POST'])
+@auth_required()
+def locations_distance():
+    if request.method == 'GET':
+        origin, destination = request.args.get('origin'), request.args.get('destination')
+        if not origin or not destination:
+            return jsonify({'error': 'origin and destination are required'}), 400
+        estimate, = estimate_distances([(origin, destination)])
+        if estimate is None:
+            return jsonify({'error': 'Unknown origin or destination'}), 404
+        return jsonify(estimate)
+
+    lanes = (request.get_json(silent=True) or {}).get('lanes')
+    if not isinstance(lanes, list) or not all(isinstance(l, dict) for l in lanes):
+        return jsonify({'error': 'lanes must be a list of {"origin", "destination"} objects'}), 400
+    if len(lanes) > MAX_LANES:
+        return jsonify({'error': f'At most {MAX_LANES} lanes per request'}), 413
+    return jsonify(estimate_distances([(l.get('origin'), l.get('destination')) for l in lanes]))
+
+
+locations_cli = AppGroup('locations', help='Locations and lane distances.')
+
+@locations_cli.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def locations_load_command(path):
+    """Load or update locations from a CSV with name, latitude and longitude columns, then rebuild lanes."""
+    with open(path, newline='', encoding='utf-8') as f:
+        loaded, errors = load_locations(csv.DictReader(f))
+    for error in errors:
+        print(error)
+    print(f'Loaded {loaded} location(s); {rebuild_lanes()} lane(s) with trip history')
+
+@locations_cli.command('rebuild-lanes')
+def locations_rebuild_lanes_command():
+    """Recompute lane distances from the completed trips."""
+    print(f'{rebuild_lanes()} lane(s) with trip history')
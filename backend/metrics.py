@@ -0,0 +1,294 @@
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from bisect import bisect_left
+from collections import Counter
+import hmac
+import os
+import sys
+import threading
+import time
+from models import db
+
+# ─────────────────────────────────────────
+# METRICS
+# ─────────────────────────────────────────
+# Every request records its latency, SQL query count, SQL time and JSON
+# serialization time into histograms labelled by route, method and status.
+# GET /metrics serves them in the Prometheus text format. Counts are per
+# process: scrape each worker, or run one worker per scrape target.
+# The route names and timings are internal detail: with METRICS_TOKEN set the
+# scraper must send it as a bearer token, otherwise keep /metrics off the
+# public network.
+# Streamed exports are timed until their body has been generated.
+#
+# With SLOW_REQUEST_MS set, requests also keep their SQL statements and are
+# stack-sampled every SLOW_REQUEST_SAMPLE_MS. Any request slower than the
+# threshold is logged with its slowest statements and hottest stacks.
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+SLOW_STATEMENTS = 10          # slowest statements shown per slow request
+SLOW_STACKS = 5               # hottest sampled stacks shown per slow request
+STACK_DEPTH = 16              # innermost frames kept per sample
+
+
+class Histogram:
+    """Prometheus histogram whose observe() never takes a lock.
+
+    Each thread counts into its own shard; collect() merges the shards. Shards of
+    threads that have exited are folded into `retired`, so servers that start a
+    thread per request don't grow a shard per request.
+    """
+
+    def __init__(self, name, help, buckets):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self.local = threading.local()
+        self.shards = []                      # (thread, {labels: [bucket counts..., +Inf count, sum]})
+        self.retired = {}
+        self.lock = threading.Lock()          # taken once per thread, to register its shard
+
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.retire_dead()
+                self.shards.append((threading.current_thread(), shard))
+            return shard
+
+    def retire_dead(self):
+        alive = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                merge(self.retired, shard)
+        self.shards = alive
+
+    def observe(self, labels, value):
+        shard = self.shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self):
+        with self.lock:
+            self.retire_dead()
+            merged = merge({}, self.retired)
+            for _, shard in self.shards:
+                merge(merged, shard)
+        return merged
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        bounds = [format_bound(b) for b in self.buckets] + ['+Inf']
+        for labels, series in sorted(self.collect().items()):
+            base = ','.join(f'{k}="{escape(v)}"' for k, v in labels)
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {cumulative}')
+        return lines
+
+
+def merge(into, shard):
+    for labels, series in list(shard.items()):
+        total = into.get(labels)
+        if total is None:
+            into[labels] = list(series)
+        else:
+            for i, value in enumerate(series):
+                total[i] += value
+    return into
+
+
+def format_bound(bound):
+    return repr(float(bound))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('fleetflow_request_duration_seconds', 'Request latency.',
+                            LATENCY_BUCKETS)
+SQL_SECONDS = Histogram('fleetflow_request_sql_seconds', 'Time spent executing SQL per request.', LATENCY_BUCKETS)
+SERIALIZE_SECONDS = Histogram('fleetflow_request_serialize_seconds', 'Time spent building JSON responses per request.',
+                              LATENCY_BUCKETS)
+QUERIES = Histogram('fleetflow_request_queries', 'SQL statements executed per request.', QUERY_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, SQL_SECONDS, SERIALIZE_SECONDS, QUERIES)
+
+
+class RequestStats:
+    __slots__ = ('start', 'status', 'queries', 'sql', 'serialize', 'statements', 'samples')
+
+    def __init__(self, keep_statements):
+        self.start = time.perf_counter()
+        self.status = 500
+        self.queries = 0
+        self.sql = self.serialize = 0.0
+        self.statements = [] if keep_statements else None
+        self.samples = None
+
+
+# ── stack sampler ─────────────────────────
+
+class Sampler:
+    """Samples the stacks of threads serving requests, for the slow-request log."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = {}                      # thread id -> Counter of stacks
+        self.wake = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        counts = self.active[threading.get_ident()] = Counter()
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='request-sampler', daemon=True)
+                    self.thread.start()
+        self.wake.set()
+        return counts
+
+    def stop(self):
+        self.active.pop(threading.get_ident(), None)
+
+    def run(self):
+        while True:
+            if not self.active:
+                self.wake.clear()
+                if not self.active:           # re-check so a start() racing the clear isn't lost
+                    self.wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, counts in list(self.active.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    counts[stack_of(frame)] += 1
+
+
+def stack_of(frame):
+    stack = []
+    while frame is not None and len(stack) < STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+# ── hooks ─────────────────────────────────
+
+def init_metrics(app):
+    """Hook SQL timing into the app's engine and serialization timing into its JSON provider."""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        stats = g.get('request_stats') if has_request_context() else None
+        if stats is not None:
+            stats.queries += 1
+            stats.sql += elapsed
+            if stats.statements is not None:
+                stats.statements.append((elapsed, statement))
+
+    def handle_error(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()                      # the statement failed; after_cursor_execute won't run
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(db.engine, 'handle_error', handle_error)
+
+    respond = app.json.response
+
+    def timed_response(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return respond(*args, **kwargs)
+        finally:
+            stats = g.get('request_stats')
+            if stats is not None:
+                stats.serialize += time.perf_counter() - start
+    app.json.response = timed_response
+
+    interval = app.config['SLOW_REQUEST_SAMPLE_MS'] / 1000
+    app.extensions['request_sampler'] = Sampler(interval) if app.config['SLOW_REQUEST_MS'] > 0 else None
+
+
+@metrics_bp.before_app_request
+def start_request():
+    sampler = current_app.extensions['request_sampler']
+    g.request_stats = stats = RequestStats(keep_statements=sampler is not None)
+    if sampler is not None:
+        stats.samples = sampler.start()
+
+
+@metrics_bp.after_app_request
+def note_status(response):
+    stats = g.get('request_stats')
+    if stats is not None:
+        stats.status = response.status_code
+    return response
+
+
+@metrics_bp.teardown_app_request
+def finish_request(exc):
+    # Teardown runs once the response is returned, or for stream_with_context()
+    # responses once the body has been generated
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return
+    app = current_app._get_current_object()
+    elapsed = time.perf_counter() - stats.start
+    labels = (('method', request.method), ('route', request.url_rule.rule if request.url_rule else 'unmatched'),
+              ('status', str(stats.status if exc is None else 500)))
+    REQUEST_SECONDS.observe(labels, elapsed)
+    SQL_SECONDS.observe(labels, stats.sql)
+    SERIALIZE_SECONDS.observe(labels, stats.serialize)
+    QUERIES.observe(labels, stats.queries)
+    sampler = app.extensions['request_sampler']
+    if sampler is not None:
+        sampler.stop()
+        if elapsed * 1000 >= app.config['SLOW_REQUEST_MS']:
+            log_slow_request(app, labels, request.full_path.rstrip('?'), elapsed, stats, sampler.interval)
+
+
+def log_slow_request(app, labels, path, elapsed, stats, interval):
+    method, _, status = (v for _, v in labels)
+    lines = [f'Slow request {method} {path} {status}: {elapsed * 1000:.1f} ms '
+             f'(sql {stats.sql * 1000:.1f} ms in {stats.queries} queries, '
+             f'serialize {stats.serialize * 1000:.1f} ms)']
+    for seconds, statement in sorted(stats.statements, key=lambda s: -s[0])[:SLOW_STATEMENTS]:
+        lines.append(f'  sql {seconds * 1000:8.1f} ms  {" ".join(statement.split())[:500]}')
+    if stats.samples:
+        lines.append(f'  profile: {sum(stats.samples.values())} samples every {interval * 1000:g} ms')
+        for stack, count in stats.samples.most_common(SLOW_STACKS):
+            lines.append(f'  {count:5d}  {stack}')
+    app.logger.warning('\n'.join(lines))
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        sent = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(sent.encode(), token.encode()):
+            return Response('Unauthorized\n', status=401, content_type='text/plain; charset=utf-8',
+                            headers={'WWW-Authenticate': 'Bearer'})
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.exposition()
+    return Response('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,37 +1,345 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-db = SQLAlchemy()
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True)
-    password = db.Column(db.String(120))
-    role = db.Column(db.String(20))  # manager, dispatcher
-
-class Vehicle(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    plate = db.Column(db.String(20), unique=True)
-    capacity = db.Column(db.Float)
-    status = db.Column(db.String(20), default='available')
-
-class Driver(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100))
-    status = db.Column(db.String(20), default='available')
-
-class Trip(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'))
-    driver_id = db.Column(db.Integer, db.ForeignKey('driver.id'))
-    cargo_weight = db.Column(db.Float)
-    status = db.Column(db.String(20), default='draft')
-    vehicle = db.relationship('Vehicle')
-    driver = db.relationship('Driver')
-
-def to_dict(self):
-    return {
-        'id': self.id,
-        'plate': self.plate,
-        'capacity': self.capacity,
-        'status': self.status
-    }
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, date
+import json
+db = SQLAlchemy()
+
+# ─────────────────────────────────────────
+# MODELS
+# ─────────────────────────────────────────
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password = db.Column(db.String(256), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # manager, dispatcher, safety_officer, analyst
+
+class Vehicle(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100))
+    model = db.Column(db.String(100))
+    plate = db.Column(db.String(20), unique=True, nullable=False)
+    vehicle_type = db.Column(db.String(20), index=True)  # Truck, Van, Bike
+    capacity = db.Column(db.Float, nullable=False)
+    odometer = db.Column(db.Float, default=0.0)
+    region = db.Column(db.String(50), index=True)
+    status = db.Column(db.String(20), default='available', index=True)  # available, on_trip, in_shop, retired
+    acquisition_cost = db.Column(db.Float, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # optimistic lock
+    last_service_date = db.Column(db.Date, index=True)      # latest MaintenanceLog.date
+    last_service_odometer = db.Column(db.Float)             # odometer when that log was written
+    __mapper_args__ = {'version_id_col': version}
+
+    @classmethod
+    def km_since_service(cls):
+        # Literal 0s (not bound parameters) so queries match the expression index below;
+        # a NULL odometer counts as 0 km rather than leaking NULL into the report
+        zero = db.literal_column('0')
+        return db.func.coalesce(cls.odometer, zero) - db.func.coalesce(cls.last_service_odometer, zero)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'name': self.name, 'model': self.model,
+            'plate': self.plate, 'vehicle_type': self.vehicle_type,
+            'capacity': self.capacity, 'odometer': self.odometer,
+            'region': self.region, 'status': self.status,
+            'acquisition_cost': self.acquisition_cost,
+            'created_at': self.created_at.isoformat(),
+            'version': self.version
+        }
+
+db.Index('ix_vehicle_km_since_service_v2', Vehicle.km_since_service())
+
+class Driver(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    license_number = db.Column(db.String(50), unique=True)
+    license_expiry = db.Column(db.Date, index=True)
+    license_category = db.Column(db.String(20))       # Van, Truck, Bike
+    status = db.Column(db.String(20), default='off_duty')  # on_duty, off_duty, suspended, on_trip
+    safety_score = db.Column(db.Float, default=100.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # optimistic lock
+    __mapper_args__ = {'version_id_col': version}
+
+    def is_license_valid(self):
+        if not self.license_expiry:
+            return False
+        return self.license_expiry >= date.today()
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'name': self.name,
+            'license_number': self.license_number,
+            'license_expiry': self.license_expiry.isoformat() if self.license_expiry else None,
+            'license_category': self.license_category,
+            'status': self.status, 'safety_score': self.safety_score,
+            'license_valid': self.is_license_valid(),
+            'version': self.version
+        }
+
+class Trip(db.Model):
+    __table_args__ = (
+        db.Index('ix_trip_vehicle_id_status', 'vehicle_id', 'status'),
+        db.Index('ix_trip_driver_id_status', 'driver_id', 'status'),
+        db.Index('ix_trip_status_completed_at', 'status', 'completed_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
+    driver_id = db.Column(db.Integer, db.ForeignKey('driver.id'), nullable=False)
+    cargo_weight = db.Column(db.Float, nullable=False)
+    origin = db.Column(db.String(100))
+    destination = db.Column(db.String(100))
+    status = db.Column(db.String(20), default='draft')  # draft, dispatched, completed, cancelled
+    start_odometer = db.Column(db.Float)
+    end_odometer = db.Column(db.Float)
+    estimated_fuel_cost = db.Column(db.Float, default=0.0)
+    estimated_distance_km = db.Column(db.Float)         # from the origin/destination lane, if both are known
+    revenue = db.Column(db.Float, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    completed_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # optimistic lock
+    vehicle = db.relationship('Vehicle', backref='trips')
+    driver = db.relationship('Driver', backref='trips')
+    __mapper_args__ = {'version_id_col': version}
+
+    def distance_km(self):
+        if self.start_odometer and self.end_odometer:
+            return self.end_odometer - self.start_odometer
+        return 0
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'vehicle_id': self.vehicle_id, 'driver_id': self.driver_id,
+            'cargo_weight': self.cargo_weight, 'origin': self.origin,'estimated_fuel_cost': self.estimated_fuel_cost,
+            'estimated_distance_km': self.estimated_distance_km,
+            'destination': self.destination, 'status': self.status,
+            'start_odometer': self.start_odometer, 'end_odometer': self.end_odometer,
+            'distance_km': self.distance_km(), 'revenue': self.revenue,
+            'created_at': self.created_at.isoformat(),
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'version': self.version
+        }
+
+class MaintenanceLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False, index=True)
+    service_type = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    resolved = db.Column(db.Boolean, default=False)
+    cost = db.Column(db.Float, default=0.0)
+    date = db.Column(db.Date, default=date.today, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    vehicle = db.relationship('Vehicle', backref='maintenance_logs')
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'vehicle_id': self.vehicle_id, 'resolved': self.resolved,
+            'service_type': self.service_type, 'description': self.description,
+            'cost': self.cost, 'date': self.date.isoformat()
+        }
+
+class FuelLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False, index=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id'), nullable=True, index=True)
+    liters = db.Column(db.Float, nullable=False)
+    cost = db.Column(db.Float, nullable=False)
+    date = db.Column(db.Date, default=date.today, index=True)
+    odometer_at_fill = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    vehicle = db.relationship('Vehicle', backref='fuel_logs')
+    misc_expense = db.Column(db.Float, default=0.0)
+    distance_km  = db.Column(db.Float, default=0.0)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'vehicle_id': self.vehicle_id, 'trip_id': self.trip_id,'misc_expense': self.misc_expense,
+            'distance_km': self.distance_km,
+            'liters': self.liters, 'cost': self.cost,
+            'date': self.date.isoformat(), 'odometer_at_fill': self.odometer_at_fill
+        }
+
+
+# ─────────────────────────────────────────
+# ROLLUPS
+# ─────────────────────────────────────────
+# Running totals maintained by the write paths in the same transaction as the
+# source row, so the analytics endpoints never have to scan Trip/FuelLog/
+# MaintenanceLog. `flask rollups rebuild|verify` recomputes them from scratch.
+
+class VehicleRollup(db.Model):
+    vehicle_id = db.Column(db.Integer, primary_key=True)
+    fuel_cost = db.Column(db.Float, default=0.0)
+    liters = db.Column(db.Float, default=0.0)
+    maintenance_cost = db.Column(db.Float, default=0.0)
+    completed_trips = db.Column(db.Integer, default=0)
+    revenue = db.Column(db.Float, default=0.0)
+    km = db.Column(db.Float, default=0.0)
+
+class DriverRollup(db.Model):
+    driver_id = db.Column(db.Integer, primary_key=True)
+    total_trips = db.Column(db.Integer, default=0)
+    completed_trips = db.Column(db.Integer, default=0)
+
+class MonthlyRollup(db.Model):
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    revenue = db.Column(db.Float, default=0.0)
+    km = db.Column(db.Float, default=0.0)
+    fuel_cost = db.Column(db.Float, default=0.0)
+    liters = db.Column(db.Float, default=0.0)
+    maintenance_cost = db.Column(db.Float, default=0.0)
+
+ROLLUP_MODELS = (VehicleRollup, DriverRollup, MonthlyRollup)
+
+
+# ─────────────────────────────────────────
+# ARCHIVE
+# ─────────────────────────────────────────
+# Settled trips and old logs moved out of the hot tables by `flask archive run`
+# (see archive.py). Each archive table has its hot table's columns, so columns
+# added later land in both, but no foreign keys: archived rows outlive the
+# vehicles and trips they mention.
+
+def archive_model(model, *indexes):
+    name = f'{model.__tablename__}_archive'
+    columns = {c.name: db.Column(c.type, primary_key=c.primary_key, nullable=c.nullable)
+               for c in model.__table__.columns}
+    table_args = tuple(db.Index(f"ix_{name}_{'_'.join(cols)}", *cols) for cols in indexes)
+    return type(f'{model.__name__}Archive', (db.Model,), {'__tablename__': name, '__table_args__': table_args,
+                                                         **columns})
+
+TripArchive = archive_model(Trip, ('status', 'completed_at'), ('created_at',), ('vehicle_id',))
+FuelLogArchive = archive_model(FuelLog, ('date',), ('vehicle_id',))
+MaintenanceLogArchive = archive_model(MaintenanceLog, ('date',), ('vehicle_id',))
+
+ARCHIVE_MODELS = {Trip: TripArchive, FuelLog: FuelLogArchive, MaintenanceLog: MaintenanceLogArchive}
+
+
+# ─────────────────────────────────────────
+# LOCATIONS
+# ─────────────────────────────────────────
+# Named places with coordinates (loaded from CSV, see locations.py) and, per
+# origin -> destination lane, the odometer km of the trips completed on it.
+
+class Location(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(100), unique=True, nullable=False)   # name case- and space-folded
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'latitude': self.latitude, 'longitude': self.longitude}
+
+class Lane(db.Model):
+    origin_id = db.Column(db.Integer, primary_key=True)
+    destination_id = db.Column(db.Integer, primary_key=True)
+    completed_trips = db.Column(db.Integer, default=0)
+    km = db.Column(db.Float, default=0.0)                # summed over completed_trips
+
+
+# ─────────────────────────────────────────
+# ANOMALIES
+# ─────────────────────────────────────────
+# Readings flagged by the validation stage in anomalies.py, and the per-vehicle
+# rolling state it checks new readings against (one row per vehicle).
+
+class Anomaly(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False, index=True)
+    source = db.Column(db.String(20), nullable=False)       # fuel | trip
+    source_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(30), nullable=False, index=True)
+    observed = db.Column(db.Float)
+    expected = db.Column(db.Float)
+    detail = db.Column(db.String(200))
+    occurred_on = db.Column(db.Date, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'vehicle_id': self.vehicle_id, 'source': self.source,
+            'source_id': self.source_id, 'kind': self.kind, 'observed': self.observed,
+            'expected': self.expected, 'detail': self.detail,
+            'occurred_on': self.occurred_on.isoformat() if self.occurred_on else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class VehicleReadingState(db.Model):
+    vehicle_id = db.Column(db.Integer, primary_key=True)
+    last_odometer = db.Column(db.Float)           # latest reading from any source
+    last_fill_odometer = db.Column(db.Float)      # reading at the previous fuel fill
+    km_per_l_mean = db.Column(db.Float)      # EWMA of fuel efficiency
+    km_per_l_var = db.Column(db.Float)       # EW variance around it
+    samples = db.Column(db.Integer, default=0)
+
+
+# ─────────────────────────────────────────
+# HISTORY
+# ─────────────────────────────────────────
+# Append-only vehicle status changes, written in the same transaction as the
+# change itself, and periodic snapshots of the whole fleet's state that replays
+# start from (see history.py).
+
+class StatusEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, nullable=False, index=True)   # no FK: events outlive deleted vehicles
+    status = db.Column(db.String(20), nullable=False)     # vehicle status, or 'deleted'
+    odometer = db.Column(db.Float)                        # None: unchanged
+    at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class StateCheckpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    at = db.Column(db.DateTime, nullable=False, index=True)
+    state = db.Column(db.Text, nullable=False)            # JSON {vehicle_id: [status, odometer]}
+    base = db.Column(db.Boolean, nullable=False, default=False, server_default='0')  # taken from the tables; no events before it
+
+
+# ─────────────────────────────────────────
+# JOBS
+# ─────────────────────────────────────────
+# Reports run in the background (see jobs.py). `key` is a hash of the report and
+# its parameters, so identical submissions share one row and one result.
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(200), nullable=False)
+    params = db.Column(db.Text, nullable=False)           # JSON {name: value} of query parameters
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    result = db.Column(db.LargeBinary)
+    result_type = db.Column(db.String(100))
+    result_status = db.Column(db.Integer)                 # HTTP status the report answered with
+    error = db.Column(db.String(500))
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # reusable until then; purged after
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'path': self.path, 'params': json.loads(self.params), 'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat(),
+            'result_url': f'/jobs/{self.id}/result' if self.status in ('done', 'failed') else None,
+        }
+
+
+# ─────────────────────────────────────────
+# CHANGE COUNTERS
+# ─────────────────────────────────────────
+# VERSION_SHARDS rows per table; every committed transaction that wrote to a table
+# bumps one of them (see etags.py). A table's version is the sum of its rows, and
+# read endpoints build their ETags from these.
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_counter'
+    name = db.Column(db.String(64), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,257 @@
+from flask.cli import AppGroup
+from sqlalchemy import func, case, and_, bindparam, insert, select, update, inspect, tuple_
+from datetime import datetime, date, timedelta
+from models import db, Trip, FuelLog, MaintenanceLog, VehicleRollup, DriverRollup, MonthlyRollup, ROLLUP_MODELS
+from archive import with_archive
+
+# ─────────────────────────────────────────
+# ROLLUP MAINTENANCE
+# ─────────────────────────────────────────
+# Helpers the write paths call to keep VehicleRollup/DriverRollup/MonthlyRollup in
+# step with the raw tables, plus the grouped aggregates used to rebuild and verify
+# them (`flask rollups rebuild|verify`). Those read archived rows too, which the
+# rollups never stop counting.
+
+
+def bump_rollup(model, key, **deltas):
+    """Add `deltas` to the rollup row identified by `key`, creating it on first use."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    stmt = update(model).filter_by(**key).values(
+        {getattr(model, k): getattr(model, k) + v for k, v in deltas.items()}
+    ).execution_options(synchronize_session=False)
+    if not db.session.execute(stmt).rowcount:
+        db.session.add(model(**key, **deltas))
+        db.session.flush()
+
+
+def bump_rollups(model, deltas_by_key):
+    """Batch form of bump_rollup for many rows: `deltas_by_key` maps a key tuple (in
+    primary-key column order) to a dict of deltas; every dict must name the same fields.
+    Existing rows get one executemany UPDATE and missing ones one executemany INSERT."""
+    if not deltas_by_key:
+        return
+    table = model.__table__
+    key_cols = list(table.primary_key.columns)
+    fields = list(next(iter(deltas_by_key.values())))
+    existing = set(db.session.execute(
+        select(*key_cols).where(tuple_(*key_cols).in_(list(deltas_by_key)))).all())
+
+    updates, inserts = [], []
+    for key, deltas in deltas_by_key.items():
+        if tuple(key) in existing:
+            updates.append({**{f'k_{c.name}': v for c, v in zip(key_cols, key)},
+                            **{f'd_{f}': deltas[f] for f in fields}})
+        else:
+            inserts.append({**{c.name: v for c, v in zip(key_cols, key)}, **deltas})
+    if updates:
+        stmt = update(table).where(*[c == bindparam(f'k_{c.name}') for c in key_cols]).values(
+            {f: table.c[f] + bindparam(f'd_{f}') for f in fields})
+        db.session.execute(stmt, updates)
+    if inserts:
+        db.session.execute(insert(model), inserts)
+
+
+def trip_contribution(trip):
+    """What a trip currently adds to the rollups; None unless it is completed."""
+    if trip.status != 'completed':
+        return None
+    return (trip.completed_at, trip.revenue or 0, trip.distance_km())
+
+
+def apply_trip_rollup(trip, before):
+    """Move the rollups from the trip's `before` contribution to its current one."""
+    after = trip_contribution(trip)
+    if before == after:
+        return
+    for contribution, sign in ((before, -1), (after, 1)):
+        if contribution is None:
+            continue
+        completed_at, revenue, km = contribution
+        bump_rollup(VehicleRollup, {'vehicle_id': trip.vehicle_id},
+                    completed_trips=sign, revenue=sign * revenue, km=sign * km)
+        bump_rollup(DriverRollup, {'driver_id': trip.driver_id}, completed_trips=sign)
+        if completed_at:
+            bump_rollup(MonthlyRollup, {'year': completed_at.year, 'month': completed_at.month},
+                        revenue=sign * revenue, km=sign * km)
+
+
+def apply_fuel_rollup(log):
+    bump_rollup(VehicleRollup, {'vehicle_id': log.vehicle_id}, fuel_cost=log.cost, liters=log.liters)
+    bump_rollup(MonthlyRollup, {'year': log.date.year, 'month': log.date.month},
+                fuel_cost=log.cost, liters=log.liters)
+
+
+def apply_maintenance_rollup(log):
+    bump_rollup(VehicleRollup, {'vehicle_id': log.vehicle_id}, maintenance_cost=log.cost)
+    bump_rollup(MonthlyRollup, {'year': log.date.year, 'month': log.date.month},
+                maintenance_cost=log.cost)
+
+
+def trip_km_expr(trip=Trip):
+    # Mirrors Trip.distance_km(): a missing or zero odometer reading counts as 0 km
+    return case(
+        (and_(trip.start_odometer != 0, trip.end_odometer != 0),
+         trip.end_odometer - trip.start_odometer),
+        else_=0)
+
+
+DAILY_FIELDS = ('revenue', 'km', 'fuel_cost', 'liters', 'maintenance_cost')
+
+def daily_totals(start=None, end=None):
+    """Per-day revenue/km/fuel/maintenance totals over [start, end], one grouped query per table.
+
+    The bounds are plain range predicates on completed_at/date so they can use an
+    index; folding days into coarser buckets is left to the caller. Archived rows count too.
+    """
+    days = {}
+
+    def add(day, **values):
+        if day is None:
+            return
+        # func.date() comes back as an ISO string on SQLite
+        d = day if isinstance(day, date) else date.fromisoformat(str(day))
+        t = days.setdefault(d, dict.fromkeys(DAILY_FIELDS, 0))
+        for k, v in values.items():
+            t[k] += v or 0
+
+    trip = with_archive(Trip)
+    trip_day = func.date(trip.completed_at)
+    q = db.session.query(trip_day, func.sum(trip.revenue), func.sum(trip_km_expr(trip))).filter(
+        trip.status == 'completed', trip.completed_at.isnot(None))
+    if start:
+        q = q.filter(trip.completed_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        q = q.filter(trip.completed_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    for day, revenue, km in q.group_by(trip_day):
+        add(day, revenue=revenue, km=km)
+
+    for model, columns in ((with_archive(FuelLog), ('fuel_cost', 'liters')),
+                           (with_archive(MaintenanceLog), ('maintenance_cost',))):
+        sums = [func.sum(model.cost)] + ([func.sum(model.liters)] if 'liters' in columns else [])
+        q = db.session.query(model.date, *sums)
+        if start:
+            q = q.filter(model.date >= start)
+        if end:
+            q = q.filter(model.date <= end)
+        for day, *values in q.group_by(model.date):
+            add(day, **dict(zip(columns, values)))
+    return days
+
+
+MAX_BUCKETS = 1000
+
+def bucket_start(d, bucket):
+    if bucket == 'day':
+        return d
+    if bucket == 'week':                                  # ISO weeks start on Monday
+        return d - timedelta(days=d.weekday())
+    return d.replace(day=1)
+
+def next_bucket(d, bucket):
+    if bucket == 'day':
+        return d + timedelta(days=1)
+    if bucket == 'week':
+        return d + timedelta(days=7)
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+def month_end(d):
+    return next_bucket(d.replace(day=1), 'month') - timedelta(days=1)
+
+
+def compute_rollups():
+    """Recompute every rollup row from the raw tables, archives included, with grouped aggregates."""
+    trip, fuel, maintenance = with_archive(Trip), with_archive(FuelLog), with_archive(MaintenanceLog)
+    completed = trip.status == 'completed'
+    vehicles, drivers, months = {}, {}, {}
+
+    def row(table, key, **defaults):
+        return table.setdefault(key, dict(defaults))
+
+    for vid, cost, liters in db.session.query(
+            fuel.vehicle_id, func.sum(fuel.cost), func.sum(fuel.liters)
+    ).group_by(fuel.vehicle_id):
+        row(vehicles, vid).update(fuel_cost=cost or 0, liters=liters or 0)
+    for vid, cost in db.session.query(
+            maintenance.vehicle_id, func.sum(maintenance.cost)
+    ).group_by(maintenance.vehicle_id):
+        row(vehicles, vid).update(maintenance_cost=cost or 0)
+    for vid, n, revenue, km in db.session.query(
+            trip.vehicle_id, func.count(trip.id), func.sum(trip.revenue), func.sum(trip_km_expr(trip))
+    ).filter(completed).group_by(trip.vehicle_id):
+        row(vehicles, vid).update(completed_trips=n, revenue=revenue or 0, km=km or 0)
+
+    for did, total, done in db.session.query(
+            trip.driver_id, func.count(trip.id), func.sum(case((completed, 1), else_=0))
+    ).group_by(trip.driver_id):
+        drivers[did] = {'total_trips': total, 'completed_trips': done or 0}
+
+    for day, totals in daily_totals().items():
+        month = row(months, (day.year, day.month), **dict.fromkeys(DAILY_FIELDS, 0))
+        for k, v in totals.items():
+            month[k] += v
+    return vehicles, drivers, months
+
+
+def ensure_rollup_schema():
+    """Rollups are derived data: drop any rollup table whose columns no longer match
+    its model so create_all() recreates it. Returns True if a rebuild is needed."""
+    inspector = inspect(db.engine)
+    stale = [
+        m for m in ROLLUP_MODELS
+        if inspector.has_table(m.__tablename__)
+        and {c['name'] for c in inspector.get_columns(m.__tablename__)} != set(m.__table__.columns.keys())
+    ]
+    for model in stale:
+        model.__table__.drop(db.engine)
+    return bool(stale)
+
+
+def rebuild_rollups():
+    vehicles, drivers, months = compute_rollups()
+    for model in ROLLUP_MODELS:
+        db.session.query(model).delete()
+    db.session.add_all(VehicleRollup(vehicle_id=k, **v) for k, v in vehicles.items())
+    db.session.add_all(DriverRollup(driver_id=k, **v) for k, v in drivers.items())
+    db.session.add_all(MonthlyRollup(year=y, month=m, **v) for (y, m), v in months.items())
+    db.session.commit()
+
+
+def verify_rollups(tolerance=1e-6):
+    """Compare stored rollups against a fresh recompute; returns a list of drift messages."""
+    expected = compute_rollups()
+    stored = (
+        {r.vehicle_id: r for r in VehicleRollup.query},
+        {r.driver_id: r for r in DriverRollup.query},
+        {(r.year, r.month): r for r in MonthlyRollup.query},
+    )
+    drift = []
+    for model, want, have in zip(ROLLUP_MODELS, expected, stored):
+        fields = [c.name for c in model.__table__.columns if not c.primary_key]
+        for key in sorted(set(want) | set(have), key=str):
+            for field in fields:
+                w = want.get(key, {}).get(field, 0)
+                h = getattr(have[key], field) or 0 if key in have else 0
+                if abs(w - h) > tolerance * max(1, abs(w)):
+                    drift.append(f'{model.__tablename__}[{key}].{field}: stored {h}, expected {w}')
+    return drift
+
+
+rollups_cli = AppGroup('rollups', help='Maintain the analytics rollup tables.')
+
+@rollups_cli.command('rebuild')
+def rollups_rebuild_command():
+    """Recompute all rollup tables from the raw logs."""
+    rebuild_rollups()
+    print('Rollups rebuilt')
+
+@rollups_cli.command('verify')
+def rollups_verify_command():
+    """Report any drift between the rollup tables and the raw logs."""
+    drift = verify_rollups()
+    for line in drift:
+        print(line)
+    print(f'{len(drift)} drifted value(s)' if drift else 'Rollups are consistent')
+    if drift:
+        raise SystemExit(1)
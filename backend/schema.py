@@ -0,0 +1,236 @@
+from flask import current_app
+from flask.cli import AppGroup
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, select, text, inspect
+from datetime import datetime, date, timedelta
+from models import db, User, Driver, Trip, FuelLog, MaintenanceLog, Job, ROLLUP_MODELS, ARCHIVE_MODELS
+from rollups import ensure_rollup_schema, rebuild_rollups
+from compliance import backfill_service_history, expired_licenses
+from auth import hash_password, hash_stored_passwords
+from history import write_base_checkpoint
+from etags import seed_table_versions
+from archive import archive_batch_query
+from jobs import expired_jobs
+
+# ─────────────────────────────────────────
+# SCHEMA
+# ─────────────────────────────────────────
+# create_all() only creates missing tables, so columns and indexes added to
+# existing models are created here on databases that predate them. `flask schema check-plans`
+# serves the hot GET requests through the test client, records the SELECTs the
+# endpoints run, and fails if EXPLAIN QUERY PLAN shows any of them (or the
+# filtered queries of background work) falling back to a full table scan.
+
+def ensure_columns():
+    """Add columns declared on a model but missing from an existing table.
+
+    Only columns that are nullable or carry a server_default can be added this way,
+    which is what every column added after the first release declares.
+    """
+    added = []
+    for table in db.metadata.sorted_tables:
+        inspector = inspect(db.engine)
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}'
+            if not column.nullable:
+                ddl += ' NOT NULL'
+            if column.server_default is not None:
+                ddl += f' DEFAULT {column.server_default.arg}'
+            with db.engine.begin() as conn:
+                conn.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def fill_added_columns(added):
+    """One-off data fills for columns ensure_columns() has just added."""
+    if 'vehicle.last_service_date' in added:
+        backfill_service_history()
+
+
+def existing_indexes(table_name):
+    if db.engine.dialect.name == 'sqlite':
+        # The SQLite inspector skips expression indexes; the catalog lists them all
+        with db.engine.connect() as conn:
+            return set(conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t"), {'t': table_name}).scalars())
+    return {ix['name'] for ix in inspect(db.engine).get_indexes(table_name)}
+
+
+# Indexes whose definition changed under a new name; the old ones are dropped on upgrade
+RETIRED_INDEXES = {'vehicle': ('ix_vehicle_km_since_service',)}
+
+
+def ensure_indexes():
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = existing_indexes(table.name)
+        for name in RETIRED_INDEXES.get(table.name, ()):
+            if name in existing:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'DROP INDEX {name}'))
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+
+def hot_requests():
+    """GET requests, with sample values, whose every query should be answered from an index."""
+    today = date.today()
+    since = (today - timedelta(days=30)).isoformat()
+    return [
+        '/vehicles?status=available', '/vehicles?region=North', '/vehicles?type=Van',
+        '/vehicles?fields=plate&after_id=100', '/vehicles/1', '/drivers/1',
+        '/trips?limit=50&after_id=100', '/trips?limit=50&after_id=100&include_archived=true',
+        '/trips/1', '/trips/1?include_archived=true',
+        '/fuel?vehicle_id=1', '/fuel?vehicle_id=1&include_archived=true',
+        '/maintenance?vehicle_id=1', '/maintenance?vehicle_id=1&include_archived=true',
+        '/anomalies?vehicle_id=1',
+        f'/analytics/monthly?from={since}&bucket=day', f'/analytics/monthly?from={since}',
+        f'/export/trips?from={since}', f'/export/trips?from={since}&include_archived=true',
+        f'/export/fuel?from={today}', f'/export/maintenance?from={today}',
+        '/compliance/expiring', '/compliance/maintenance-due',
+        f'/fleet/state?at={since}T00:00:00',
+    ]
+
+
+def background_queries():
+    """(label, statement) for the filtered queries background work runs, from the builders it uses."""
+    today = date.today()
+    return [
+        ('compliance sweep', select(Driver.id).where(*expired_licenses(today))),
+        ('jobs purge', select(Job.id).where(expired_jobs(datetime.utcnow()))),
+        *[(f'archive run {m.__tablename__}', archive_batch_query(m, today, 0, 1000, 1000)) for m in ARCHIVE_MODELS],
+    ]
+
+
+def request_queries(paths):
+    """(label, sql, parameters) for every SELECT the GET endpoints at `paths` run while serving them."""
+    captured, label = [], None
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((label, statement, parameters))
+
+    app = current_app._get_current_object()
+    client = app.test_client()
+    with app.test_request_context():
+        token = create_access_token(identity='0', additional_claims={'role': 'manager'})
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        for path in paths:
+            label = f'GET {path}'
+            response = client.get(path, headers={'Authorization': f'Bearer {token}'})
+            response.get_data()                 # drains streamed exports
+            response.close()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return list(dict.fromkeys(captured))
+
+
+def full_scans():
+    """Run EXPLAIN QUERY PLAN over every query of the hot requests and background work;
+    returns (label, sql, plan) for those doing a full scan."""
+    queries = request_queries(hot_requests())
+    for label, stmt in background_queries():
+        sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        queries.append((label, sql, ()))
+    offenders = []
+    connection = db.session.connection()
+    for label, sql, parameters in queries:
+        plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, parameters)]
+        # "SCAN t" is a full scan; "SCAN t USING [COVERING] INDEX" walks an index instead. Scanning
+        # a subquery (with_archive's UNION ALL) only reads what its own, separately listed steps found.
+        subqueries = {step.split()[1] for step in plan if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+        if any(step.startswith('SCAN ') and 'USING' not in step and step.split()[1] not in subqueries
+               for step in plan):
+            offenders.append((label, sql, plan))
+    return offenders
+
+
+schema_cli = AppGroup('schema', help='Schema upgrades and query-plan checks.')
+
+@schema_cli.command('upgrade')
+def schema_upgrade_command():
+    """Create missing tables, columns and indexes on an existing database."""
+    db.create_all()
+    added = ensure_columns()
+    fill_added_columns(added)
+    created = ensure_indexes()
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+    if created:
+        print(f"Created indexes: {', '.join(created)}")
+    if not added and not created:
+        print('Schema is up to date')
+
+@schema_cli.command('check-plans')
+def schema_check_plans_command():
+    """Fail if any hot endpoint query regresses to a full table scan (SQLite only)."""
+    if db.engine.dialect.name != 'sqlite':
+        print('EXPLAIN QUERY PLAN checks only run against SQLite')
+        return
+    offenders = full_scans()
+    for label, sql, plan in offenders:
+        print(f"{label}: {' | '.join(plan)}\n    {' '.join(sql.split())}")
+    print(f'{len(offenders)} full table scan(s)' if offenders else
+          f'All queries of {len(hot_requests())} hot requests and {len(background_queries())} '
+          'background jobs use an index')
+    if offenders:
+        raise SystemExit(1)
+
+
+# ─────────────────────────────────────────
+# INIT & SEED
+# ─────────────────────────────────────────
+# Nothing touches the database at import or app-creation time, so workers fork
+# and start without I/O. Run `flask fleet init-db` once per deploy (and after
+# upgrades) and `flask fleet seed` to create the demo accounts.
+
+def init_db():
+    """Create or upgrade the schema, rebuild rollups the current schema can't trust and
+    start the status history of a fleet that predates it."""
+    rollups_stale = ensure_rollup_schema()
+    db.create_all()
+    fill_added_columns(ensure_columns())
+    ensure_indexes()
+    hash_stored_passwords()
+    # First start on a database that predates the rollup tables (or their current schema)
+    if rollups_stale or not any(m.query.first() for m in ROLLUP_MODELS) and (
+            Trip.query.first() or FuelLog.query.first() or MaintenanceLog.query.first()):
+        rebuild_rollups()
+    write_base_checkpoint()
+    seed_table_versions()
+
+
+def seed_users():
+    if not User.query.first():
+        db.session.add_all([
+            User(email='manager@test.com', password=hash_password('123'), role='manager'),
+            User(email='dispatcher@test.com', password=hash_password('123'), role='dispatcher'),
+            User(email='safety@test.com', password=hash_password('123'), role='safety_officer'),
+            User(email='analyst@test.com', password=hash_password('123'), role='analyst'),
+        ])
+        db.session.commit()
+
+
+fleet_cli = AppGroup('fleet', help='Database setup for FleetFlow.')
+
+@fleet_cli.command('init-db')
+def fleet_init_db_command():
+    """Create missing tables, columns and indexes and rebuild stale rollups."""
+    init_db()
+    print('Database ready')
+
+@fleet_cli.command('seed')
+def fleet_seed_command():
+    """Create the demo user accounts if the user table is empty."""
+    seed_users()
+    print('Seed data loaded')
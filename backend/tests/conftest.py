@@ -0,0 +1,83 @@
+import os
+import sys
+import pytest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from schema import init_db, seed_users
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'fleet.db'}",
+        'COMPLIANCE_SWEEP_INTERVAL': 0, 'STATE_CHECKPOINT_INTERVAL': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',     # fast hashes; the cost isn't under test
+    })
+    with app.app_context():
+        init_db()
+        seed_users()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Authorization headers for a seeded user (password 123)."""
+    def headers(email):
+        response = client.post('/login', json={'email': email, 'password': '123'})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': 'Bearer ' + response.get_json()['token']}
+    return headers
+
+
+def create(client, headers, path, body):
+    response = client.post(path, json=body, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
+
+
+@pytest.fixture
+def activity(client, login):
+    """Three vehicles written through the API: completed, cancelled and open trips,
+    fuel logs over two months and a maintenance log that is then resolved.
+    Returns {'vehicles': [...], 'drivers': [...], 'trips': [...], 'maintenance': id}."""
+    manager, dispatcher = login('manager@test.com'), login('dispatcher@test.com')
+    expiry = (date.today() + timedelta(days=365)).isoformat()
+    vehicles = [create(client, manager, '/vehicles', {'plate': f'ACT-{i}', 'capacity': 1000, 'odometer': 1000 * i,
+                                                     'acquisition_cost': cost})
+                for i, cost in enumerate((50000, 0, 20000))]
+    drivers = [create(client, manager, '/drivers', {'name': f'Active {i}', 'license_expiry': expiry})
+               for i in range(2)]
+    trips = []
+    for vid, did, end, revenue in ((vehicles[0], drivers[0], 120.5, 300), (vehicles[0], drivers[1], 310.25, 450.1),
+                                   (vehicles[1], drivers[0], 1080, 99.99)):
+        tid = create(client, dispatcher, '/trips', {'vehicle_id': vid, 'driver_id': did, 'cargo_weight': 10,
+                                                    'revenue': revenue})
+        for body in ({'status': 'dispatched'}, {'status': 'completed', 'end_odometer': end}):
+            assert client.put(f'/trips/{tid}', json=body, headers=dispatcher).status_code == 200
+        trips.append(tid)
+    cancelled = create(client, dispatcher, '/trips', {'vehicle_id': vehicles[1], 'driver_id': drivers[1],
+                                                      'cargo_weight': 10, 'revenue': 500})
+    assert client.put(f'/trips/{cancelled}', json={'status': 'cancelled'}, headers=dispatcher).status_code == 200
+    trips.append(cancelled)
+    trips.append(create(client, dispatcher, '/trips', {'vehicle_id': vehicles[0], 'driver_id': drivers[0],
+                                                       'cargo_weight': 10, 'revenue': 75}))
+    last_month = date.today().replace(day=1) - timedelta(days=1)
+    for vid, liters, cost, day in ((vehicles[0], 40, 61.3, date.today()), (vehicles[0], 22.5, 33.1, last_month),
+                                   (vehicles[1], 18, 27.45, last_month)):
+        create(client, manager, '/fuel', {'vehicle_id': vid, 'liters': liters, 'cost': cost,
+                                          'date': day.isoformat()})
+    mid = create(client, manager, '/maintenance', {'vehicle_id': vehicles[1], 'service_type': 'Oil',
+                                                   'cost': 140.7, 'date': last_month.isoformat()})
+    assert client.put(f'/maintenance/{mid}/resolve', headers=manager).status_code == 200
+    return {'vehicles': vehicles, 'drivers': drivers, 'trips': trips, 'maintenance': mid}
@@ -0,0 +1,47 @@
+from models import Vehicle, FuelLog, MaintenanceLog, Trip
+
+
+def per_vehicle_report():
+    """The /analytics report as the per-vehicle loop built it before the rollups."""
+    report = []
+    for v in Vehicle.query.all():
+        fuel_logs = FuelLog.query.filter_by(vehicle_id=v.id).all()
+        maint_logs = MaintenanceLog.query.filter_by(vehicle_id=v.id).all()
+        completed_trips = Trip.query.filter_by(vehicle_id=v.id, status='completed').all()
+
+        total_fuel_cost = sum(f.cost for f in fuel_logs)
+        total_liters = sum(f.liters for f in fuel_logs)
+        total_maint_cost = sum(m.cost for m in maint_logs)
+        total_revenue = sum(t.revenue for t in completed_trips)
+        total_km = sum(t.distance_km() for t in completed_trips)
+
+        fuel_efficiency = round(total_km / total_liters, 2) if total_liters else 0
+        total_op_cost = total_fuel_cost + total_maint_cost
+        roi = 0
+        if v.acquisition_cost:
+            roi = round((total_revenue - total_op_cost) / v.acquisition_cost * 100, 2)
+
+        report.append({
+            'vehicle_id': v.id,
+            'plate': v.plate,
+            'name': v.name,
+            'total_trips': len(completed_trips),
+            'total_km': round(total_km, 2),
+            'total_fuel_cost': round(total_fuel_cost, 2),
+            'total_maintenance_cost': round(total_maint_cost, 2),
+            'total_operational_cost': round(total_op_cost, 2),
+            'total_revenue': round(total_revenue, 2),
+            'fuel_efficiency_km_per_l': fuel_efficiency,
+            'cost_per_km': round(total_op_cost / total_km, 2) if total_km else 0,
+            'roi_percent': roi
+        })
+    return report
+
+
+def test_analytics_matches_per_vehicle_loop(app, client, login, activity):
+    response = client.get('/analytics', headers=login('analyst@test.com'))
+    assert response.status_code == 200
+    with app.app_context():
+        expected = per_vehicle_report()
+    assert any(row['total_trips'] and row['total_maintenance_cost'] for row in expected)
+    assert response.get_json() == expected
@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+from anomalies import EFFICIENCY_WARMUP, AnomalyDetector, backfill
+from models import db, Anomaly
+from conftest import create
+
+STEADY = [10.0, 10.4, 9.7, 10.2, 9.9, 10.1, 9.8]        # km/L
+
+
+def log_fills(client, headers, vid, km_per_l, start_odometer=1000):
+    odometer, day = start_odometer, date(2024, 1, 1)
+    for i, efficiency in enumerate(km_per_l):
+        odometer += 200
+        create(client, headers, '/fuel', {'vehicle_id': vid, 'liters': 200 / efficiency, 'cost': 30,
+                                          'distance_km': 200, 'odometer_at_fill': odometer,
+                                          'date': (day + timedelta(days=i)).isoformat()})
+
+
+def anomalies(client, headers, vid):
+    rows = client.get(f'/anomalies?vehicle_id={vid}', headers=headers).get_json()
+    return [(r['kind'], round(r['observed'], 2)) for r in rows]
+
+
+def test_efficiency_outlier_flagged_after_warmup(client, login):
+    headers = login('manager@test.com')
+    vid = create(client, headers, '/vehicles', {'plate': 'EWMA-1', 'capacity': 100})
+    log_fills(client, headers, vid, STEADY + [4.0, 10.0, 16.5])
+    # The 4 km/L fill is flagged; it only nudges the average, so the 10 km/L after it is not
+    assert anomalies(client, headers, vid) == [('efficiency_outlier', 4.0), ('efficiency_outlier', 16.5)]
+
+
+def test_no_efficiency_flags_during_warmup(client, login):
+    headers = login('manager@test.com')
+    vid = create(client, headers, '/vehicles', {'plate': 'EWMA-2', 'capacity': 100})
+    log_fills(client, headers, vid, [10.0, 3.0, 18.0, 10.0, 4.0][:EFFICIENCY_WARMUP])
+    assert anomalies(client, headers, vid) == []
+
+
+def test_efficiency_state_follows_the_ewma():
+    detector, found = AnomalyDetector(fresh=True), []
+    state = dict(km_per_l_mean=None, km_per_l_var=0.0, samples=0)
+    mean = None
+    for x in STEADY:
+        detector.efficiency(state, x, lambda *args: found.append(args))
+        mean = x if mean is None else mean + 0.2 * (x - mean)
+    assert found == [] and state['samples'] == len(STEADY)
+    assert abs(state['km_per_l_mean'] - mean) < 1e-9
+
+
+def test_odometer_regression_and_backfill_agree(app, client, login):
+    headers = login('manager@test.com')
+    vid = create(client, headers, '/vehicles', {'plate': 'ODO-1', 'capacity': 100})
+    log_fills(client, headers, vid, STEADY + [4.0])
+    create(client, headers, '/fuel', {'vehicle_id': vid, 'liters': 10, 'cost': 1, 'odometer_at_fill': 500,
+                                      'date': '2024-02-01'})
+    on_write = anomalies(client, headers, vid)
+    assert ('odometer_regression', 500) in on_write and ('efficiency_outlier', 4.0) in on_write
+    with app.app_context():
+        backfill(chunk_size=3)
+        assert Anomaly.query.count() == len(on_write)
+        db.session.remove()
+    assert anomalies(client, headers, vid) == on_write
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+from sqlalchemy import func, select
+from archive import run_archive
+from models import db, Trip, FuelLog, MaintenanceLog, ARCHIVE_MODELS
+from rollups import verify_rollups
+from conftest import create
+
+TOMORROW = date.today() + timedelta(days=1)      # every settled row of the activity fixture is older
+
+
+def ids(model):
+    return set(db.session.scalars(select(model.id)))
+
+
+def archive_all(app, client, login, activity):
+    """Pin the first completed trip with a fuel log dated after the cutoff, then archive."""
+    pinned = activity['trips'][0]
+    create(client, login('manager@test.com'), '/fuel', {
+        'vehicle_id': activity['vehicles'][0], 'trip_id': pinned, 'liters': 10, 'cost': 15,
+        'date': (TOMORROW + timedelta(days=1)).isoformat()})
+    with app.app_context():
+        before = {m: ids(m) for m in ARCHIVE_MODELS}
+        moved = run_archive(cutoff=TOMORROW, batch_size=2)
+        after = {m: ids(m) for m in ARCHIVE_MODELS}
+        archived = {m: ids(a) for m, a in ARCHIVE_MODELS.items()}
+    return pinned, moved, before, after, archived
+
+
+def test_archive_keeps_referenced_trips_and_newest_rows(app, client, login, activity):
+    pinned, moved, before, after, archived = archive_all(app, client, login, activity)
+    completed, cancelled, draft = activity['trips'][1:3], activity['trips'][3], activity['trips'][4]
+
+    assert pinned in after[Trip] and pinned not in archived[Trip]
+    assert set(completed) | {cancelled} <= archived[Trip]
+    assert draft in after[Trip]
+    for model in ARCHIVE_MODELS:
+        assert max(before[model]) in after[model]               # the newest row stays hot
+        assert after[model] | archived[model] == before[model]
+        assert not after[model] & archived[model]
+    assert moved == {'fuel_log': 3, 'trip': 3, 'maintenance_log': 0}
+    assert activity['maintenance'] in after[MaintenanceLog]    # the only, and so newest, maintenance log
+
+
+def test_archive_leaves_rollups_valid(app, client, login, activity):
+    archive_all(app, client, login, activity)
+    with app.app_context():
+        assert verify_rollups() == []
+
+
+def test_include_archived_lists_the_union(app, client, login, activity):
+    _, _, before, after, archived = archive_all(app, client, login, activity)
+    headers = login('analyst@test.com')
+    for path, model in (('/trips', Trip), ('/fuel', FuelLog), ('/maintenance', MaintenanceLog)):
+        hot = {r['id'] for r in client.get(path, headers=headers).get_json()}
+        union = [r['id'] for r in client.get(f'{path}?include_archived=true', headers=headers).get_json()]
+        assert hot == after[model]
+        assert union == sorted(before[model])
+    trip = activity['trips'][1]
+    assert client.get(f'/trips/{trip}', headers=headers).status_code == 404
+    assert client.get(f'/trips/{trip}?include_archived=true', headers=headers).get_json()['id'] == trip
+
+
+def test_archive_is_a_no_op_when_nothing_is_old(app, activity):
+    with app.app_context():
+        assert run_archive(cutoff=date(2000, 1, 1)) == {'fuel_log': 0, 'trip': 0, 'maintenance_log': 0}
+        assert all(db.session.scalar(select(func.count()).select_from(a)) == 0 for a in ARCHIVE_MODELS.values())
@@ -0,0 +1,28 @@
+def register(client, role=None, headers=None, email='new@test.com'):
+    body = {'name': 'New User', 'email': email, 'password': 'secret'}
+    if role:
+        body['role'] = role
+    return client.post('/register', json=body, headers=headers or {})
+
+
+def test_self_registration_creates_analyst(client):
+    assert register(client).status_code == 201
+    response = client.post('/login', json={'email': 'new@test.com', 'password': 'secret'})
+    assert response.get_json()['role'] == 'analyst'
+    headers = {'Authorization': 'Bearer ' + response.get_json()['token']}
+    assert client.post('/vehicles', json={'plate': 'X-1', 'capacity': 100}, headers=headers).status_code == 403
+
+
+def test_self_registration_as_manager_is_refused(client):
+    assert register(client, 'manager').status_code == 403
+    assert client.post('/login', json={'email': 'new@test.com', 'password': 'secret'}).status_code == 401
+
+
+def test_non_manager_cannot_grant_roles(client, login):
+    assert register(client, 'dispatcher', login('dispatcher@test.com')).status_code == 403
+
+
+def test_manager_can_create_any_role(client, login):
+    assert register(client, 'manager', login('manager@test.com')).status_code == 201
+    response = client.post('/login', json={'email': 'new@test.com', 'password': 'secret'})
+    assert response.get_json()['role'] == 'manager'
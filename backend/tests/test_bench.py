@@ -0,0 +1,14 @@
+import json
+from bench.__main__ import main
+
+
+def test_bench_runs_end_to_end(tmp_path, monkeypatch):
+    # Cheap password hashes: the smoke test checks the suite runs, not what logins cost
+    monkeypatch.setenv('FLEETFLOW_PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    out = tmp_path / 'results.json'
+    assert main(['--vehicles', '10', '--years', '1', '--trips-per-month', '1', '--drafts', '2',
+                 '--mode', 'client', '--iterations', '1', '--warmup', '0', '--pool', '4', '--contention', '2',
+                 '--out', str(out)]) == 0
+    result = json.loads(out.read_text())
+    assert result['meta']['rows']['trips'] > 0
+    assert result['modes']['client']['micro']['contention']['double_booked'] == 0
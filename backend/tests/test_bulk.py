@@ -0,0 +1,53 @@
+import json
+from models import Vehicle, FuelLog
+from rollups import verify_rollups
+from conftest import create
+
+
+def test_vehicle_bulk_reports_bad_rows_and_inserts_the_rest(app, client, login):
+    headers = login('manager@test.com')
+    create(client, headers, '/vehicles', {'plate': 'TAKEN', 'capacity': 100})
+    rows = [{'plate': 'BULK-1', 'capacity': 500}, {'plate': 'TAKEN', 'capacity': 100}, {'capacity': 5},
+            {'plate': 'BULK-2', 'capacity': 'heavy'}, 'not an object', {'plate': 'BULK-1', 'capacity': 700},
+            {'plate': 'BULK-3', 'capacity': 900, 'odometer': 12}]
+    response = client.post('/vehicles/bulk', json=rows, headers=headers)
+    assert response.status_code == 201
+    assert response.get_json() == {'inserted': 2, 'errors': [
+        {'index': 1, 'error': 'Plate already exists'},
+        {'index': 2, 'error': 'plate and capacity are required'},
+        {'index': 3, 'error': 'capacity, odometer and acquisition_cost must be numbers'},
+        {'index': 4, 'error': 'Row must be an object'},
+        {'index': 5, 'error': 'Plate already exists'},
+    ]}
+    with app.app_context():
+        bulk = {v.plate: v for v in Vehicle.query.filter(Vehicle.plate.like('BULK-%'))}
+        assert sorted(bulk) == ['BULK-1', 'BULK-3'] and bulk['BULK-1'].capacity == 500
+
+
+def test_fuel_bulk_ndjson_with_bad_lines(app, client, login):
+    headers = login('analyst@test.com')
+    vid = create(client, login('manager@test.com'), '/vehicles', {'plate': 'FUEL-1', 'capacity': 100})
+    lines = [json.dumps({'vehicle_id': vid, 'liters': 20, 'cost': 30, 'date': '2024-05-01'}), '{broken',
+             json.dumps({'vehicle_id': 999999, 'liters': 1, 'cost': 1}), '',
+             json.dumps({'vehicle_id': vid, 'cost': 1}),
+             json.dumps({'vehicle_id': vid, 'liters': 'lots', 'cost': 1}),
+             json.dumps({'vehicle_id': str(vid), 'liters': 5, 'cost': 8.5})]
+    response = client.post('/fuel/bulk', data='\n'.join(lines), content_type='application/x-ndjson',
+                           headers=headers)
+    assert response.status_code == 201
+    assert response.get_json() == {'inserted': 2, 'errors': [
+        {'index': 1, 'error': 'Invalid JSON line'},
+        {'index': 2, 'error': 'Unknown vehicle_id 999999'},
+        {'index': 3, 'error': 'liters is required'},
+        {'index': 4, 'error': 'Invalid number or date'},
+    ]}
+    with app.app_context():
+        assert sorted(f.cost for f in FuelLog.query.filter_by(vehicle_id=vid)) == [8.5, 30]
+        assert verify_rollups() == []
+
+
+def test_bulk_with_no_valid_rows_fails(client, login):
+    headers = login('manager@test.com')
+    response = client.post('/vehicles/bulk', json=[{'plate': ''}], headers=headers)
+    assert response.status_code == 400 and response.get_json()['inserted'] == 0
+    assert client.post('/vehicles/bulk', json={'plate': 'X'}, headers=headers).status_code == 400
@@ -0,0 +1,16 @@
+from datetime import date
+from sqlalchemy import update
+from models import db, Vehicle
+
+
+def test_maintenance_due_with_null_odometer(app, client, login):
+    with app.app_context():
+        db.session.add(Vehicle(name='Van', model='T', plate='NULL-1', vehicle_type='Van', capacity=1000,
+                               region='North', acquisition_cost=1, last_service_date=date(2000, 1, 1)))
+        # The column default fills in an explicit None on insert, so null it afterwards
+        db.session.execute(update(Vehicle).where(Vehicle.plate == 'NULL-1').values(odometer=None))
+        db.session.commit()
+    r = client.get('/compliance/maintenance-due', headers=login('manager@test.com'))
+    assert r.status_code == 200
+    row = next(v for v in r.get_json() if v['plate'] == 'NULL-1')
+    assert row['km_since_service'] == 0 and row['reasons'] == ['overdue_days']
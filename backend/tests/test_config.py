@@ -0,0 +1,17 @@
+import pytest
+from app import create_app
+
+
+def test_sqlite_uri_passed_in_gets_pragmas_not_pool_options(monkeypatch):
+    monkeypatch.setenv('FLEETFLOW_DATABASE_URL', 'postgresql://fleet@localhost/fleetflow')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///override.db'})
+    assert app.config['SQLITE_PRAGMAS']['journal_mode'] == 'WAL'
+    assert 'pool_size' not in app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+
+
+def test_postgresql_uri_passed_in_gets_pool_options(monkeypatch):
+    pytest.importorskip('psycopg2')
+    monkeypatch.setenv('FLEETFLOW_DATABASE_URL', 'sqlite:///env.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'postgresql://fleet@localhost/fleetflow'})
+    assert 'SQLITE_PRAGMAS' not in app.config
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_pre_ping'] is True
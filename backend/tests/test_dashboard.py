@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+import pytest
+from app import TTLCache, dashboard_cache
+from conftest import create
+
+
+@pytest.fixture
+def invalidations(monkeypatch):
+    calls = []
+    invalidate = dashboard_cache.invalidate
+    monkeypatch.setattr(dashboard_cache, 'invalidate', lambda: (calls.append(1), invalidate()))
+    return calls
+
+
+def test_trip_and_vehicle_writes_refresh_the_dashboard(client, login, invalidations):
+    manager, dispatcher = login('manager@test.com'), login('dispatcher@test.com')
+
+    def dashboard():
+        return client.get('/dashboard', headers=manager).get_json()
+
+    def after(write):
+        before = len(invalidations)
+        write()
+        assert len(invalidations) > before, 'write did not invalidate the dashboard cache'
+        return dashboard()
+
+    assert dashboard()['total'] == 0
+    vid = None
+
+    def add_vehicle():
+        nonlocal vid
+        vid = create(client, manager, '/vehicles', {'plate': 'DASH-1', 'capacity': 100})
+    assert after(add_vehicle) == {'active_fleet': 0, 'in_shop': 0, 'idle': 1, 'total': 1, 'utilization_rate': 0,
+                                  'pending_cargo': 0}
+    did = create(client, manager, '/drivers', {'name': 'Dash', 'license_expiry':
+                                               (date.today() + timedelta(days=30)).isoformat()})
+    tid = None
+
+    def add_trip():
+        nonlocal tid
+        tid = create(client, dispatcher, '/trips', {'vehicle_id': vid, 'driver_id': did, 'cargo_weight': 5})
+    assert after(add_trip)['pending_cargo'] == 1
+    state = after(lambda: client.put(f'/trips/{tid}', json={'status': 'dispatched'}, headers=dispatcher))
+    assert (state['active_fleet'], state['utilization_rate'], state['pending_cargo']) == (1, 100.0, 0)
+    state = after(lambda: client.put(f'/trips/{tid}', json={'status': 'completed', 'end_odometer': 50},
+                                     headers=dispatcher))
+    assert (state['active_fleet'], state['idle']) == (0, 1)
+    mid = None
+
+    def service():
+        nonlocal mid
+        mid = create(client, manager, '/maintenance', {'vehicle_id': vid, 'service_type': 'Tyres', 'cost': 10})
+    assert (after(service)['in_shop'], dashboard()['idle']) == (1, 0)
+    assert after(lambda: client.put(f'/maintenance/{mid}/resolve', headers=manager))['idle'] == 1
+    state = after(lambda: client.put(f'/vehicles/{vid}', json={'status': 'retired'}, headers=manager))
+    assert (state['idle'], state['total']) == (0, 1)
+    spare = create(client, manager, '/vehicles', {'plate': 'DASH-2', 'capacity': 100})
+    assert after(lambda: client.delete(f'/vehicles/{spare}', headers=manager))['total'] == 1
+
+
+def test_ttl_cache_serves_until_invalidated(app):
+    cache, computed = TTLCache('DASHBOARD_CACHE_TTL'), []
+
+    def compute():
+        computed.append(1)
+        return {'n': len(computed)}
+    with app.app_context():
+        assert cache.get(compute) == cache.get(compute) == {'n': 1}
+        cache.invalidate()
+        assert cache.get(compute) == {'n': 2}
+        assert cache.get(compute, key='v2') == {'n': 3}      # a new key drops the value
+
+
+def test_ttl_cache_does_not_store_a_value_raced_by_a_write(app):
+    cache = TTLCache('DASHBOARD_CACHE_TTL')
+
+    def stale():
+        cache.invalidate()                                   # a write lands while this is computed
+        return 'stale'
+    with app.app_context():
+        assert cache.get(stale) == 'stale'
+        assert cache.get(lambda: 'fresh') == 'fresh'
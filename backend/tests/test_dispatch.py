@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+from sqlalchemy import update
+from app import apply_dispatch_plan, plan_dispatch
+from models import db, Trip, VehicleReadingState
+from rollups import verify_rollups
+
+
+def create(client, headers, path, body):
+    response = client.post(path, json=body, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
+
+
+def fleet(client, headers):
+    """Two available vans and two drivers, with two drafts booked on the larger van."""
+    expiry = (date.today() + timedelta(days=365)).isoformat()
+    big = create(client, headers, '/vehicles', {'plate': 'BIG-1', 'capacity': 1000})
+    small = create(client, headers, '/vehicles', {'plate': 'SMALL-1', 'capacity': 500})
+    drivers = [create(client, headers, '/drivers', {'name': f'Driver {i}', 'license_expiry': expiry})
+               for i in range(2)]
+    trips = [create(client, headers, '/trips', {'vehicle_id': big, 'driver_id': drivers[0], 'cargo_weight': cargo})
+             for cargo in (400, 300)]
+    return big, small, trips
+
+
+def test_apply_skips_drafts_that_moved_on(app, client, login):
+    headers = login('manager@test.com')
+    big, small, (heavy, light) = fleet(client, headers)
+    with app.app_context():
+        assignments, _ = plan_dispatch()
+        db.session.commit()
+    assert {a['trip_id'] for a in assignments} == {heavy, light}
+
+    # The lighter draft is cancelled between planning and applying
+    assert client.put(f'/trips/{light}', json={'status': 'cancelled'}, headers=headers).status_code == 200
+    with app.app_context():
+        applied, skipped = apply_dispatch_plan(assignments)
+        assert [a['trip_id'] for a in applied] == [heavy]
+        assert skipped == [light]
+        assert db.session.get(Trip, heavy).vehicle_id == small
+        assert db.session.get(Trip, light).vehicle_id == big
+        assert verify_rollups() == []
+
+
+def test_reassigned_vehicle_gets_a_new_fuel_estimate(app, client, login):
+    headers = login('manager@test.com')
+    big, small, (heavy, light) = fleet(client, headers)
+    create(client, headers, '/fuel', {'vehicle_id': small, 'liters': 10, 'cost': 200})
+    with app.app_context():
+        db.session.execute(update(Trip).where(Trip.id == heavy).values(estimated_distance_km=100,
+                                                                      estimated_fuel_cost=1))
+        db.session.merge(VehicleReadingState(vehicle_id=small, km_per_l_mean=5))
+        db.session.commit()
+        assignments, _ = plan_dispatch([heavy])
+        apply_dispatch_plan(assignments)
+        assert db.session.get(Trip, heavy).estimated_fuel_cost == 400     # 100 km / 5 km/L * 20 per L
+
+
+def test_plan_endpoint_reports_skipped(client, login):
+    headers = login('dispatcher@test.com')
+    fleet(client, login('manager@test.com'))
+    body = client.post('/dispatch/plan', json={'apply': True}, headers=headers).get_json()
+    assert body['applied'] and body['placed'] == 2 and body['skipped'] == []
+    assert 'previous_vehicle_id' not in body['assignments'][0]
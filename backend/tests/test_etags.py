@@ -0,0 +1,21 @@
+from etags import VERSION_SHARDS, table_versions
+from models import db, TableVersion
+
+
+def test_unchanged_get_is_not_modified_until_a_write(client, login):
+    headers = login('manager@test.com')
+    tag = client.get('/vehicles', headers=headers).headers['ETag']
+    assert client.get('/vehicles', headers={**headers, 'If-None-Match': tag}).status_code == 304
+    assert client.post('/vehicles', json={'plate': 'X-1', 'capacity': 100}, headers=headers).status_code == 201
+    assert client.get('/vehicles', headers={**headers, 'If-None-Match': tag}).status_code == 200
+
+
+def test_each_write_moves_the_version_by_one(app, client, login):
+    headers = login('manager@test.com')
+    with app.app_context():
+        assert db.session.query(TableVersion).filter_by(name='vehicle').count() == VERSION_SHARDS
+        before = table_versions(['vehicle'])['vehicle']
+    for i in range(5):
+        client.post('/vehicles', json={'plate': f'X-{i}', 'capacity': 100}, headers=headers)
+    with app.app_context():
+        assert table_versions(['vehicle'])['vehicle'] == before + 5
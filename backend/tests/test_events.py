@@ -0,0 +1,31 @@
+from app import broker
+
+
+def chunks(client, headers, n, last_event_id=None):
+    if last_event_id:
+        headers = {**headers, 'Last-Event-ID': last_event_id}
+    response = client.get('/events', headers=headers, buffered=False)
+    try:
+        stream = iter(response.response)
+        return [next(stream).decode() for _ in range(n)]
+    finally:
+        response.close()
+
+
+def test_reconnect_to_the_same_process_replays_missed_events(client, login):
+    headers = login('manager@test.com')
+    broker.publish('vehicle', {'vehicle_id': 1, 'status': 'in_shop'})
+    event_id = f'{broker.stream}-{broker._last_id}'
+    broker.publish('vehicle', {'vehicle_id': 1, 'status': 'available'})
+    retry, replayed = chunks(client, headers, 2, event_id)
+    assert replayed.startswith(f'id: {broker.stream}-{broker._last_id}\n') and '"available"' in replayed
+
+
+def test_reconnect_with_another_workers_event_id_is_told_to_resync(client, login):
+    retry, resync = chunks(client, login('manager@test.com'), 2, 'deadbeef-5')
+    assert resync.startswith('event: resync')
+
+
+def test_malformed_event_id_is_rejected(client, login):
+    response = client.get('/events', headers={**login('manager@test.com'), 'Last-Event-ID': 'abc'})
+    assert response.status_code == 400
@@ -0,0 +1,34 @@
+import csv
+import io
+import json
+from datetime import date
+
+
+def test_ndjson_export_streams_every_row(client, login, activity, monkeypatch):
+    monkeypatch.setattr('app.EXPORT_BATCH_SIZE', 2)
+    headers = login('analyst@test.com')
+    response = client.get('/export/trips', headers=headers)
+    assert response.is_streamed and response.mimetype == 'application/x-ndjson'
+    chunks = list(response.iter_encoded())
+    assert len(chunks) == 3                               # five trips in batches of two
+    rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    listed = client.get('/trips', headers=headers).get_json()
+    assert rows == sorted(listed, key=lambda t: (t['created_at'], t['id']))
+
+
+def test_csv_export_with_fields_and_date_range(client, login, activity):
+    headers = login('analyst@test.com')
+    today = date.today().isoformat()
+    response = client.get(f'/export/fuel?format=csv&fields=vehicle_id,cost,date&from={today}&to={today}',
+                          headers=headers)
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=fuel.csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows == [['vehicle_id', 'cost', 'date'], [str(activity['vehicles'][0]), '61.3', today]]
+
+
+def test_export_rejects_bad_arguments(client, login):
+    headers = login('analyst@test.com')
+    assert client.get('/export/users', headers=headers).status_code == 404
+    for query in ('format=xml', 'from=yesterday', 'fields=nope'):
+        assert client.get(f'/export/trips?{query}', headers=headers).status_code == 400
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+import pytest
+from history import HistoryUnavailable, state_at, write_base_checkpoint, write_checkpoint
+from models import db, StatusEvent, StateCheckpoint
+
+T0 = datetime(2024, 3, 1, 8)
+EVENTS = [                      # (hours after T0, vehicle, status, odometer)
+    (0, 1, 'available', 0), (0, 2, 'available', 500), (1, 1, 'on_trip', None), (2, 3, 'available', 10),
+    (3, 1, 'available', 120), (4, 2, 'in_shop', None), (5, 3, 'deleted', None), (6, 2, 'available', 510),
+    (7, 1, 'on_trip', None),
+]
+EXPECTED = {                    # hours after T0 -> state
+    0: {1: ['available', 0], 2: ['available', 500]},
+    2.5: {1: ['on_trip', 0], 2: ['available', 500], 3: ['available', 10]},
+    4: {1: ['available', 120], 2: ['in_shop', 500], 3: ['available', 10]},
+    5.5: {1: ['available', 120], 2: ['in_shop', 500]},
+    8: {1: ['on_trip', 120], 2: ['available', 510]},
+}
+
+
+@pytest.fixture
+def events(app):
+    with app.app_context():
+        db.session.add_all(StatusEvent(vehicle_id=vid, status=status, odometer=odometer, at=T0 + timedelta(hours=h))
+                           for h, vid, status, odometer in EVENTS)
+        db.session.commit()
+    return app
+
+
+def hours(h):
+    return T0 + timedelta(hours=h)
+
+
+def test_replay_without_checkpoints(events):
+    with events.app_context():
+        for h, expected in EXPECTED.items():
+            state, checkpoint, replayed = state_at(hours(h))
+            assert (state, checkpoint) == (expected, None)
+            assert replayed == sum(1 for e in EVENTS if e[0] <= h)
+
+
+def test_replay_from_checkpoints_matches_full_replay(events):
+    with events.app_context():
+        write_checkpoint(hours(2.5))
+        write_checkpoint(hours(5))
+        for h, expected in EXPECTED.items():
+            state, checkpoint, replayed = state_at(hours(h))
+            assert state == expected
+            base = max((c for c in (2.5, 5) if c <= h), default=None)
+            assert checkpoint == (hours(base) if base is not None else None)
+            # Only the events after the checkpoint are replayed
+            assert replayed == sum(1 for e in EVENTS if (base is None or e[0] > base) and e[0] <= h)
+
+
+def test_checkpoint_state_is_used_as_is(events):
+    with events.app_context():
+        checkpoint = write_checkpoint(hours(3))
+        checkpoint.state = '{"9": ["retired", 1]}'            # proves the replay starts from the snapshot
+        db.session.commit()
+        assert state_at(hours(3.5))[0] == {9: ['retired', 1]}
+        assert state_at(hours(4))[0] == {9: ['retired', 1], 2: ['in_shop', None]}
+
+
+def test_base_checkpoint_bounds_history(app, client, login):
+    headers = login('manager@test.com')
+    client.post('/vehicles', json={'plate': 'BASE-1', 'capacity': 10}, headers=headers)
+    with app.app_context():
+        db.session.query(StatusEvent).delete()               # a fleet that predates the event log
+        db.session.commit()
+        assert write_base_checkpoint() is True
+        start = StateCheckpoint.query.one().at
+        with pytest.raises(HistoryUnavailable):
+            state_at(start - timedelta(seconds=1))
+    state = client.get('/fleet/state?vehicles=true', headers=headers).get_json()
+    assert state['by_status'] == {'available': 1} and state['events_replayed'] == 0
+    earlier = (start - timedelta(days=1)).isoformat()
+    assert client.get(f'/fleet/state?at={earlier}', headers=headers).status_code == 400
@@ -0,0 +1,93 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from jobs import job_key, purge
+from models import db, Job
+
+
+def submit(client, headers, path='/analytics', **params):
+    response = client.post('/jobs', json={'path': path, 'params': params}, headers=headers)
+    return response.status_code, response.get_json()
+
+
+def wait(client, headers, jid, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{jid}', headers=headers).get_json()
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {jid} still {job["status"]}')
+
+
+def settle(app):
+    """Wait for the job pool to go idle, so no finishing job purges rows behind the test's back."""
+    pool = app.extensions.pop('job_pool', None)
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def test_job_result_matches_route(client, login, activity):
+    headers = login('analyst@test.com')
+    status, job = submit(client, headers)
+    assert status in (200, 202)
+    assert wait(client, headers, job['id'])['status'] == 'done'
+    result = client.get(f"/jobs/{job['id']}/result", headers=headers)
+    assert result.get_json() == client.get('/analytics', headers=headers).get_json()
+
+
+def test_identical_submissions_share_a_job(app, client, login):
+    headers = login('analyst@test.com')
+    with app.app_context():
+        # A run already in progress elsewhere: the submission must join it, not start another
+        db.session.add(Job(key=job_key('/analytics/drivers', {}), path='/analytics/drivers', params='{}',
+                           status='running', created_by=1, started_at=datetime.utcnow(),
+                           expires_at=datetime.utcnow() + timedelta(minutes=10)))
+        db.session.commit()
+        running = Job.query.one().id
+    status, job = submit(client, headers, '/analytics/drivers')
+    assert (status, job['id'], job['status']) == (202, running, 'running')
+
+    # Finished and cached: another user's identical submission gets the same result back
+    first = submit(client, headers, '/analytics/monthly', bucket='month')[1]
+    wait(client, headers, first['id'])
+    status, again = submit(client, login('dispatcher@test.com'), '/analytics/monthly', bucket='month')
+    assert (status, again['id'], again['status']) == (200, first['id'], 'done')
+    with app.app_context():
+        assert Job.query.count() == 2
+
+
+def test_failed_and_expired_jobs_are_taken_over(app, client, login):
+    headers = login('analyst@test.com')
+    job = submit(client, headers)[1]
+    done = wait(client, headers, job['id'])
+    for values in ({'status': 'failed'}, {'expires_at': datetime.utcnow() - timedelta(seconds=1)}):
+        settle(app)
+        with app.app_context():
+            db.session.execute(update(Job).where(Job.id == job['id']).values(**values))
+            db.session.commit()
+        status, rerun = submit(client, headers)
+        assert rerun['id'] == job['id']
+        previous, done = done, wait(client, headers, job['id'])
+        assert done['status'] == 'done' and done['started_at'] != previous['started_at']
+
+
+def test_purge_deletes_only_expired_jobs(app, client, login):
+    headers = login('analyst@test.com')
+    kept = submit(client, headers)[1]
+    gone = submit(client, headers, '/analytics/drivers')[1]
+    for jid in (kept['id'], gone['id']):
+        wait(client, headers, jid)
+    settle(app)
+    with app.app_context():
+        db.session.execute(update(Job).where(Job.id == gone['id']).values(
+            expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        assert purge() == 1
+        assert [j.id for j in Job.query] == [kept['id']]
+    assert client.get(f"/jobs/{gone['id']}", headers=headers).status_code == 404
+
+
+def test_exports_are_not_jobs(client, login):
+    status, body = submit(client, login('analyst@test.com'), '/export/trips')
+    assert status == 400 and '/export' not in body['error']
@@ -0,0 +1,43 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+pytest.importorskip('orjson')
+
+PAYLOAD = {
+    'z': [1, 2.5, 0.001, 10 ** 12, 123456.789, -0.1, None, True, False], 'a': {'nested': {'b': 1, 'a': [{}]}},
+    'day': date(2024, 2, 29), 'at': datetime(2024, 2, 29, 13, 5, 9), 'money': Decimal('12.50'),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'ints': {3: 'c', 1: 'a'}, 'empty': '',
+}
+
+
+@pytest.mark.parametrize('payload', [PAYLOAD, [PAYLOAD, PAYLOAD], 'text', 3.14159, None])
+def test_fast_provider_matches_stdlib_json(app, payload):
+    assert type(app.json).__name__ == 'FastJSONProvider'
+    stdlib = DefaultJSONProvider(app)
+    with app.test_request_context():
+        fast, slow = app.json.response(payload), stdlib.response(payload)
+        assert fast.mimetype == slow.mimetype == 'application/json'
+        assert fast.get_data() == slow.get_data()
+        # dumps() is compact where json.dumps() spaces its separators; the content is the same
+        assert json.loads(app.json.dumps(payload)) == json.loads(stdlib.dumps(payload))
+
+
+def test_non_ascii_round_trips_the_same(app):
+    payload = {'name': 'Zoë Ünal – 東京', 'emoji': '🚚'}
+    stdlib = DefaultJSONProvider(app)
+    with app.test_request_context():
+        fast = app.json.response(payload).get_data()
+        assert json.loads(fast) == json.loads(stdlib.response(payload).get_data()) == payload
+        assert app.json.loads(fast) == payload
+
+
+def test_exponent_floats_carry_the_same_values(app):
+    # orjson writes 1e-7 and 1e16 where json writes 1e-07 and 1e+16
+    payload = [1e-7, 1e16, 2.5e-12, 1.7976931348623157e308]
+    stdlib = DefaultJSONProvider(app)
+    with app.test_request_context():
+        assert json.loads(app.json.response(payload).get_data()) == json.loads(stdlib.response(payload).get_data())
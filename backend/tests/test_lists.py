@@ -0,0 +1,57 @@
+import base64
+import pytest
+
+
+@pytest.fixture
+def vehicles(client, login):
+    headers = login('manager@test.com')
+    r = client.post('/vehicles/bulk', json=[{'plate': f'PAGE-{i:03d}', 'capacity': 500 + i} for i in range(57)],
+                    headers=headers)
+    assert r.status_code == 201
+    return sorted(v['id'] for v in client.get('/vehicles', headers=headers).get_json())
+
+
+def test_cursor_walks_every_row_once(client, login, vehicles):
+    headers = login('analyst@test.com')
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = client.get('/vehicles', query_string={'limit': 10, **({'cursor': cursor} if cursor else {})},
+                          headers=headers).get_json()
+        assert len(page['items']) <= 10
+        seen += [v['id'] for v in page['items']]
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == vehicles                               # in order, no gaps, no duplicates
+    assert pages == -(-len(vehicles) // 10)
+
+
+def test_after_id_starts_past_that_row(client, login, vehicles):
+    page = client.get(f'/vehicles?after_id={vehicles[4]}&limit=3', headers=login('analyst@test.com')).get_json()
+    assert [v['id'] for v in page['items']] == vehicles[5:8]
+
+
+def test_fields_returns_only_requested_keys(client, login, vehicles):
+    headers = login('analyst@test.com')
+    rows = client.get('/vehicles?fields=plate,capacity', headers=headers).get_json()
+    assert len(rows) == len(vehicles)
+    assert all(set(r) == {'plate', 'capacity'} for r in rows)
+
+
+def test_fields_projects_computed_fields(client, login, activity):
+    headers = login('analyst@test.com')
+    full = client.get('/trips', headers=headers).get_json()
+    rows = client.get('/trips?fields=id,distance_km', headers=headers).get_json()
+    assert rows == [{'id': t['id'], 'distance_km': t['distance_km']} for t in full]
+    assert any(r['distance_km'] for r in rows)
+
+
+@pytest.mark.parametrize('query', [
+    'fields=plate,nope', 'cursor=not-a-cursor', 'limit=ten', 'after_id=x',
+    'cursor=' + base64.urlsafe_b64encode(b'[1]').decode().rstrip('='),
+])
+def test_bad_list_arguments_are_rejected(client, login, vehicles, query):
+    response = client.get(f'/vehicles?{query}', headers=login('analyst@test.com'))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+import pytest
+from locations import PRIOR_TRIPS, ROAD_FACTOR, estimate_distances, great_circle_km, load_locations
+from conftest import create
+
+PUNE, MUMBAI = (18.5204, 73.8567), (19.0760, 72.8777)
+STRAIGHT = great_circle_km(*PUNE, *MUMBAI)
+
+
+@pytest.fixture
+def places(app):
+    with app.app_context():
+        assert load_locations([{'name': 'Pune', 'latitude': PUNE[0], 'longitude': PUNE[1]},
+                               {'name': 'Mumbai', 'latitude': MUMBAI[0], 'longitude': MUMBAI[1]}]) == (2, [])
+    return app
+
+
+@pytest.fixture
+def crew(client, login):
+    headers = login('manager@test.com')
+    expiry = (date.today() + timedelta(days=365)).isoformat()
+    vid = create(client, headers, '/vehicles', {'plate': 'LANE-1', 'capacity': 1000, 'odometer': 1000})
+    did = create(client, headers, '/drivers', {'name': 'Lane', 'license_expiry': expiry})
+    return vid, did
+
+
+def draft(client, login, vid, did, **extra):
+    trip = {'vehicle_id': vid, 'driver_id': did, 'cargo_weight': 10, 'origin': 'Pune', 'destination': 'Mumbai'}
+    response = client.post('/trips', json=dict(trip, **extra), headers=login('dispatcher@test.com'))
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_estimates_match_names_loosely_and_skip_unknown_places(places):
+    with places.app_context():
+        known, unknown = estimate_distances([(' pune ', 'MUMBAI'), ('Pune', 'Atlantis')])
+    assert unknown is None
+    assert known == {'origin': 'Pune', 'destination': 'Mumbai', 'km': round(STRAIGHT * ROAD_FACTOR, 1),
+                     'great_circle_km': round(STRAIGHT, 1), 'lane_trips': 0, 'lane_mean_km': None}
+
+
+def test_completed_trips_pull_the_lane_toward_driven_km(places, client, login, crew):
+    vid, did = crew
+    dispatcher = login('dispatcher@test.com')
+    trip = draft(client, login, vid, did)
+    assert trip['estimated_distance_km'] == round(STRAIGHT * ROAD_FACTOR, 1)
+    for body in ({'status': 'dispatched'}, {'status': 'completed', 'end_odometer': 1160}):
+        assert client.put(f"/trips/{trip['id']}", json=body, headers=dispatcher).status_code == 200
+
+    expected = round((160 + PRIOR_TRIPS * STRAIGHT * ROAD_FACTOR) / (1 + PRIOR_TRIPS), 1)
+    assert draft(client, login, vid, did)['estimated_distance_km'] == expected
+    lane = client.get('/locations/distance?origin=Pune&destination=Mumbai', headers=dispatcher).get_json()
+    assert (lane['km'], lane['lane_trips'], lane['lane_mean_km']) == (expected, 1, 160)
+
+
+def test_fuel_cost_filled_in_from_the_vehicles_figures(places, client, login, crew):
+    vid, did = crew
+    assert draft(client, login, vid, did)['estimated_fuel_cost'] == 0          # no fuel logged anywhere yet
+    create(client, login('manager@test.com'), '/fuel', {'vehicle_id': vid, 'liters': 20, 'cost': 40,
+                                                        'distance_km': 200, 'odometer_at_fill': 1200})
+    km = round(STRAIGHT * ROAD_FACTOR, 1)
+    trip = draft(client, login, vid, did)
+    assert trip['estimated_fuel_cost'] == round(km / 10 * 2, 2)                 # 10 km/L at 2 per litre
+    assert draft(client, login, vid, did, estimated_fuel_cost=55)['estimated_fuel_cost'] == 55
+
+
+def test_unknown_places_leave_the_estimates_empty(places, client, login, crew):
+    vid, did = crew
+    trip = draft(client, login, vid, did, destination='Atlantis')
+    assert trip['estimated_distance_km'] is None and trip['estimated_fuel_cost'] == 0
+
+
+def test_fuel_cost_falls_back_to_fleet_figures(places, client, login, crew):
+    vid, did = crew
+    manager, dispatcher = login('manager@test.com'), login('dispatcher@test.com')
+    trip = draft(client, login, vid, did)
+    for body in ({'status': 'dispatched'}, {'status': 'completed', 'end_odometer': 1160}):
+        assert client.put(f"/trips/{trip['id']}", json=body, headers=dispatcher).status_code == 200
+    create(client, manager, '/fuel', {'vehicle_id': vid, 'liters': 20, 'cost': 40})
+    spare = create(client, manager, '/vehicles', {'plate': 'LANE-2', 'capacity': 1000})
+    trip = draft(client, login, spare, did)
+    # The spare van has no fuel of its own: fleet-wide 160 km on 20 L, at 2 per litre
+    assert trip['estimated_fuel_cost'] == round(trip['estimated_distance_km'] / 8 * 2, 2)
@@ -0,0 +1,10 @@
+def test_metrics_requires_configured_token(app, client):
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    r = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert r.status_code == 200 and b'route=' in r.data
+
+
+def test_metrics_open_without_token(client):
+    assert client.get('/metrics').status_code == 200
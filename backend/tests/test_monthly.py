@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+import pytest
+from rollups import MAX_BUCKETS
+from conftest import create
+
+FILLS = {'2023-11-14': 1, '2023-11-15': 2, '2023-12-31': 4, '2024-01-01': 8, '2024-02-10': 16, '2024-02-11': 32}
+
+
+@pytest.fixture
+def fills(client, login):
+    headers = login('manager@test.com')
+    vid = create(client, headers, '/vehicles', {'plate': 'MONTH-1', 'capacity': 1000})
+    r = client.post('/fuel/bulk', json=[{'vehicle_id': vid, 'liters': 1, 'cost': cost, 'date': day}
+                                        for day, cost in FILLS.items()], headers=headers)
+    assert r.status_code == 201
+    return login('analyst@test.com')
+
+
+def fuel_by_period(client, headers, query):
+    response = client.get(f'/analytics/monthly?{query}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return {row['period']: row['fuel_cost'] for row in response.get_json()}
+
+
+def test_default_is_trailing_twelve_months(client, fills):
+    rows = client.get('/analytics/monthly', headers=fills).get_json()
+    this_month = date.today().replace(day=1)
+    assert len(rows) == 12
+    assert rows[-1]['period'] == this_month.isoformat()
+    year, month = divmod(this_month.year * 12 + this_month.month - 1 - 11, 12)
+    assert rows[0]['period'] == date(year, month + 1, 1).isoformat()
+    assert all(set(r) == {'period', 'month', 'revenue', 'fuel_cost', 'maintenance', 'net_profit', 'efficiency'}
+               for r in rows)
+
+
+def test_partial_months_across_a_year_end(client, fills):
+    assert fuel_by_period(client, fills, 'from=2023-11-15&to=2024-02-10') == {
+        '2023-11-01': 2, '2023-12-01': 4, '2024-01-01': 8, '2024-02-01': 16}
+
+
+def test_whole_months_across_a_year_end(client, fills):
+    # Whole months are answered from the monthly rollups
+    assert fuel_by_period(client, fills, 'from=2023-11-01&to=2024-02-29') == {
+        '2023-11-01': 3, '2023-12-01': 4, '2024-01-01': 8, '2024-02-01': 48}
+
+
+def test_days_and_weeks_across_a_year_end(client, fills):
+    assert fuel_by_period(client, fills, 'from=2023-12-30&to=2024-01-02&bucket=day') == {
+        '2023-12-30': 0, '2023-12-31': 4, '2024-01-01': 8, '2024-01-02': 0}
+    # Weeks start on Monday: 2023-12-31 is a Sunday, 2024-01-01 a Monday
+    assert fuel_by_period(client, fills, 'from=2023-12-28&to=2024-01-05&bucket=week') == {
+        '2023-12-25': 4, '2024-01-01': 8}
+
+
+def test_bucket_cap(client, fills):
+    start = date(2020, 1, 1)
+    allowed = f'from={start}&to={start + timedelta(days=MAX_BUCKETS - 1)}&bucket=day'
+    assert client.get(f'/analytics/monthly?{allowed}', headers=fills).status_code == 200
+    for query in (f'from={start}&to={start + timedelta(days=MAX_BUCKETS)}&bucket=day',
+                  'from=1900-01-01&to=2024-01-01&bucket=month'):
+        response = client.get(f'/analytics/monthly?{query}', headers=fills)
+        assert response.status_code == 400
+        assert str(MAX_BUCKETS) in response.get_json()['error']
@@ -0,0 +1,23 @@
+import pytest
+from bench.fleet import generate_fleet
+from schema import full_scans, hot_requests, request_queries
+
+
+@pytest.fixture
+def fleet(app):
+    with app.app_context():
+        # Two years of history, so the archive tables have rows too
+        generate_fleet(vehicles=4, drivers=5, years=2, trips_per_month=2, fills_per_trip=0.5,
+                       services_per_year=2, drafts=2, seed=1)
+    return app
+
+
+def test_hot_requests_use_indexes(fleet):
+    with fleet.app_context():
+        assert [(label, plan) for label, _, plan in full_scans()] == []
+
+
+def test_archived_reads_are_checked(fleet):
+    with fleet.app_context():
+        sql = [sql for _, sql, _ in request_queries(hot_requests())]
+    assert any('trip_archive' in s for s in sql) and any('fuel_log_archive' in s for s in sql)
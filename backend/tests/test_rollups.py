@@ -0,0 +1,49 @@
+from datetime import date
+from models import VehicleRollup, MonthlyRollup
+from rollups import compute_rollups, verify_rollups
+from conftest import create
+
+
+def stored_rollups():
+    vehicles = {r.vehicle_id: {'fuel_cost': r.fuel_cost, 'liters': r.liters, 'maintenance_cost': r.maintenance_cost}
+                for r in VehicleRollup.query}
+    months = {(r.year, r.month): {'fuel_cost': r.fuel_cost, 'liters': r.liters,
+                                  'maintenance_cost': r.maintenance_cost} for r in MonthlyRollup.query}
+    return vehicles, months
+
+
+def assert_matches_recompute(app):
+    with app.app_context():
+        want_vehicles, _, want_months = compute_rollups()
+        vehicles, months = stored_rollups()
+        assert verify_rollups() == []
+    for have, want in ((vehicles, want_vehicles), (months, want_months)):
+        assert set(have) == set(want)
+        for key, fields in have.items():
+            assert fields == {k: want[key].get(k, 0) for k in fields}
+    return vehicles, months
+
+
+def test_fuel_and_maintenance_writes_keep_rollups(app, client, login):
+    headers = login('manager@test.com')
+    vid = create(client, headers, '/vehicles', {'plate': 'ROLL-1', 'capacity': 1000})
+    create(client, headers, '/fuel', {'vehicle_id': vid, 'liters': 30, 'cost': 45.5, 'date': '2024-03-04'})
+    r = client.post('/fuel/bulk', json=[{'vehicle_id': vid, 'liters': 10, 'cost': 15, 'date': '2024-04-01'},
+                                        {'vehicle_id': vid, 'liters': 5, 'cost': 7.25, 'date': '2024-03-20'}],
+                    headers=headers)
+    assert r.get_json() == {'inserted': 2, 'errors': []}
+    mid = create(client, headers, '/maintenance', {'vehicle_id': vid, 'service_type': 'Brakes', 'cost': 220,
+                                                   'date': '2024-03-10'})
+    vehicles, months = assert_matches_recompute(app)
+    assert vehicles[vid] == {'fuel_cost': 67.75, 'liters': 45, 'maintenance_cost': 220}
+    assert months[(2024, 3)] == {'fuel_cost': 52.75, 'liters': 35, 'maintenance_cost': 220}
+
+    # Resolving moves the vehicle back to service without touching the totals
+    assert client.put(f'/maintenance/{mid}/resolve', headers=headers).status_code == 200
+    assert assert_matches_recompute(app) == (vehicles, months)
+
+
+def test_seeded_activity_rollups_match(app, activity):
+    vehicles, months = assert_matches_recompute(app)
+    assert vehicles[activity['vehicles'][1]]['maintenance_cost'] == 140.7
+    assert (date.today().year, date.today().month) in months
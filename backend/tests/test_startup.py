@@ -0,0 +1,26 @@
+from sqlalchemy import event, inspect
+from app import create_app
+from models import db, User
+
+
+def test_create_app_opens_no_connection(tmp_path):
+    path = tmp_path / 'untouched.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    connects = []
+    with app.app_context():
+        event.listen(db.engine, 'connect', lambda *args: connects.append(1))
+        assert app.url_map.bind('localhost').match('/dashboard')[0] == 'fleet.dashboard'
+    assert not path.exists() and connects == []
+
+
+def test_init_db_and_seed_commands_prepare_the_database(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'fleet.db'}",
+                      'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000'})
+    runner = app.test_cli_runner()
+    for command in (['fleet', 'init-db'], ['fleet', 'seed'], ['fleet', 'seed']):
+        result = runner.invoke(args=command)
+        assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert {'vehicle', 'trip', 'vehicle_rollup', 'monthly_rollup'} <= set(inspect(db.engine).get_table_names())
+        assert User.query.filter_by(email='manager@test.com').count() == 1       # seeding twice adds nobody
+        db.engine.dispose()
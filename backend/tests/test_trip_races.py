@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from models import db, Vehicle, Driver
+from rollups import verify_rollups
+
+PAIRS = 6
+DRAFTS_PER_PAIR = 4
+
+
+def race(app, headers, requests):
+    """Send (method, path, body) requests from one thread each, all released at once; returns statuses."""
+    barrier = threading.Barrier(len(requests))
+
+    def send(request):
+        method, path, body = request
+        client = app.test_client()
+        barrier.wait()
+        return client.open(path, method=method, json=body, headers=headers).status_code
+
+    with ThreadPoolExecutor(len(requests)) as pool:
+        return list(pool.map(send, requests))
+
+
+def crews(client, headers):
+    """PAIRS (vehicle, driver) pairs, each with DRAFTS_PER_PAIR drafts; returns {trip id: (vehicle, driver)}."""
+    expiry = (date.today() + timedelta(days=365)).isoformat()
+    drafts = {}
+    for i in range(PAIRS):
+        vid = client.post('/vehicles', json={'plate': f'RACE-{i}', 'capacity': 1000}, headers=headers).get_json()['id']
+        did = client.post('/drivers', json={'name': f'Racer {i}', 'license_expiry': expiry},
+                          headers=headers).get_json()['id']
+        for _ in range(DRAFTS_PER_PAIR):
+            trip = client.post('/trips', json={'vehicle_id': vid, 'driver_id': did, 'cargo_weight': 10},
+                               headers=headers).get_json()
+            drafts[trip['id']] = (vid, did)
+    return drafts
+
+
+def test_concurrent_dispatches_book_each_vehicle_and_driver_once(app, client, login):
+    headers = login('dispatcher@test.com')
+    drafts = crews(client, login('manager@test.com'))
+    statuses = race(app, headers, [('PUT', f'/trips/{tid}', {'status': 'dispatched'}) for tid in drafts])
+
+    # Every loser is told about the conflict; nothing fails any other way
+    assert sorted(set(statuses)) == [200, 409]
+    assert statuses.count(200) == PAIRS
+    winners = [tid for tid, status in zip(drafts, statuses) if status == 200]
+    assert sorted(drafts[tid] for tid in winners) == sorted(set(drafts.values()))
+    with app.app_context():
+        assert {v.status for v in Vehicle.query.filter(Vehicle.plate.like('RACE-%'))} == {'on_trip'}
+        assert {d.status for d in Driver.query.filter(Driver.name.like('Racer %'))} == {'on_trip'}
+        assert verify_rollups() == []
+
+
+def test_complete_and_cancel_race_has_one_winner(app, client, login):
+    headers = login('dispatcher@test.com')
+    drafts = crews(client, login('manager@test.com'))
+    trips = list(drafts)[::DRAFTS_PER_PAIR]                   # one trip per pair
+    for tid in trips:
+        assert client.put(f'/trips/{tid}', json={'status': 'dispatched'}, headers=headers).status_code == 200
+
+    requests = [request for tid in trips for request in (
+        ('PUT', f'/trips/{tid}', {'status': 'completed', 'end_odometer': 100}),
+        ('PUT', f'/trips/{tid}', {'status': 'cancelled'}))]
+    statuses = race(app, headers, requests)
+    for i in range(0, len(statuses), 2):
+        assert sorted(statuses[i:i + 2]) == [200, 409]
+    with app.app_context():
+        assert {v.status for v in Vehicle.query.filter(Vehicle.plate.like('RACE-%'))} == {'available'}
+        assert verify_rollups() == []
+        db.session.remove()
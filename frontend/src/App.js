@@ -287,7 +287,6 @@ function Login({ onLogin }) {
   const [regEmail, setRegEmail] = useState('');
   const [regPass, setRegPass] = useState('');
   const [regPass2, setRegPass2] = useState('');
-  const [regRole, setRegRole] = useState('dispatcher');
   const [err, setErr] = useState('');
   const [ok, setOk] = useState('');
   const [showForgot, setShowForgot] = useState(false);
@@ -307,7 +306,7 @@ function Login({ onLogin }) {
     if (regPass.length < 3) return setErr('Password must be at least 3 characters.');
     if (regPass !== regPass2) return setErr('Passwords do not match.');
     try {
-      await axios.post('/register', { name, email: regEmail, password: regPass, role: regRole });
+      await axios.post('/register', { name, email: regEmail, password: regPass });
       setOk('Account created! You can now sign in.');
       setMode('login'); setEmail(regEmail); setPass(regPass);
     } catch(e) { setErr(e.response?.data?.error || 'Registration failed.'); }
@@ -347,14 +346,7 @@ function Login({ onLogin }) {
           <form onSubmit={register}>
             <div className="field"><label>Full Name *</label><input value={name} onChange={e=>setName(e.target.value)} placeholder="Arjun Sharma"/></div>
             <div className="field"><label>Email *</label><input type="email" value={regEmail} onChange={e=>setRegEmail(e.target.value)} placeholder="you@company.com"/></div>
-            <div className="field"><label>Role</label>
-              <select value={regRole} onChange={e=>setRegRole(e.target.value)}>
-                <option value="manager">Manager</option>
-                <option value="dispatcher">Dispatcher</option>
-                <option value="safety_officer">Safety Officer</option>
-                <option value="analyst">Analyst</option>
-              </select>
-            </div>
+            <div className="role-notice">New accounts start as Analyst. Ask a manager for another role.</div>
             <div className="form-row">
               <div className="field"><label>Password *</label><input type="password" value={regPass} onChange={e=>setRegPass(e.target.value)} placeholder="min 3 chars"/></div>
               <div className="field"><label>Confirm Password *</label><input type="password" value={regPass2} onChange={e=>setRegPass2(e.target.value)}/></div>